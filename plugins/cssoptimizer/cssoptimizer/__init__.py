@@ -21,15 +21,15 @@
 # Plugin Metadata
 """Generate optimized Css code"""
 __author__ = "Cody Precord"
-__version__ = "0.2"
+__version__ = "0.3"
 
 #-----------------------------------------------------------------------------#
 # Imports
-import re
 import wx
 import plugin
 from syntax.synglob import ID_LANG_CSS
 import generator
+import cssmin
 
 #-----------------------------------------------------------------------------#
 # Globals
@@ -39,44 +39,65 @@ ID_CSS_OPTIMIZER = wx.NewId()
 class CssOptimizer(plugin.Plugin):
     """ Optimizes Css Files """
     plugin.Implements(generator.GeneratorI)
-    def Generate(self, txt_ctrl):
+    def Generate(self, txt_ctrl, start=0, end=-1):
         """Generate an optimized version of the given css file.
         If the file does note appear to be css it will return the
         input verbatim.
+        @param txt_ctrl: text control to get the css from
+        @keyword start: position to start at
+        @keyword end: position to stop at (-1 for the end of the document)
+
+        """
+        ext, chunks = self.GenerateStream(txt_ctrl, start, end)
+        return (ext, u"".join([txt for txt, done in chunks]))
+
+    def GenerateStream(self, txt_ctrl, start=0, end=-1):
+        """Generates the optimized css in parts. The text is read from the
+        control a block of lines at a time and passed through the
+        minifier so large stylesheets are never copied in whole.
+        @param txt_ctrl: text control to get the css from
+        @keyword start: position to start at
+        @keyword end: position to stop at (-1 for the end of the document)
+        @return: (file extension, generator of (text, progress) tuples)
 
         """
         stc = txt_ctrl
-        eol = stc.GetEOLChar()
+        if end < 0 or end > stc.GetLength():
+            end = stc.GetLength()
+        fname = stc.GetFileName()
         if stc.GetLexer() == wx.stc.STC_LEX_CSS or \
-           (len(stc.filename) > 3 and stc.filename[-3:] == "css"):
-            # Optimize the text
-            lines = [stc.GetLine(x) for x in xrange(stc.GetLineCount()+1)]
-            to_pop = list()
-            # First Pass compact everything
-            for x in xrange(len(lines)):
-                line = lines[x].strip()
-                if u':' in line:
-                    line = line.split(u':')
-                    for y in xrange(len(line)):
-                        line[y] = line[y].strip()
-                    line = u':'.join(line)
-                if u"{" in line:
-                    line = line.split(u'{')
-                    for y in xrange(len(line)):
-                        line[y] = line[y].strip()
-                    line = u'{'.join(line)
-                if len(line) and line[-1] == u'}':
-                    line += eol
-                lines[x] = line
-            # Finally remove all comments
-            txt = "".join(lines)
-            cmt_pat = re.compile("\/\*[^*]*\*+([^/][^*]*\*+)*\/")
-            if re.search(cmt_pat, txt):
-                txt = re.sub(cmt_pat, u'', txt)
-            ret = ('css', txt)
+           fname.lower().endswith(u".css"):
+            return ('css', self._IterCss(stc, start, end))
         else:
-            ret = ('txt', stc.GetText())
-        return ret
+            return ('txt', [(stc.GetTextRange(start, end), end - start)])
+
+    def _IterCss(self, stc, start, end):
+        """Minifies the css in a range of the control
+        @param stc: text control to get the css from
+        @param start: position to start at
+        @param end: position to stop at
+        @return: generator of (text, progress) tuples
+
+        """
+        minifier = cssmin.Minifier()
+        pos = start
+        while pos < end:
+            # Stop at a line boundary so that characters are not split
+            stop = min(pos + cssmin.CHUNK_SIZE, end)
+            if stop < end:
+                line = stc.LineFromPosition(stop)
+                stop = stc.PositionFromLine(line)
+                if stop <= pos:
+                    stop = stc.GetLineEndPosition(line)
+            yield minifier.Feed(stc.GetTextRange(pos, stop)), stop - start
+            pos = stop
+        yield minifier.Close(), end - start
+
+        wx.GetApp().GetLog()("[cssoptimizer][info] Saved %d of %d "
+                             "characters (%.1f%%)" % \
+                             (minifier.GetSaved(), minifier.insize,
+                              cssmin.Percent(minifier.GetSaved(),
+                                             minifier.insize)))
 
     def GetId(self):
         """Returns the identifing Id of this generator"""
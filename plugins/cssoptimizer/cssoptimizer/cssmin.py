@@ -0,0 +1,591 @@
+#!/usr/bin/env python
+############################################################################
+#    Copyright (C) 2007 Cody Precord                                       #
+#    cprecord@editra.org                                                   #
+#                                                                          #
+#    Editra is free software; you can redistribute it and#or modify        #
+#    it under the terms of the GNU General Public License as published by  #
+#    the Free Software Foundation; either version 2 of the License, or     #
+#    (at your option) any later version.                                   #
+#                                                                          #
+#    Editra is distributed in the hope that it will be useful,             #
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of        #
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the         #
+#    GNU General Public License for more details.                          #
+#                                                                          #
+#    You should have received a copy of the GNU General Public License     #
+#    along with this program; if not, write to the                         #
+#    Free Software Foundation, Inc.,                                       #
+#    59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.             #
+############################################################################
+
+"""
+#--------------------------------------------------------------------------#
+# FILE: cssmin.py
+# AUTHOR: Cody Precord
+# LANGUAGE: Python
+# SUMMARY:
+#    Css minifier that works on a stream of text. The text is split into
+# tokens in a single pass and the rules are rebuilt from the tokens without
+# comments or extra whitespace. Colors are written in their shortest form,
+# repeated declarations in a rule are dropped and neighboring rules that
+# have the same selectors are merged. Rules with different selectors are
+# never merged, a browser drops a whole selector group when one of its
+# selectors is invalid for it (i.e ::-moz-selection). Only the
+# rule being built and the last finished rule of each block are kept in
+# memory so stylesheets of any size can be minified.
+#
+#    The module does not depend on wx so that it can also be run as a
+# script to minify files and directories of files:
+#
+#    cssmin.py [-o outdir] [-s suffix] files and directories...
+#
+# METHODS:
+#   L{Minifier} Streaming minifier
+#   L{Minify} Minify a string
+#   L{MinifyFile} Minify a file
+#--------------------------------------------------------------------------#
+"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__cvsid__ = "$Id$"
+__revision__ = "$Revision$"
+
+#--------------------------------------------------------------------------#
+# Dependancies
+import os
+import re
+import sys
+import getopt
+
+#--------------------------------------------------------------------------#
+# Globals
+CHUNK_SIZE = 65536          # Characters to read at a time
+
+# Token types, the group numbers of RE_TOKEN
+T_COMMENT = 1
+T_STRING = 2
+T_SPACE = 3
+T_PUNCT = 4
+T_OTHER = 5
+
+RE_TOKEN = re.compile(r"""
+    (/\*.*?(?:\*/|\Z))
+  | ("[^"\\]*(?:\\.[^"\\]*)*(?:"|\\?\Z)|'[^'\\]*(?:\\.[^'\\]*)*(?:'|\\?\Z))
+  | (\s+)
+  | ([{};:,>+~])
+  | ([^\s{};:,>+~"'/]+|/)
+""", re.DOTALL | re.VERBOSE)
+
+# At rules whose blocks hold rules instead of declarations
+RULE_BLOCKS = ('media', 'supports', 'document', 'keyframes')
+RE_VENDOR = re.compile(r"^-[a-z]+-")
+
+# Color shortening, the hex notation is left alone in the properties
+# that hold IE filters since they require all six digits.
+RE_HEX = re.compile(r"(?<![\w-])#([0-9a-fA-F]{6}|[0-9a-fA-F]{3})(?![\w-])")
+RE_RGB = re.compile(r"(?<![\w-])rgb\(\s*(\d{1,3})\s*,\s*(\d{1,3})\s*,"
+                    r"\s*(\d{1,3})\s*\)", re.IGNORECASE)
+FILTER_PROPS = ('filter', '-ms-filter')
+COLOR_NAMES = { '#f00' : 'red', '#d2b48c' : 'tan', '#000080' : 'navy',
+                '#008080' : 'teal', '#808080' : 'gray', '#808000' : 'olive',
+                '#800000' : 'maroon', '#800080' : 'purple',
+                '#c0c0c0' : 'silver', '#ffa500' : 'orange',
+                '#a52a2a' : 'brown', '#ff7f50' : 'coral', '#ffd700' : 'gold',
+                '#ffc0cb' : 'pink', '#dda0dd' : 'plum', '#fffafa' : 'snow',
+                '#cd853f' : 'peru', '#f5deb3' : 'wheat', '#fa8072' : 'salmon',
+                '#ee82ee' : 'violet', '#ff6347' : 'tomato' }
+
+#--------------------------------------------------------------------------#
+
+class _Block(object):
+    """A block that is being minified"""
+    def __init__(self, head=u'', decls=False, parts=None):
+        """Create the block
+        @keyword head: selectors or at rule of the block
+        @keyword decls: does the block hold declarations or rules
+        @keyword parts: list to collect the output in, None when the
+                        output is written straight to the stream.
+
+        """
+        object.__init__(self)
+        self.head = head
+        self.decls = decls
+        self.parts = parts
+        self.items = list()     # Declarations of a declaration block
+        self.pending = None     # [selector, declarations] of the last rule
+
+class Minifier(object):
+    """Minifies css that is fed to it in pieces. Each call to L{Feed}
+    returns the minified css for as much of the input as could be finished.
+
+    """
+    def __init__(self):
+        """Create the minifier"""
+        object.__init__(self)
+        self.insize = 0         # Characters fed in
+        self.outsize = 0        # Characters returned
+        self._buf = u''         # Unfinished token from the last piece
+        self._out = list()
+        self._stack = [_Block()]
+        self._toks = list()     # (text, is string) of the current statement
+        self._prop = None       # Property name of the current declaration
+        self._space = False     # Was there whitespace before the next token
+        self._depth = 0         # Parenthesis depth of the current statement
+
+    def Feed(self, text):
+        """Minifies the next piece of css
+        @param text: string
+        @return: minified css
+
+        """
+        self.insize += len(text)
+        return self._Scan(self._buf + text, False)
+
+    def Close(self):
+        """Finishes the css, any blocks that are still open are closed
+        @return: the rest of the minified css
+
+        """
+        text = self._Scan(self._buf, True)
+        self._Statement()
+        while len(self._stack) > 1:
+            self._CloseBlock()
+        self._Flush(self._stack[0])
+        return text + self._TakeOutput()
+
+    def GetSaved(self):
+        """Gets the number of characters saved so far
+        @return: int
+
+        """
+        return self.insize - self.outsize
+
+    #---- Tokens ----#
+
+    def _Scan(self, buf, final):
+        """Tokenizes the buffer and handles the tokens
+        @param buf: text to scan
+        @param final: is this the end of the input
+        @return: minified css
+
+        """
+        end = len(buf)
+        self._buf = u''
+        for match in RE_TOKEN.finditer(buf):
+            # A token at the end of the buffer may continue in the next piece
+            if not final and match.end() == end:
+                self._buf = match.group()
+                break
+            self._Token(match.lastindex, match.group())
+        return self._TakeOutput()
+
+    def _Token(self, kind, text):
+        """Handles a token
+        @param kind: one of the T_* token types
+        @param text: text of the token
+
+        """
+        if kind == T_SPACE:
+            self._space = True
+        elif kind == T_COMMENT:
+            # Comments marked with a ! are kept (i.e licenses)
+            if text.startswith(u'/*!') and not len(self._toks) and \
+               len(self._stack) == 1:
+                self._Output(self._stack[0], text)
+            self._space = True
+        elif kind == T_STRING:
+            self._Add(text, True)
+        elif kind == T_OTHER:
+            self._depth = max(self._depth + text.count(u'(') - \
+                              text.count(u')'), 0)
+            self._Add(text)
+        elif self._depth or text in u',>+~':
+            self._Add(text)
+        elif text == u':':
+            if self._stack[-1].decls and self._prop is None:
+                self._prop = u''.join([tok[0] for tok in self._toks])
+                self._toks = list()
+                self._space = False
+            else:
+                self._Add(text)
+        elif text == u';':
+            self._Statement()
+        elif text == u'{':
+            self._OpenBlock()
+        else:
+            self._Statement()
+            if len(self._stack) > 1:
+                self._CloseBlock()
+
+    def _Add(self, text, is_str=False):
+        """Adds a token to the current statement
+        @param text: text of the token
+        @keyword is_str: is the token a string
+
+        """
+        toks = self._toks
+        if self._space and len(toks):
+            prev = toks[-1][0]
+            if self._stack[-1].decls:
+                if self._prop is not None:
+                    # Values only need spaces between their words
+                    space = prev[-1] not in u',(' and \
+                            text[0] not in u',)!'
+                else:
+                    space = False
+            else:
+                space = prev not in u',>+~' and text not in u',>+~'
+            if space:
+                toks.append((u' ', False))
+        toks.append((text, is_str))
+        self._space = False
+
+    #---- Statements ----#
+
+    def _Statement(self):
+        """Finishes the current declaration or at rule statement"""
+        block = self._stack[-1]
+        toks = self._toks
+        if block.decls:
+            if self._prop is not None:
+                value = GetValue(self._prop, toks)
+                if len(value):
+                    block.items.append(u"%s:%s" % (self._prop, value))
+            elif len(toks):
+                block.items.append(u''.join([tok[0] for tok in toks]))
+        elif len(toks):
+            # At rule statement (i.e @import)
+            self._Output(block, u''.join([tok[0] for tok in toks]) + u';')
+        self._Reset()
+
+    def _OpenBlock(self):
+        """Opens a block using the current statement as its head"""
+        parent = self._stack[-1]
+        head = u''.join([tok[0] for tok in self._toks])
+        if self._prop is not None:
+            head = u"%s:%s" % (self._prop, head)
+        self._Reset()
+
+        rules = False
+        if head.startswith(u'@'):
+            name = re.split(r"[\s(]", head[1:], 1)[0].lower()
+            rules = RE_VENDOR.sub(u'', name) in RULE_BLOCKS
+
+        if rules and not parent.decls and parent.parts is None:
+            # The rules are written out as they are finished
+            self._Output(parent, head + u'{')
+            block = _Block(head, False, None)
+        else:
+            block = _Block(head, not rules, list())
+        self._stack.append(block)
+
+    def _CloseBlock(self):
+        """Closes the innermost block"""
+        block = self._stack.pop()
+        parent = self._stack[-1]
+        if block.decls:
+            items = Dedupe(block.items)
+            body = u';'.join(items)
+        else:
+            self._Flush(block)
+            if block.parts is None:
+                self._Emit(u'}')
+                return
+            body = u''.join(block.parts)
+
+        if parent.decls:
+            parent.items.append(u"%s{%s}" % (block.head, body))
+        elif block.decls and not block.head.startswith(u'@'):
+            self._AddRule(parent, block.head, items)
+        else:
+            self._Output(parent, u"%s{%s}" % (block.head, body))
+
+    def _Reset(self):
+        """Clears the current statement"""
+        self._toks = list()
+        self._prop = None
+        self._space = False
+        self._depth = 0
+
+    #---- Output ----#
+
+    def _AddRule(self, block, head, items):
+        """Adds a finished rule to a block. The rule is held back so that it
+        can be merged with the next one if it has the same selectors.
+        @param block: L{_Block} the rule is in
+        @param head: selectors of the rule
+        @param items: list of the declarations of the rule
+
+        """
+        if not len(items):
+            return
+
+        pend = block.pending
+        if pend is not None:
+            if pend[0] == head:
+                pend[1] = Dedupe(pend[1] + items)
+                return
+            self._Flush(block)
+        block.pending = [head, items]
+
+    def _Emit(self, text):
+        """Writes minified css to the output stream
+        @param text: string
+
+        """
+        self._out.append(text)
+
+    def _Flush(self, block):
+        """Writes out the rule that is being held back in a block
+        @param block: L{_Block}
+
+        """
+        pend = block.pending
+        if pend is not None:
+            block.pending = None
+            self._Write(block, u"%s{%s}" % (pend[0], u';'.join(pend[1])))
+
+    def _Output(self, block, text):
+        """Writes css to a block after the rule that is held back in it
+        @param block: L{_Block}
+        @param text: string
+
+        """
+        self._Flush(block)
+        self._Write(block, text)
+
+    def _TakeOutput(self):
+        """Gets the output that has been written since the last call
+        @return: string
+
+        """
+        text = u''.join(self._out)
+        self._out = list()
+        self.outsize += len(text)
+        return text
+
+    def _Write(self, block, text):
+        """Writes css to a block
+        @param block: L{_Block}
+        @param text: string
+
+        """
+        if block.parts is None:
+            self._Emit(text)
+        else:
+            block.parts.append(text)
+
+#--------------------------------------------------------------------------#
+
+def Dedupe(items):
+    """Removes repeated items keeping the last of each one
+    @param items: list of strings
+    @return: list
+
+    """
+    seen = set()
+    result = list()
+    for item in reversed(items):
+        if item not in seen:
+            seen.add(item)
+            result.append(item)
+    result.reverse()
+    return result
+
+def GetValue(prop, toks):
+    """Gets the minified value of a declaration
+    @param prop: property name
+    @param toks: list of (text, is string) tokens of the value
+    @return: string
+
+    """
+    if prop.lower() in FILTER_PROPS:
+        return u''.join([tok[0] for tok in toks]).strip()
+
+    # Strings are left alone when shortening colors
+    value = list()
+    run = list()
+    for text, is_str in toks:
+        if is_str:
+            value.append(ShortenColors(u''.join(run)))
+            value.append(text)
+            run = list()
+        else:
+            run.append(text)
+    value.append(ShortenColors(u''.join(run)))
+    return u''.join(value).strip()
+
+def ShortenColors(text):
+    """Writes the colors in some css text in their shortest form
+    @param text: string
+    @return: string
+
+    """
+    if u'#' in text:
+        text = RE_HEX.sub(_ShortenHex, text)
+    if u'(' in text:
+        text = RE_RGB.sub(_ShortenRgb, text)
+    return text
+
+def _ShortenHex(match):
+    """Gets the shortest form of a hex color match"""
+    return _ShortColor(match.group(1).lower())
+
+def _ShortenRgb(match):
+    """Gets the shortest form of an rgb() color match"""
+    rgb = [int(num) for num in match.groups()]
+    if max(rgb) > 255:
+        return match.group()
+    return _ShortColor(u"%02x%02x%02x" % tuple(rgb))
+
+def _ShortColor(digits):
+    """Gets the shortest way to write a color
+    @param digits: lower case hex digits of the color (3 or 6)
+    @return: string
+
+    """
+    if len(digits) == 6 and digits[0] == digits[1] and \
+       digits[2] == digits[3] and digits[4] == digits[5]:
+        digits = digits[::2]
+    color = u'#' + digits
+    return COLOR_NAMES.get(color, color)
+
+#--------------------------------------------------------------------------#
+
+def Minify(text):
+    """Minifies a string of css
+    @param text: string
+    @return: string
+
+    """
+    minifier = Minifier()
+    return minifier.Feed(text) + minifier.Close()
+
+def MinifyChunks(chunks, minifier=None):
+    """Minifies css that is read in pieces
+    @param chunks: iterable of strings
+    @keyword minifier: L{Minifier} to use, its sizes can be checked after
+    @return: generator of (minified css, characters read so far)
+
+    """
+    if minifier is None:
+        minifier = Minifier()
+    for text in chunks:
+        yield minifier.Feed(text), minifier.insize
+    yield minifier.Close(), minifier.insize
+
+def MinifyFile(path, outpath):
+    """Minifies a css file in pieces. The syntax of css is all ascii so the
+    file is read and written as latin-1, which passes the bytes of any
+    other encoding through unchanged.
+    @param path: file to minify
+    @param outpath: file to write the minified css to
+    @return: (bytes read, bytes written)
+
+    """
+    import codecs
+    src = codecs.open(path, 'rb', 'latin-1')
+    dest = open(outpath, 'wb')
+    written = 0
+    try:
+        for text, done in MinifyChunks(iter(lambda: src.read(CHUNK_SIZE),
+                                            u'')):
+            text = text.encode('latin-1')
+            written += len(text)
+            dest.write(text)
+    finally:
+        src.close()
+        dest.close()
+    return os.path.getsize(path), written
+
+def MinifyPaths(paths, outdir=None, suffix=u'.min'):
+    """Minifies css files and all the css files under directories
+    @param paths: list of files and directories
+    @keyword outdir: directory to write the files to, by default they are
+                     written beside the original files with the suffix
+                     added to their names.
+    @keyword suffix: added before the extension of files written beside
+                     the originals, files in directories that already have
+                     it are skipped.
+    @return: generator of (path, output path, bytes read, bytes written)
+
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            files = list()
+            for root, dirs, fnames in os.walk(path):
+                dirs.sort()
+                for fname in sorted(fnames):
+                    name, ext = os.path.splitext(fname)
+                    if ext.lower() == u'.css' and \
+                       not (suffix and name.endswith(suffix)):
+                        files.append(os.path.join(root, fname))
+            base = os.path.dirname(os.path.abspath(path))
+        else:
+            files = [path]
+            base = os.path.dirname(os.path.abspath(path))
+
+        for fname in files:
+            name, ext = os.path.splitext(fname)
+            if outdir is None:
+                if suffix and name.endswith(suffix):
+                    continue
+                outpath = name + suffix + ext
+            else:
+                rel = os.path.abspath(fname)[len(base):].lstrip(os.sep)
+                outpath = os.path.join(outdir, rel)
+                if not os.path.exists(os.path.dirname(outpath)):
+                    os.makedirs(os.path.dirname(outpath))
+            read, written = MinifyFile(fname, outpath)
+            yield fname, outpath, read, written
+
+#--------------------------------------------------------------------------#
+
+def Main():
+    """Minifies the css files given on the command line"""
+    usage = ("usage: cssmin.py [-o outdir] [-s suffix] "
+             "files and directories...")
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "ho:s:")
+    except getopt.GetoptError, msg:
+        print >> sys.stderr, str(msg)
+        print >> sys.stderr, usage
+        sys.exit(2)
+
+    outdir = None
+    suffix = u'.min'
+    for opt, val in opts:
+        if opt == '-h':
+            print usage
+            sys.exit(0)
+        elif opt == '-o':
+            outdir = val
+        elif opt == '-s':
+            suffix = val
+
+    if not len(args):
+        print >> sys.stderr, usage
+        sys.exit(2)
+
+    total_in = total_out = 0
+    for path, outpath, read, written in MinifyPaths(args, outdir, suffix):
+        total_in += read
+        total_out += written
+        print "%10d %10d %5.1f%% %s" % (read, written,
+                                        Percent(read - written, read), path)
+    print "Saved %d of %d bytes (%.1f%%)" % (total_in - total_out, total_in,
+                                            Percent(total_in - total_out,
+                                                    total_in))
+
+def Percent(part, whole):
+    """Gets part as a percentage of whole
+    @return: float
+
+    """
+    return (100.0 * part) / max(whole, 1)
+
+#--------------------------------------------------------------------------#
+
+if __name__ == '__main__':
+    Main()
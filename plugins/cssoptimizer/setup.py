@@ -18,7 +18,7 @@ if setup != None:
     sys.argv.append("--dist-dir=../.")
     setup(
         name='CssOptimizer',
-        version='0.2',
+        version='0.3',
         description=__doc__,
         author=__author__,
         author_email="cprecord@editra.org",
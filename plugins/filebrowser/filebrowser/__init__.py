@@ -21,12 +21,18 @@
 # Plugin Meta
 """Adds a File Browser sidepanel"""
 __author__ = "Cody Precord"
-__version__ = "0.4"
+__version__ = "0.5"
 
 #-----------------------------------------------------------------------------#
 # Imports
 import os
+import re
+import sys
 import stat
+import string
+import fnmatch
+import threading
+import Queue
 import wx
 import ed_glob
 from profiler import Profile_Get, Profile_Set
@@ -35,14 +41,21 @@ import ed_menu
 import syntax.syntax
 import util
 import plugin
+import dirlist
 
 #-----------------------------------------------------------------------------#
 # Globals
 PANE_NAME = u'FileBrowser'
 ID_BROWSERPANE = wx.NewId()
 ID_FILEBROWSE = wx.NewId()
+ID_FILL_TIMER = wx.NewId()
+ID_WATCH_TIMER = wx.NewId()
 _ = wx.GetTranslation
 
+BATCH_SIZE = 250        # Max number of items to add to the tree at a time
+FILL_INTERVAL = 10      # Milliseconds between adding batches of items
+WATCH_INTERVAL = 2000   # Milliseconds between checks for changed directories
+
 #-----------------------------------------------------------------------------#
 # Interface implementation
 class FileBrowserPanel(plugin.Plugin):
@@ -225,6 +238,7 @@ class BrowserMenuBar(wx.Panel):
 class BrowserPane(wx.Panel):
     """Creates a filebrowser pane"""
     ID_BROWSE_MENU = wx.NewId()
+    ID_FILTER = wx.NewId()
     ID_SHOW_HIDDEN = wx.NewId()
 
     def __init__(self, parent, id, pos=wx.DefaultPosition,
@@ -234,13 +248,16 @@ class BrowserPane(wx.Panel):
         # Attributes
         self._mw = parent
         self._sizer = wx.BoxSizer(wx.VERTICAL)
-        ff = "".join(syntax.syntax.GenFileFilters())
+        ff = u"".join(syntax.syntax.GenFileFilters()).split(u"|")
+        self._filters = zip(ff[0::2], ff[1::2])
         self._menbar = BrowserMenuBar(self, self.ID_BROWSE_MENU)
         self._browser = FileBrowser(self, ID_FILEBROWSE, 
                                     dir = wx.GetHomeDir(), 
                                     size = (200,-1),
-                                    style = wx.DIRCTRL_SHOW_FILTERS | wx.BORDER_SUNKEN,
-                                    filter = ff)
+                                    style = wx.BORDER_SUNKEN)
+        self._filter = wx.Choice(self, self.ID_FILTER,
+                                 choices=[item[0] for item in self._filters])
+        self._filter.SetSelection(0)
         self._config = PathMarkConfig(ed_glob.CONFIG['CACHE_DIR'])
         for item in self._config.GetItemLabels():
             self._menbar.AddItem(item)
@@ -258,6 +275,7 @@ class BrowserPane(wx.Panel):
         # Layout Pane
         self._sizer.Add(self._menbar, 0, wx.EXPAND)
         self._sizer.Add(self._browser, 1, wx.EXPAND)
+        self._sizer.Add(self._filter, 0, wx.EXPAND)
         self._sizer.Add((2,2))
         cb_sz = wx.BoxSizer(wx.HORIZONTAL)
         cb_sz.Add((4,4))
@@ -268,6 +286,7 @@ class BrowserPane(wx.Panel):
 
         # Event Handlers
         self.Bind(wx.EVT_CHECKBOX, self.OnCheck)
+        self.Bind(wx.EVT_CHOICE, self.OnFilter, id=self.ID_FILTER)
         self.Bind(wx.EVT_MENU, self.OnMenu)
         self.Bind(wx.EVT_PAINT, self.OnPaint)
         vm.Bind(wx.EVT_MENU_OPEN, self.UpdateMenuItem)
@@ -280,15 +299,19 @@ class BrowserPane(wx.Panel):
         """Toggles visibility of hidden files on and off"""
         e_id = evt.GetId()
         if e_id == self.ID_SHOW_HIDDEN:
-            style = self._browser.GetTreeStyle()
-            self._browser.SetTreeStyle(wx.TR_SINGLE)
-            self._browser.Refresh()
             self._browser.ShowHidden(self._showh_cb.GetValue())
-            self._browser.SetTreeStyle(style)
-            self._browser.Refresh()
         else:
             evt.Skip()
 
+    def OnFilter(self, evt):
+        """Changes the files shown in the browser to the ones matching
+        the selected file filter.
+
+        """
+        sel = self._filter.GetSelection()
+        if sel >= 0 and sel < len(self._filters):
+            self._browser.SetFilter(self._filters[sel][1].split(u";"))
+
     # TODO Add input method so that paths can be given custom
     #      labels
     # TODO after a jump the window should be properly rescrolled
@@ -368,85 +391,357 @@ class BrowserPane(wx.Panel):
 
 #-----------------------------------------------------------------------------#
 
-class FileBrowser(wx.GenericDirCtrl):
-    """A hack job done to make the genericdirctrl more useful
-    and work with Editra's art provider.
+class DirLister(threading.Thread):
+    """Background thread that lists directories for the L{FileBrowser} so
+    that reading large or slow directories does not block the interface.
+    The results are passed back to the main thread with wx.CallAfter.
 
     """
+    def __init__(self, cache):
+        """Create the lister thread
+        @param cache: dirlist.DirCache to get the listings from
+
+        """
+        threading.Thread.__init__(self)
+        self.setDaemon(True)
+
+        # Attributes
+        self._cache = cache
+        self._queue = Queue.Queue()
+
+    def List(self, paths, callback, hidden=False, match=None, check=False):
+        """Queues directories to be listed. The callback is called on the
+        main thread with (path, entries) for each directory where entries is
+        a list of (name, isdir) tuples or None if it could not be read.
+        @param paths: list of directory paths
+        @param callback: callable
+        @keyword hidden: include hidden files and directories
+        @keyword match: regular expression file names must match or None
+        @keyword check: only pass back the directories that have changed
+                        since they were last listed
+
+        """
+        self._queue.put((paths, callback, hidden, match, check))
+
+    def run(self):
+        """Lists the queued directories"""
+        while True:
+            paths, callback, hidden, match, check = self._queue.get()
+            for path in paths:
+                try:
+                    if check and not self._cache.IsStale(path):
+                        continue
+                    dirs, files = self._cache.GetListing(path, hidden)
+                except Exception:
+                    # Never let a bad directory stop the lister, the
+                    # callback is still told so it does not wait on it.
+                    wx.CallAfter(callback, path, None)
+                    continue
+
+                if match is not None:
+                    files = [fname for fname in files if match(fname)]
+                entries = [(dname, True) for dname in dirs]
+                entries.extend([(fname, False) for fname in files])
+                wx.CallAfter(callback, path, entries)
+
+class FileBrowser(wx.TreeCtrl):
+    """Tree of the file system that lists directories on a background
+    thread and adds their contents to the tree a batch at a time, so that
+    expanding a directory with thousands of files does not freeze the
+    editor. Directories are only listed when they are first expanded and
+    the expanded ones are checked for changes every few seconds.
+
+    """
+    IMG_FOLDER = 0
+    IMG_OPEN = 1
+    IMG_HARDDISK = 2
+    IMG_FILE = 3
+
     def __init__(self, parent, id, dir=u'', pos=wx.DefaultPosition,
-                 size=wx.DefaultSize, style=wx.DIRCTRL_SHOW_FILTERS,
-                 filter=wx.EmptyString, defaultFilter=0):
-        wx.GenericDirCtrl.__init__(self, parent, id, dir, pos, 
-                                   size, style, filter, defaultFilter)
+                 size=wx.DefaultSize, style=wx.BORDER_SUNKEN):
+        wx.TreeCtrl.__init__(self, parent, id, pos, size,
+                             style | wx.TR_HIDE_ROOT | wx.TR_HAS_BUTTONS | \
+                             wx.TR_LINES_AT_ROOT | wx.TR_MULTIPLE)
 
         # Attributes
-        self._tree = self.GetTreeCtrl()
-        
-        # Set custom styles
-        self._tree.SetWindowStyle(self._tree.GetWindowStyle() | wx.TR_MULTIPLE)
-        self._tree.Refresh()
-
-        # HACK if the GenericDirCtrl ever changes the order of the images used in it
-        #      this will have to be updated accordingly
-        if Profile_Get('ICONS', 'str', 'default').lower() != u'default':
-            bmp1 = wx.ArtProvider.GetBitmap(str(ed_glob.ID_FOLDER), wx.ART_MENU)
-            self._imglst = wx.ImageList(bmp1.GetWidth(), bmp1.GetHeight())
-            self._imglst.Add(bmp1) # Folder Normal
-            self._imglst.Add(wx.ArtProvider.GetBitmap(str(ed_glob.ID_OPEN), wx.ART_MENU)) # Folder Open
-            self._imglst.Add(wx.ArtProvider.GetBitmap(str(ed_glob.ID_COMPUTER), wx.ART_MENU))  # Computer
-            self._imglst.Add(wx.ArtProvider.GetBitmap(str(ed_glob.ID_HARDDISK), wx.ART_MENU)) # Root drive icon
-            self._imglst.Add(wx.ArtProvider.GetBitmap(str(ed_glob.ID_CDROM), wx.ART_MENU))  # CD
-            self._imglst.Add(wx.ArtProvider.GetBitmap(str(ed_glob.ID_FLOPPY), wx.ART_MENU))  # Floppy
-            self._imglst.Add(wx.ArtProvider.GetBitmap(str(ed_glob.ID_USB), wx.ART_MENU))  # Removable
-            self._imglst.Add(wx.ArtProvider.GetBitmap(str(ed_glob.ID_FILE), wx.ART_MENU))  # Regular Files
-            self._imglst.Add(wx.ArtProvider.GetBitmap(str(ed_glob.ID_BIN_FILE), wx.ART_MENU))  # Binary Files
-            self._imglst.Add(wx.ArtProvider.GetBitmap(str(ed_glob.ID_FILE), wx.ART_MENU))  # msw cmd Files
-            self._imglst.Add(wx.ArtProvider.GetBitmap(str(ed_glob.ID_FILE), wx.ART_MENU))  # msw py Files
-            if wx.Platform == '__WXMSW__':
-                for x in range(6):
-                    self._imglst.Add(wx.ArtProvider.GetBitmap(str(ed_glob.ID_FILE), wx.ART_MENU))
-            self._tree.SetImageList(self._imglst)
+        self._hidden = False    # Show hidden files
+        self._match = None      # Regex matcher of the files to show
+        self._target = None     # Path to select once it has been listed
+        self._items = dict()    # Path key -> tree item
+        self._shown = dict()    # Path key -> names of the items in the dir
+        self._pending = dict()  # Path key -> [entries, pos] or None if the
+                                # listing has not come back yet
+        self._fillq = list()    # Path keys of the dirs being filled in
+        self._lister = DirLister(dirlist.DirCache())
+        self._lister.start()
+        self._filltimer = wx.Timer(self, ID_FILL_TIMER)
+        self._watchtimer = wx.Timer(self, ID_WATCH_TIMER)
+
+        self._imglst = wx.ImageList(16, 16)
+        for art in (ed_glob.ID_FOLDER, ed_glob.ID_OPEN,
+                    ed_glob.ID_HARDDISK, ed_glob.ID_FILE):
+            self._imglst.Add(wx.ArtProvider.GetBitmap(str(art), wx.ART_MENU))
+        self.SetImageList(self._imglst)
+
+        root = self.AddRoot(u'')
+        for path in GetRoots():
+            self._AddItem(root, path, path, True, img=self.IMG_HARDDISK)
 
         # Event Handlers
         self.Bind(wx.EVT_TREE_ITEM_ACTIVATED, self.OnOpen)
+        self.Bind(wx.EVT_TREE_ITEM_EXPANDING, self.OnExpanding)
+        self.Bind(wx.EVT_TIMER, self.OnFill, id=ID_FILL_TIMER)
+        self.Bind(wx.EVT_TIMER, self.OnWatch, id=ID_WATCH_TIMER)
+        self.Bind(wx.EVT_WINDOW_DESTROY, self.OnDestroy, id=self.GetId())
         if wx.Platform == '__WXMSW__':
-            self._tree.Bind(wx.EVT_KEY_UP, self.OnOpen)
-#         self.Bind(wx.EVT_TREE_BEGIN_DRAG, self.OnDragStart)
-#         self.Bind(wx.EVT_TREE_END_DRAG, self.OnDragEnd)
+            self.Bind(wx.EVT_KEY_UP, self.OnOpen)
+
+        self._watchtimer.Start(WATCH_INTERVAL)
+        if dir:
+            self.ExpandPath(dir)
+
+    def _AddItem(self, parent, path, label, isdir, index=None, img=None):
+        """Adds an item to the tree
+        @param parent: parent item
+        @param path: path of the item
+        @param label: label to show
+        @param isdir: is the path a directory
+        @keyword index: index to insert the item at or None to append it
+        @keyword img: image to use or None for the default
+
+        """
+        if not isinstance(label, unicode):
+            label = label.decode(sys.getfilesystemencoding() or 'utf-8',
+                                 'replace')
+        if img is None:
+            if isdir:
+                img = self.IMG_FOLDER
+            else:
+                img = self.IMG_FILE
+
+        if index is None:
+            item = self.AppendItem(parent, label, img)
+        else:
+            item = self.InsertItemBefore(parent, index, label, img)
+        self.SetPyData(item, path)
+        if isdir:
+            self.SetItemHasChildren(item, True)
+            if img == self.IMG_FOLDER:
+                self.SetItemImage(item, self.IMG_OPEN,
+                                  wx.TreeItemIcon_Expanded)
+        self._items[os.path.normcase(path)] = item
+
+    def _ContinueExpand(self):
+        """Expands the tree towards the path given to L{ExpandPath}. This
+        is called again each time more of the tree has been filled in
+        until the path is found.
+
+        """
+        target = self._target
+        if target is None:
+            return
+
+        key = os.path.normcase(target)
+        item = self._items.get(key)
+        if item is not None:
+            self._target = None
+            self.UnselectAll()
+            self.SelectItem(item)
+            if self.ItemHasChildren(item):
+                self.Expand(item)
+            self.EnsureVisible(item)
+            return
+
+        # Find the closest parent directory that is in the tree
+        parent = os.path.dirname(key)
+        while parent not in self._items:
+            up = os.path.dirname(parent)
+            if up == parent:
+                self._target = None
+                return
+            parent = up
+
+        item = self._items[parent]
+        if parent in self._shown and parent not in self._pending:
+            # Filled in but the path is hidden or filtered out
+            self._target = None
+            self.UnselectAll()
+            self.SelectItem(item)
+            self.EnsureVisible(item)
+        else:
+            self.Expand(item)
+
+    def _Forget(self, key):
+        """Forgets about an item and everything under it after it has been
+        removed from the tree.
+        @param key: path key of the item
+
+        """
+        self._items.pop(key, None)
+        self._pending.pop(key, None)
+        for name in self._shown.pop(key, list()):
+            self._Forget(os.path.join(key, os.path.normcase(name)))
+
+    def _OnListing(self, path, entries):
+        """Called with the contents of a directory from the lister thread
+        @param path: directory path
+        @param entries: list of (name, isdir) tuples or None
+
+        """
+        if not self:
+            return
+
+        key = os.path.normcase(path)
+        item = self._items.get(key)
+        if item is None:
+            return
+
+        if entries is None:
+            # The directory can not be read (removed, no permission...)
+            entries = list()
+
+        if key in self._shown and key not in self._pending:
+            self._Update(item, path, entries)
+            return
+
+        # Fill in a new directory or start over with one that changed
+        # before it was completely filled in.
+        if self._pending.get(key) is not None:
+            for name in self._shown.get(key, list()):
+                self._Forget(os.path.normcase(os.path.join(path, name)))
+            self.DeleteChildren(item)
+
+        self._shown[key] = list()
+        self._pending[key] = [entries, 0]
+        if key not in self._fillq:
+            self._fillq.append(key)
+        if not len(entries):
+            self.SetItemHasChildren(item, False)
+        if not self._filltimer.IsRunning():
+            self._filltimer.Start(FILL_INTERVAL)
+
+    def _Request(self, keys, check=False):
+        """Asks the lister thread for the contents of directories
+        @param keys: list of path keys
+        @keyword check: only list the directories that have changed
+
+        """
+        paths = [self.GetPyData(self._items[key]) for key in keys]
+        if len(paths):
+            self._lister.List(paths, self._OnListing, self._hidden,
+                              self._match, check)
+
+    def _Update(self, item, path, entries):
+        """Updates the items of a filled in directory that has changed
+        @param item: tree item of the directory
+        @param path: directory path
+        @param entries: list of (name, isdir) tuples
+
+        """
+        key = os.path.normcase(path)
+        old = self._shown[key]
+        names = [entry[0] for entry in entries]
+        if names == old:
+            return
+
+        self.Freeze()
+        try:
+            keep = set(names)
+            for name in old:
+                if name not in keep:
+                    ckey = os.path.normcase(os.path.join(path, name))
+                    child = self._items.get(ckey)
+                    self._Forget(ckey)
+                    if child is not None:
+                        self.Delete(child)
+
+            have = set(old)
+            for index, (name, isdir) in enumerate(entries):
+                if name not in have:
+                    self._AddItem(item, os.path.join(path, name), name,
+                                  isdir, index)
+            self._shown[key] = names
+            self.SetItemHasChildren(item, len(names) > 0)
+        finally:
+            self.Thaw()
+
+    def ExpandPath(self, path):
+        """Expands the tree to show the given path and selects it. The
+        directories along the way are listed in the background so the
+        path may not be selected until after this returns.
+        @param path: path to show
+        @return: bool (False if the path does not exist)
+
+        """
+        if not path or not os.path.exists(path):
+            return False
+        self._target = os.path.abspath(path)
+        self._ContinueExpand()
+        return True
 
     def GetPaths(self):
         """Gets a list of abs paths of the selected items"""
-        treeIds = self._tree.GetSelections()
-        root = self._tree.GetRootItem()
-        ret_val = list()
-        for id in treeIds:
-            start = id
-            atoms = [id]
-            while self._tree.GetItemParent(start) != root:
-                atoms.append(self._tree.GetItemParent(start))
-                start = atoms[-1]
-            atoms.reverse()
-            path = list()
-            for atom in atoms:
-                path.append(self._tree.GetItemText(atom))
-
-            if wx.Platform == '__WXMSW__':
-                r_txt = u''
-            else:
-                if path[0] != "/":
-                    path.pop(0)
-                r_txt = os.path.sep
+        paths = list()
+        for item in self.GetSelections():
+            path = self.GetPyData(item)
+            if path is not None:
+                paths.append(path)
+        return paths
+
+    def OnDestroy(self, evt):
+        """Stops the timers when the tree is destroyed"""
+        self._filltimer.Stop()
+        self._watchtimer.Stop()
+        evt.Skip()
 
-            ret_val.append(r_txt + util.GetPathChar().join(path))
-        return ret_val
+    def OnExpanding(self, evt):
+        """Lists the directory the first time it is expanded, directories
+        that have been listed before are checked for changes.
 
-    def GetScrollRange(self, orient=wx.VERTICAL):
-        """Returns the scroll range of the tree control"""
-        return self._tree.GetScrollRange(orient)
+        """
+        path = self.GetPyData(evt.GetItem())
+        if path is not None:
+            key = os.path.normcase(path)
+            if key in self._pending:
+                pass
+            elif key in self._shown:
+                self._Request([key], True)
+            else:
+                self._pending[key] = None
+                self._Request([key])
+        evt.Skip()
 
-    def GetTreeStyle(self):
-        """Returns the trees current style"""
-        return self._tree.GetWindowStyle()
+    def OnFill(self, evt):
+        """Adds the next batch of items to the directories being filled in"""
+        budget = BATCH_SIZE
+        self.Freeze()
+        try:
+            while budget > 0 and len(self._fillq):
+                key = self._fillq[0]
+                item = self._items.get(key)
+                pending = self._pending.get(key)
+                if item is None or pending is None:
+                    self._fillq.pop(0)
+                    continue
+
+                entries, pos = pending
+                path = self.GetPyData(item)
+                shown = self._shown[key]
+                chunk = entries[pos:pos + budget]
+                for name, isdir in chunk:
+                    self._AddItem(item, os.path.join(path, name), name, isdir)
+                    shown.append(name)
+                budget -= len(chunk)
+                pending[1] = pos + len(chunk)
+                if pending[1] >= len(entries):
+                    del self._pending[key]
+                    self._fillq.pop(0)
+        finally:
+            self.Thaw()
+
+        if not len(self._fillq):
+            self._filltimer.Stop()
+        self._ContinueExpand()
 
     def OnOpen(self, evt):
         """Handles item activations events. (i.e double clicked or 
@@ -455,12 +750,14 @@ class FileBrowser(wx.GenericDirCtrl):
 
         """
         files = self.GetPaths()
-        if wx.Platform == '__WXMSW__':
+        if wx.Platform == '__WXMSW__' and hasattr(evt, 'GetKeyCode'):
             key = evt.GetKeyCode()
-            if len(files) == 1 and stat.S_ISDIR(os.stat(files[0])[0]):
+            if key != wx.WXK_RETURN:
                 evt.Skip()
-                if key == wx.WXK_RETURN:
-                    self.ExpandPath(files[0])
+                return
+            if len(files) == 1 and os.path.isdir(files[0]):
+                evt.Skip()
+                self.ExpandPath(files[0])
                 return
         to_open = list()
         for fname in files:
@@ -474,34 +771,70 @@ class FileBrowser(wx.GenericDirCtrl):
         if win:
             win.nb.OnDrop(to_open)
 
-      # TODO implement drag and drop from the control to the editor
-#     def OnDragEnd(self, evt):
-#         evt.Skip()
-
-#     def OnDragStart(self, evt):
-#         print evt.GetLabel()
-#         evt.Skip()
-
-#     def SelectPath(self, path):
-#         """Selects the given path"""
-#         parts = path.split(os.path.sep)
-#         root = self._tree.GetRootItem()
-#         rtxt = self._tree.GetItemText(root)
-#         item, cookie = self._tree.GetFirstChild(root)
-#         while item:
-#             if self._tree.ItemHasChildren(item):
-#                 i_txt = self._tree.GetItemText(item)
-#                 print i_txt
-#                 item, cookie = self._tree.GetFirstChild(item)
-#                 continue
-#             else:
-#                 i_txt = self._tree.GetItemText(item)
-#                 print i_txt
-#             item, cookie = self._tree.GetNextChild(item, cookie)
-
-    def SetTreeStyle(self, style):
-        """Sets the style of directory controls tree"""
-        self._tree.SetWindowStyle(style)
+    def OnWatch(self, evt):
+        """Checks the expanded directories for changes while the browser
+        is being shown.
+
+        """
+        if not self.GetParent().IsShown():
+            return
+
+        keys = [key for key in self._shown
+                if key not in self._pending and self.IsExpanded(self._items[key])]
+        self._Request(keys, True)
+
+    def Reload(self):
+        """Lists all the directories that have been listed again and
+        updates the tree to match the current settings.
+
+        """
+        keys = list(self._shown)
+        keys.extend([key for key in self._pending if key not in self._shown])
+        self._Request(keys)
+
+    def SetFilter(self, patterns):
+        """Sets the file name patterns of the files to show
+        @param patterns: list of wildcard patterns (i.e *.py), an empty
+                         list or *.* shows all files
+
+        """
+        patterns = [pat for pat in patterns if pat and pat not in ('*', '*.*')]
+        if len(patterns):
+            regex = u"|".join([u"(?:%s)" % fnmatch.translate(pat)
+                               for pat in patterns])
+            self._match = re.compile(regex, re.IGNORECASE).match
+        else:
+            self._match = None
+        self.Reload()
+
+    def ShowHidden(self, show=True):
+        """Shows or hides hidden files and directories
+        @keyword show: bool
+
+        """
+        self._hidden = show
+        self.Reload()
+
+#-----------------------------------------------------------------------------#
+
+def GetRoots():
+    """Gets the paths of the top level items of the tree
+    @return: list of paths
+
+    """
+    if wx.Platform != '__WXMSW__':
+        return [os.path.sep]
+
+    # Get the drives without touching them so that empty floppy and cd
+    # drives are not spun up.
+    try:
+        import ctypes
+        mask = ctypes.windll.kernel32.GetLogicalDrives()
+        return [u"%s:\\" % letter for idx, letter in \
+                enumerate(string.ascii_uppercase) if mask & (1 << idx)]
+    except (ImportError, AttributeError, OSError):
+        return [u"%s:\\" % letter for letter in string.ascii_uppercase[2:]
+                if os.path.exists(u"%s:\\" % letter)]
 
 class PathMarkConfig(object):
     """Manages the saving of pathmarks to make them usable from
@@ -0,0 +1,438 @@
+#!/usr/bin/env python
+###############################################################################
+# Name: bench_generators.py                                                   #
+# Purpose: Check the output of the document generators and benchmark them     #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2007 Cody Precord <staff@editra.org>                         #
+# Licence: wxWindows Licence                                                  #
+###############################################################################
+
+"""
+bench_generators.py -- Exports each of the sample files in the tests
+                       directory with the Html, LaTeX and Rtf generators and
+                       compares the documents against the golden files that
+                       were saved from a known good run. Each generator is
+                       then timed on the samples scaled up to larger sizes.
+
+The golden files are kept in tests/golden/<platform> since the fonts in
+the generated documents depend on the platform. Run with -g to create or
+update them after checking that a change to the output is wanted. The -R
+option generates them with the generators of an earlier git revision, so
+that a rewrite of a generator can be checked against the output of the
+code it replaces:
+
+    bench_generators.py -g -R <revision>
+
+The golden files and the baseline are not kept in the repository since
+they need a display and the platform's fonts to make. The first run on a
+platform must be made with -g against 65de4c5, the last revision before
+the generators were rewritten to work on style runs and stream their
+output. Later runs then check the current generators against the output
+of the original code:
+
+    bench_generators.py -g -R 65de4c5
+    bench_generators.py
+
+The throughput of each generator (bytes of source document exported per
+second) is written out as a CSV report that can be passed back in with
+the -b option on a later run to detect regressions. Running with -g also
+saves the report as tests/golden/<platform>/genbench.csv, which is used
+as the baseline when -b is not given.
+
+If there is no display available on Linux the benchmarks are run under a
+virtual Xvfb display.
+
+Usage:
+
+    bench_generators.py [options]
+
+Options:
+
+    -b <file>      Baseline report to compare the results against. Any
+                   throughput that is slower than the baseline by more than
+                   the tolerance is reported and the exit status is set to 1.
+                   (default: the baseline saved with the golden files)
+
+    -f <filter>    Only use the sample files whose name contains filter.
+
+    -g             Write the golden files instead of comparing against them.
+
+    -o <file>      File to write the report to (default: genbench.csv)
+
+    -R <revision>  Use the source code from this git revision instead of
+                   the working tree. The samples and golden files are
+                   always taken from the working tree.
+
+    -r <#>         Number of times to repeat each measurement, the fastest
+                   time is reported (default: 3)
+
+    -s <sizes>     Comma separated list of sizes in megabytes to scale the
+                   samples up to for the timings. Use 0 to only check the
+                   output against the golden files (default: 1,10)
+
+    -t <percent>   Tolerance used when comparing against a baseline
+                   (default: 25)
+
+"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__svnid__ = "$Id$"
+__revision__ = "$Revision$"
+
+#--------------------------------------------------------------------------#
+# Dependancies
+import os
+import sys
+import csv
+import time
+import getopt
+import signal
+import shutil
+import tarfile
+import difflib
+import tempfile
+import subprocess
+
+# Editra's source modules import each other by name
+TOP_DIR = os.path.normpath(os.path.join(os.path.dirname(
+                                        os.path.abspath(__file__)), os.pardir))
+SRC_DIR = os.path.join(TOP_DIR, 'src')
+TEST_DIR = os.path.join(TOP_DIR, 'tests')
+sys.path.insert(0, SRC_DIR)
+
+from bench_lexers import StartVirtualDisplay, GetSamples, ScaleText
+
+#--------------------------------------------------------------------------#
+# Globals
+
+FIELDS = ['file', 'generator', 'size', 'output', 'seconds', 'throughput']
+MEGABYTE = 1024 * 1024
+VERSION_MARK = u"@VERSION@"     # Replaces the version in the golden files
+BASELINE = 'genbench.csv'       # Baseline report kept with the golden files
+ORIGIN_REV = '65de4c5'          # Revision to make the first golden files from
+
+#--------------------------------------------------------------------------#
+
+def InitEditra():
+    """Sets up enough of Editra to be able to create text controls and use
+    the generator plugins. The default profile is used so that the results
+    do not depend on the users settings.
+    @return: the application and a temporary cache directory
+
+    """
+    import ed_glob
+    import util
+    import profiler
+    profiler.Profile().LoadDefaults()
+    for key, cdir in [('SYS_STYLES_DIR', 'styles'), ('STYLES_DIR', 'styles'),
+                      ('SYSPIX_DIR', 'pixmaps'), ('TEST_DIR', 'tests'),
+                      ('PLUGIN_DIR', 'plugins'),
+                      ('SYS_PLUGIN_DIR', 'plugins')]:
+        ed_glob.CONFIG[key] = util.ResolvConfigDir(cdir, True)
+    cache = tempfile.mkdtemp(prefix='genbench')
+    ed_glob.CONFIG['CACHE_DIR'] = cache + os.sep
+    ed_glob.CONFIG['CONFIG_DIR'] = cache + os.sep
+
+    import Editra
+    app = Editra.Editra(False)
+    sys.excepthook = sys.__excepthook__
+    return app, cache
+
+def ExportRevision(rev):
+    """Exports the tree of a git revision to a temporary directory
+    @param rev: git revision
+    @return: path of the exported tree
+
+    """
+    tree = tempfile.mkdtemp(prefix='genbench')
+    try:
+        git = subprocess.Popen(['git', 'archive', '--format=tar', rev],
+                               cwd=TOP_DIR, stdout=subprocess.PIPE)
+    except OSError, msg:
+        print >> sys.stderr, "Unable to run git: %s" % str(msg)
+        sys.exit(2)
+    archive = tarfile.open(fileobj=git.stdout, mode='r|')
+    archive.extractall(tree)
+    archive.close()
+    if git.wait():
+        print >> sys.stderr, "Unable to export revision %s" % rev
+        shutil.rmtree(tree, True)
+        sys.exit(2)
+    return tree
+
+def GetGoldenDir(test_dir):
+    """Gets the directory of the golden files for this platform
+    @param test_dir: directory holding the sample files
+    @return: path
+
+    """
+    import wx
+    return os.path.join(test_dir, 'golden', wx.Platform.strip('_').lower())
+
+def Generate(gen, gen_id, stc):
+    """Generates a document from the text control
+    @param gen: generator.Generator
+    @param gen_id: id of the generator to use
+    @param stc: text control to generate from
+    @return: (file extension, utf-8 encoded document)
+
+    """
+    if hasattr(gen, 'GenerateStream'):
+        ext, chunks = gen.GenerateStream(gen_id, stc)
+    else:
+        # Generators from before streaming was added (see the -R option)
+        ext, text = gen.GenerateText(gen_id, stc)
+        chunks = [(text, stc.GetLength())]
+    doc = list()
+    for text, done in chunks:
+        if isinstance(text, unicode):
+            text = text.encode('utf-8')
+        doc.append(text)
+    return ext, ''.join(doc)
+
+def LoadSample(stc, fname, txt, enc):
+    """Loads and styles a sample in the text control
+    @param stc: EditraStc to load the text into
+    @param fname: name of the sample
+    @param txt: text of the sample
+    @param enc: encoding the text was decoded from
+
+    """
+    import util
+    stc.SetText(txt, enc)
+    stc.SetFileName(fname)
+    stc.EmptyUndoBuffer()
+    stc.ConfigureLexer(util.GetExtension(fname).lower())
+    stc.Colourise(0, -1)
+
+def CheckGolden(gen, gen_id, stc, fname, golden_dir, update):
+    """Compares the document generated from the sample in the text control
+    against its golden file.
+    @param gen: generator.Generator
+    @param gen_id: id of the generator to use
+    @param stc: text control holding the sample
+    @param fname: name of the sample
+    @param golden_dir: directory of the golden files
+    @param update: write the golden file instead of comparing
+    @return: description of the difference or None if they match
+
+    """
+    import ed_glob
+    ext, doc = Generate(gen, gen_id, stc)
+    doc = doc.replace(ed_glob.VERSION.encode('utf-8'),
+                      VERSION_MARK.encode('utf-8'))
+    path = os.path.join(golden_dir, u"%s.%s" % (fname, ext))
+    if update:
+        if not os.path.exists(golden_dir):
+            os.makedirs(golden_dir)
+        handle = open(path, 'wb')
+        handle.write(doc)
+        handle.close()
+        return None
+
+    if not os.path.exists(path):
+        return "%s: no golden file (run with -g -R %s to create it)" % \
+               (path, ORIGIN_REV)
+    handle = open(path, 'rb')
+    golden = handle.read()
+    handle.close()
+    if golden == doc:
+        return None
+
+    diff = difflib.unified_diff(golden.decode('utf-8', 'replace').splitlines(),
+                                doc.decode('utf-8', 'replace').splitlines(),
+                                'golden', 'generated', lineterm='', n=1)
+    diff = u"\n    ".join(list(diff)[:12])
+    return u"%s: output differs\n    %s" % (path, diff)
+
+def TimeGenerator(gen, gen_id, stc, repeat):
+    """Times generating a document from the text control
+    @param gen: generator.Generator
+    @param gen_id: id of the generator to use
+    @param stc: text control holding the document
+    @param repeat: number of times to repeat the measurement
+    @return: (size of the output, fastest time in seconds)
+
+    """
+    best = None
+    for run in xrange(repeat):
+        start = time.time()
+        ext, doc = Generate(gen, gen_id, stc)
+        secs = time.time() - start
+        if best is None or secs < best:
+            best = secs
+    return len(doc), best
+
+def LoadReport(path):
+    """Loads a report written by an earlier run
+    @param path: path to report
+    @return: dict of (file, generator, size) -> row
+
+    """
+    report = dict()
+    handle = open(path, 'rb')
+    for row in csv.DictReader(handle):
+        report[(row['file'], row['generator'], int(row['size']))] = row
+    handle.close()
+    return report
+
+def CompareReports(results, baseline, tolerance):
+    """Compares the throughput of the results against the baseline
+    @param results: list of result dicts
+    @param baseline: dict returned by LoadReport
+    @param tolerance: allowed slowdown as a fraction
+    @return: list of regression descriptions
+
+    """
+    regressions = list()
+    for row in results:
+        key = (row['file'], row['generator'], int(row['size']))
+        base = baseline.get(key)
+        if base is None:
+            continue
+        old = float(base['throughput'])
+        new = float(row['throughput'])
+        if new < old * (1.0 - tolerance):
+            regressions.append("%s %s (%d bytes): %.0f -> %.0f bytes/s" % \
+                               (key[0], key[1], key[2], old, new))
+    return regressions
+
+#--------------------------------------------------------------------------#
+
+def Main():
+    """Parses the command line and runs the checks and benchmarks"""
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "b:f:gho:R:r:s:t:")
+    except getopt.GetoptError, msg:
+        print >> sys.stderr, str(msg)
+        print __doc__
+        sys.exit(2)
+
+    baseline = None
+    name_filter = ''
+    update = False
+    outfile = 'genbench.csv'
+    revision = None
+    repeat = 3
+    sizes = [1, 10]
+    tolerance = 0.25
+    for opt, val in opts:
+        if opt == '-b':
+            baseline = LoadReport(val)
+        elif opt == '-f':
+            name_filter = val
+        elif opt == '-g':
+            update = True
+        elif opt == '-h':
+            print __doc__
+            sys.exit(0)
+        elif opt == '-o':
+            outfile = val
+        elif opt == '-R':
+            revision = val
+        elif opt == '-r':
+            repeat = max(int(val), 1)
+        elif opt == '-s':
+            sizes = [int(size) for size in val.split(',')
+                     if size.strip() and int(size)]
+        elif opt == '-t':
+            tolerance = float(val) / 100
+
+    tree = None
+    if revision is not None:
+        tree = ExportRevision(revision)
+        sys.path.insert(0, os.path.join(tree, 'src'))
+
+    xvfb = StartVirtualDisplay()
+    try:
+        app, cache = InitEditra()
+
+        import wx
+        import ed_glob
+        import ed_stc
+        import generator
+        frame = wx.Frame(None, wx.ID_ANY, "Generator Benchmark")
+        stc = ed_stc.EditraStc(frame, wx.ID_ANY)
+        stc.SetAutoComplete(False)
+        gen = generator.Generator(app.GetPluginManager())
+        gen_ids = [('html', ed_glob.ID_HTML_GEN),
+                   ('latex', ed_glob.ID_TEX_GEN),
+                   ('rtf', ed_glob.ID_RTF_GEN)]
+
+        golden_dir = GetGoldenDir(TEST_DIR)
+        failures = list()
+        results = list()
+        samples = GetSamples(TEST_DIR, name_filter)
+        for fname, txt, enc in samples:
+            print "Checking %s" % fname
+            LoadSample(stc, fname, txt, enc)
+            for name, gen_id in gen_ids:
+                diff = CheckGolden(gen, gen_id, stc, fname,
+                                   golden_dir, update)
+                if diff is not None:
+                    failures.append(diff)
+
+            for size in sizes:
+                scaled = ScaleText(txt, size * MEGABYTE)
+                if scaled is txt:
+                    continue
+                LoadSample(stc, fname, scaled, enc)
+                length = stc.GetLength()
+                for name, gen_id in gen_ids:
+                    print "Timing %s %s (%d bytes)" % (name, fname, length)
+                    sys.stdout.flush()
+                    output, secs = TimeGenerator(gen, gen_id, stc, repeat)
+                    results.append(dict(file=fname, generator=name,
+                                        size=length, output=output,
+                                        seconds="%.6f" % secs,
+                                        throughput="%.0f" % \
+                                        (length / max(secs, 1e-6))))
+
+        if len(results):
+            handle = open(outfile, 'wb')
+            writer = csv.DictWriter(handle, FIELDS)
+            writer.writerow(dict(zip(FIELDS, FIELDS)))
+            writer.writerows(results)
+            handle.close()
+            print "Report written to %s" % outfile
+            if update:
+                shutil.copy(outfile, os.path.join(golden_dir, BASELINE))
+
+        frame.Destroy()
+        shutil.rmtree(cache, True)
+    finally:
+        if xvfb is not None:
+            os.kill(xvfb.pid, signal.SIGTERM)
+        if tree is not None:
+            shutil.rmtree(tree, True)
+
+    if baseline is None and not update and \
+       os.path.exists(os.path.join(golden_dir, BASELINE)):
+        baseline = LoadReport(os.path.join(golden_dir, BASELINE))
+
+    status = 0
+    if update:
+        print "Golden files written to %s" % golden_dir
+    elif len(failures):
+        print "Output differs from the golden files:"
+        for failure in failures:
+            print "  " + failure
+        status = 1
+    else:
+        print "Output matches the golden files"
+
+    if baseline is not None and len(results):
+        regressions = CompareReports(results, baseline, tolerance)
+        if len(regressions):
+            print "Throughput regressions from baseline:"
+            for regression in regressions:
+                print "  " + regression
+            status = 1
+        else:
+            print "No throughput regressions from baseline"
+    sys.exit(status)
+
+#--------------------------------------------------------------------------#
+
+if __name__ == '__main__':
+    Main()
@@ -0,0 +1,349 @@
+#!/usr/bin/env python
+###############################################################################
+# Name: bench_lexers.py                                                       #
+# Purpose: Benchmark lexer configuration and colourising over the test files  #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2007 Cody Precord <staff@editra.org>                         #
+# Licence: wxWindows Licence                                                  #
+###############################################################################
+
+"""
+bench_lexers.py -- Times how long Editra's text control takes to configure
+                   the lexer, colourise, compute fold levels and restyle after
+                   an edit for each of the sample files in the tests directory.
+
+Each sample is also scaled up to the requested sizes by repeating its
+contents so that it can be seen how each lexer scales with document size.
+The results are written out as a CSV report that can be passed back in with
+the -b option on a later run to detect regressions.
+
+If there is no display available on Linux the benchmarks are run under a
+virtual Xvfb display.
+
+Usage:
+
+    bench_lexers.py [options]
+
+Options:
+
+    -b <file>      Baseline report to compare the results against. Any
+                   timings that are slower than the baseline by more than the
+                   tolerance are reported and the exit status is set to 1.
+
+    -f <filter>    Only benchmark the sample files whose name contains
+                   filter.
+
+    -o <file>      File to write the report to (default: lexbench.csv)
+
+    -r <#>         Number of times to repeat each measurement, the fastest
+                   time is reported (default: 3)
+
+    -s <sizes>     Comma separated list of sizes in megabytes to scale the
+                   samples up to. Use 0 to only run the samples as they are
+                   (default: 1,10,100)
+
+    -t <percent>   Tolerance used when comparing against a baseline
+                   (default: 25)
+
+"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__svnid__ = "$Id$"
+__revision__ = "$Revision$"
+
+#--------------------------------------------------------------------------#
+# Dependancies
+import os
+import sys
+import csv
+import time
+import getopt
+import signal
+import tempfile
+import subprocess
+
+# Editra's source modules import each other by name
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                       os.pardir, 'src')
+sys.path.insert(0, os.path.normpath(SRC_DIR))
+
+#--------------------------------------------------------------------------#
+# Globals
+
+FIELDS = ['file', 'lexer', 'size', 'lines', 'configure', 'colourise',
+          'fold', 'restyle']
+TIMINGS = FIELDS[4:]
+EDIT_CYCLES = 50       # Number of edits made for the restyle timing
+MEGABYTE = 1024 * 1024
+
+#--------------------------------------------------------------------------#
+
+def StartVirtualDisplay():
+    """Starts an Xvfb server to run the benchmarks on if there is no
+    display available.
+    @return: Popen object of the server or None if one was not needed
+
+    """
+    if not sys.platform.startswith('linux') or os.environ.get('DISPLAY'):
+        return None
+
+    for num in xrange(99, 199):
+        if os.path.exists('/tmp/.X%d-lock' % num):
+            continue
+        try:
+            proc = subprocess.Popen(['Xvfb', ':%d' % num, '-screen', '0',
+                                     '1024x768x24', '-nolisten', 'tcp'],
+                                    stdout=open(os.devnull, 'w'),
+                                    stderr=subprocess.STDOUT)
+        except OSError, msg:
+            print >> sys.stderr, "Unable to start Xvfb: %s" % str(msg)
+            sys.exit(2)
+
+        # Give the server a moment to start accepting connections
+        time.sleep(1)
+        if proc.poll() is None:
+            os.environ['DISPLAY'] = ':%d' % num
+            return proc
+    print >> sys.stderr, "Unable to find a free display for Xvfb"
+    sys.exit(2)
+
+def InitEditra():
+    """Sets up just enough of Editra's configuration to be able to create
+    text controls. The default profile is used so that the results do not
+    depend on the users settings.
+    @return: the wx.App and a temporary cache directory
+
+    """
+    import wx
+    app = wx.PySimpleApp()
+
+    import ed_glob
+    import util
+    import profiler
+    profiler.Profile().LoadDefaults()
+    for key, cdir in [('SYS_STYLES_DIR', 'styles'), ('STYLES_DIR', 'styles'),
+                      ('SYSPIX_DIR', 'pixmaps'), ('TEST_DIR', 'tests')]:
+        ed_glob.CONFIG[key] = util.ResolvConfigDir(cdir, True)
+    cache = tempfile.mkdtemp(prefix='lexbench')
+    ed_glob.CONFIG['CACHE_DIR'] = cache + os.sep
+    return app, cache
+
+def GetSamples(test_dir, name_filter=u''):
+    """Gets the list of sample files to benchmark
+    @param test_dir: directory holding the sample files
+    @keyword name_filter: only return files containing this string
+    @return: sorted list of (name, text, encoding) tuples
+
+    """
+    import util
+    samples = list()
+    for fname in sorted(os.listdir(test_dir)):
+        path = os.path.join(test_dir, fname)
+        if not os.path.isfile(path) or name_filter not in fname:
+            continue
+        txt, enc = util.GetDecodedText(path)
+        if len(txt):
+            samples.append((fname, txt, enc))
+    return samples
+
+def ScaleText(txt, size):
+    """Repeats the text until it is at least size bytes long
+    @param txt: text to scale
+    @param size: minimum size in bytes
+    @return: scaled text
+
+    """
+    if not size or len(txt) >= size:
+        return txt
+    if not txt.endswith(u'\n'):
+        txt += u'\n'
+    return txt * (size / len(txt) + 1)
+
+def Timed(func, *args):
+    """Calls func with the given arguments
+    @return: time taken in seconds
+
+    """
+    start = time.time()
+    func(*args)
+    return time.time() - start
+
+def BenchText(stc, fname, txt, enc, repeat):
+    """Runs the benchmarks on the given text
+    @param stc: EditraStc to run the benchmarks in
+    @param fname: name of the sample the text is from
+    @param txt: text to benchmark
+    @param enc: encoding the text was decoded from
+    @param repeat: number of times to repeat each measurement
+    @return: dict of results
+
+    """
+    import wx
+    import util
+    ext = util.GetExtension(fname).lower()
+
+    stc.ClearAll()
+    stc.SetLexer(wx.stc.STC_LEX_NULL)
+    stc.SetText(txt, enc)
+    stc.EmptyUndoBuffer()
+    result = dict(file=fname, size=stc.GetLength(),
+                  lines=stc.GetLineCount())
+    for key in TIMINGS:
+        result[key] = None
+
+    for run in xrange(repeat):
+        stc.SetLexer(wx.stc.STC_LEX_NULL)
+        cfg = Timed(stc.ConfigureLexer, ext)
+
+        # Colourise once without folding and again with it so the cost
+        # of computing the fold levels can be seen on its own.
+        stc.SetProperty("fold", "0")
+        stc.ClearDocumentStyle()
+        colour = Timed(stc.Colourise, 0, -1)
+        stc.SetProperty("fold", "1")
+        stc.ClearDocumentStyle()
+        fold = max(Timed(stc.Colourise, 0, -1) - colour, 0)
+
+        # Insert a character at points through the document and restyle
+        # from the point of change the way the control does while typing.
+        length = stc.GetLength()
+        start = time.time()
+        for cycle in xrange(EDIT_CYCLES):
+            pos = (length * cycle) / EDIT_CYCLES
+            stc.InsertText(pos, u" ")
+            stc.Colourise(stc.GetEndStyled(), -1)
+        restyle = time.time() - start
+        for cycle in xrange(EDIT_CYCLES):
+            stc.Undo()
+        stc.Colourise(0, -1)
+
+        for key, val in (('configure', cfg), ('colourise', colour),
+                         ('fold', fold), ('restyle', restyle)):
+            if result[key] is None or val < result[key]:
+                result[key] = val
+
+    result['lexer'] = stc.GetLexer()
+    for key in TIMINGS:
+        result[key] = "%.6f" % result[key]
+    return result
+
+def LoadReport(path):
+    """Loads a report written by an earlier run
+    @param path: path to report
+    @return: dict of (file, size) -> row
+
+    """
+    report = dict()
+    handle = open(path, 'rb')
+    for row in csv.DictReader(handle):
+        report[(row['file'], int(row['size']))] = row
+    handle.close()
+    return report
+
+def CompareReports(results, baseline, tolerance):
+    """Compares the results against the baseline
+    @param results: list of result dicts
+    @param baseline: dict returned by LoadReport
+    @param tolerance: allowed slowdown as a fraction
+    @return: list of regression descriptions
+
+    """
+    regressions = list()
+    for row in results:
+        base = baseline.get((row['file'], int(row['size'])))
+        if base is None:
+            continue
+        for key in TIMINGS:
+            old = float(base[key])
+            new = float(row[key])
+            # Ignore differences that are below the timer resolution
+            if new - old > 0.001 and new > old * (1.0 + tolerance):
+                regressions.append("%s (%d bytes) %s: %.4fs -> %.4fs" % \
+                                   (row['file'], int(row['size']),
+                                    key, old, new))
+    return regressions
+
+#--------------------------------------------------------------------------#
+
+def Main():
+    """Parses the command line and runs the benchmarks"""
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "b:f:ho:r:s:t:")
+    except getopt.GetoptError, msg:
+        print >> sys.stderr, str(msg)
+        print __doc__
+        sys.exit(2)
+
+    baseline = None
+    name_filter = ''
+    outfile = 'lexbench.csv'
+    repeat = 3
+    sizes = [1, 10, 100]
+    tolerance = 0.25
+    for opt, val in opts:
+        if opt == '-b':
+            baseline = LoadReport(val)
+        elif opt == '-f':
+            name_filter = val
+        elif opt == '-h':
+            print __doc__
+            sys.exit(0)
+        elif opt == '-o':
+            outfile = val
+        elif opt == '-r':
+            repeat = max(int(val), 1)
+        elif opt == '-s':
+            sizes = [int(size) for size in val.split(',') if size.strip()]
+        elif opt == '-t':
+            tolerance = float(val) / 100
+
+    xvfb = StartVirtualDisplay()
+    try:
+        app, cache = InitEditra()
+
+        import wx
+        import ed_glob
+        import ed_stc
+        frame = wx.Frame(None, wx.ID_ANY, "Lexer Benchmark")
+        stc = ed_stc.EditraStc(frame, wx.ID_ANY)
+        stc.SetAutoComplete(False)
+
+        results = list()
+        for fname, txt, enc in GetSamples(ed_glob.CONFIG['TEST_DIR'], name_filter):
+            for size in [0] + [size for size in sizes if size]:
+                scaled = ScaleText(txt, size * MEGABYTE)
+                if size and scaled is txt:
+                    continue
+                print "Running %s (%d characters)" % (fname, len(scaled))
+                results.append(BenchText(stc, fname, scaled, enc, repeat))
+                sys.stdout.flush()
+
+        handle = open(outfile, 'wb')
+        writer = csv.DictWriter(handle, FIELDS)
+        writer.writerow(dict(zip(FIELDS, FIELDS)))
+        writer.writerows(results)
+        handle.close()
+        print "Report written to %s" % outfile
+
+        frame.Destroy()
+        app.Destroy()
+        for fname in os.listdir(cache):
+            os.remove(os.path.join(cache, fname))
+        os.rmdir(cache)
+    finally:
+        if xvfb is not None:
+            os.kill(xvfb.pid, signal.SIGTERM)
+
+    if baseline is not None:
+        regressions = CompareReports(results, baseline, tolerance)
+        if len(regressions):
+            print "Regressions from baseline:"
+            for regression in regressions:
+                print "  " + regression
+            sys.exit(1)
+        print "No regressions from baseline"
+
+#--------------------------------------------------------------------------#
+
+if __name__ == '__main__':
+    Main()
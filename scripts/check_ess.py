@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+###############################################################################
+# Name: check_ess.py                                                          #
+# Purpose: Check the Editra Style Sheet parser against known cases            #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2007 Cody Precord <staff@editra.org>                         #
+# Licence: wxWindows Licence                                                  #
+###############################################################################
+
+"""
+check_ess.py -- Parses a set of small style sheets with the Editra Style
+                Sheet parser and checks the styles and diagnostics that it
+                returns. Malformed sheets are also timed to make sure that
+                the parser does not take too long on text that is still
+                being typed, since the style editor validates its preview
+                after each pause in typing.
+
+Usage:
+
+    check_ess.py [options]
+
+Options:
+
+    -v             Print each case as it is checked
+
+"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__svnid__ = "$Id$"
+__revision__ = "$Revision$"
+
+#--------------------------------------------------------------------------#
+# Dependancies
+import os
+import sys
+import time
+import getopt
+
+# Editra's source modules import each other by name
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                       os.pardir, 'src')
+sys.path.insert(0, os.path.normpath(SRC_DIR))
+
+#--------------------------------------------------------------------------#
+# Globals
+
+MAX_SECONDS = 0.5       # Max time to parse one of the timed sheets
+
+# (style sheet, expected styles, expected diagnostic messages)
+CASES = [
+    (u"a { fore:#000000; }",
+     {u'a' : u'fore:#000000'}, []),
+    # Comments between the tokens
+    (u"a /* x */ { fore:#000000; }",
+     {u'a' : u'fore:#000000'}, []),
+    (u"a/*x*/{fore:#000000;}/* y */b /* z */ /* w */ {back:#FFFFFF;}",
+     {u'a' : u'fore:#000000', u'b' : u'back:#FFFFFF'}, []),
+    (u"a { fore: #000000; /* black */ back: /* white */ #FFFFFF; }",
+     {u'a' : u'fore:#000000,back:#FFFFFF'}, []),
+    (u"a { fore:#000000; } /* tail */",
+     {u'a' : u'fore:#000000'}, []),
+    (u"/* {braces} in a comment */ a { /* } */ fore:#000000; }",
+     {u'a' : u'fore:#000000'}, []),
+    # Language blocks
+    (u"@python /* c */ { keyword_style /* k */ { fore:#112233; } }",
+     {u'python.keyword_style' : u'fore:#112233'}, []),
+    (u"@python { a { fore:#112233; }",
+     {u'python.a' : u'fore:#112233'}, [u"Missing } at end of @python"]),
+    # Errors
+    (u"a /* x { fore:#000000; }",
+     {}, [u"Unexpected a", u"Comment is not closed"]),
+    (u"a { fore:#000000 ",
+     {u'a' : u'fore:#000000'}, [u"Missing } in the definition of a"]),
+    (u"a b { fore:#000000; }",
+     {u'b' : u'fore:#000000'}, [u"Unexpected a"]),
+    (u"{ fore:#000000; }",
+     {}, [u"Missing style name before {"]),
+    (u"a { fore:#00000; }",
+     {}, [u"Bad color value for fore: #00000"]),
+]
+
+# Malformed sheets that must be parsed in under MAX_SECONDS
+TIMED = [
+    u"tag { " + u"/* comment */ fore:#000000; " * 40,
+    u"tag /* a */ { " + u"/* comment */ " * 40 + u"b",
+    u"tag { " + u"/* comment */ / " * 40,
+    u"@python { " + u"/* comment */ " * 40,
+]
+
+#--------------------------------------------------------------------------#
+
+def CheckCase(sheet, styles, messages):
+    """Parses a style sheet and compares the result with what is expected
+    @param sheet: style sheet text
+    @param styles: dict of expected tag -> style string
+    @param messages: list of expected diagnostic messages
+    @return: description of the difference or None if they match
+
+    """
+    import ed_style
+    found, diagnostics = ed_style.ParseStyleSheet(sheet)
+    found_msgs = [diag[3] for diag in diagnostics]
+    if found != styles:
+        return u"%r\n    styles %r != %r" % (sheet, found, styles)
+    elif found_msgs != messages:
+        return u"%r\n    diagnostics %r != %r" % (sheet, found_msgs, messages)
+    return None
+
+def CheckTime(sheet):
+    """Times parsing a style sheet
+    @param sheet: style sheet text
+    @return: description of the problem or None if it was fast enough
+
+    """
+    import ed_style
+    start = time.time()
+    ed_style.ParseStyleSheet(sheet)
+    secs = time.time() - start
+    if secs > MAX_SECONDS:
+        return u"%r\n    took %.2f seconds" % (sheet[:40] + u"...", secs)
+    return None
+
+#--------------------------------------------------------------------------#
+
+def Main():
+    """Parses the command line and runs the checks"""
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "hv")
+    except getopt.GetoptError, msg:
+        print >> sys.stderr, str(msg)
+        print __doc__
+        sys.exit(2)
+
+    verbose = False
+    for opt, val in opts:
+        if opt == '-h':
+            print __doc__
+            sys.exit(0)
+        elif opt == '-v':
+            verbose = True
+
+    failures = list()
+    for sheet, styles, messages in CASES:
+        if verbose:
+            print "Checking %r" % sheet
+        failure = CheckCase(sheet, styles, messages)
+        if failure is not None:
+            failures.append(failure)
+
+    for sheet in TIMED:
+        if verbose:
+            print "Timing %r" % (sheet[:40] + u"...")
+        failure = CheckTime(sheet)
+        if failure is not None:
+            failures.append(failure)
+
+    if len(failures):
+        print "Style sheet parser checks failed:"
+        for failure in failures:
+            print "  " + failure
+        sys.exit(1)
+    print "All %d style sheet parser checks passed" % (len(CASES) + len(TIMED))
+
+#--------------------------------------------------------------------------#
+
+if __name__ == '__main__':
+    Main()
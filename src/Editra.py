@@ -41,12 +41,14 @@ from profiler import Profile_Del, Profile_Get, Profile_Set
 import util
 import dev_tool
 import ed_main
+import ed_export
 import ed_art
 import plugin
 import extern.events as events
 
 #--------------------------------------------------------------------------#
 # Global Variables
+FONT_ENUM_DELAY = 3000      # Msec after startup to enumerate the fonts
 
 _ = wx.GetTranslation
 #--------------------------------------------------------------------------#
@@ -421,7 +423,8 @@ def Main():
 
     """
     shortopts = "dhv"
-    longopts = ['debug', 'help', 'oldPath=', 'version']
+    longopts = ['debug', 'export=', 'help', 'jobs=', 'oldPath=', 'out=',
+                'version']
     try:
         opts, args = getopt.getopt(sys.argv[1:], shortopts, longopts)
     except getopt.GetoptError, msg:
@@ -445,8 +448,13 @@ def Main():
                    "  -v         Print version number and exit\n"
                    "\nLong Arguments:\n"
                    "  --debug    Turn on console debugging\n"
+                   "  --export   Export the files to html, latex or rtf "
+                   "without\n"
+                   "             opening the editor\n"
                    "  --help     Show this help message\n"
+                   "  --jobs     Number of processes to export with\n"
                    "  --oldPath  Don't use this!!\n"
+                   "  --out      Directory to export to (default: .)\n"
                    "  --version  Print version number and exit\n"
                   ) % ed_glob.VERSION
             exit(0)
@@ -457,6 +465,18 @@ def Main():
         if True in [x[0] in ['-d', '--debug'] for x in opts]:
             ed_glob.DEBUG = True
 
+    # Export files without starting the editor
+    opts = dict(opts)
+    if '--export' in opts:
+        InitConfig()
+        try:
+            jobs = int(opts.get('--jobs', 0)) or None
+        except ValueError:
+            jobs = None
+        files = [util.DecodeString(os.path.abspath(arg)) for arg in args]
+        exit(ed_export.ExportFiles(opts['--export'], opts.get('--out', u'.'),
+                                   files, jobs))
+
     # We are ready to run so fire up the config and launch the app
     profile_updated = InitConfig()
 
@@ -519,6 +539,11 @@ def Main():
         except IndexError:
             dev_tool.DEBUGP("[main][err] IndexError on commandline args")
 
+    # Enumerating the fonts blocks for a while on some systems so get the
+    # list for the style editor while the user is not waiting on it.
+    import style_editor
+    wx.CallLater(FONT_ENUM_DELAY, style_editor.GetFontFaces)
+
     # 3. Start Applications Main Loop
     dev_tool.DEBUGP("[main_info] Starting MainLoop...")
     editra_app.MainLoop()
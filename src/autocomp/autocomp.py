@@ -34,13 +34,18 @@ __revision__ = "$Revision$"
 #--------------------------------------------------------------------------#
 # Dependancies
 import wx.stc as stc
+import ed_glob
+import util
+from profiler import Profile_Get
+import wordcomp
 #--------------------------------------------------------------------------#
 
 class AutoCompService(object):
     """Interface to retrieve and provide autcompletion and
     calltip information to an stc control. The plain text
     (empty) completion provider is built in. All other provders
-    are loaded from external modules on request.
+    are loaded from external modules on request. Word completion
+    is provided for all languages.
 
     """
     def __init__(self, parent):
@@ -51,6 +56,7 @@ class AutoCompService(object):
         object.__init__(self)
         self._buffer = parent
         self._completer = None
+        self._words = None
 
     def GetAutoCompKeys(self):
         """Returns the list of key codes for activating the
@@ -85,6 +91,19 @@ class AutoCompService(object):
         else:
             return u''
 
+    def GetWordCompList(self, prefix, keywords=u''):
+        """Retrieves the words that complete a prefix, the words used in
+        the open documents of the same language come first ordered by how
+        often they are used followed by the matching keywords.
+        @param prefix: start of the word to complete
+        @keyword keywords: space separated keywords of the language
+        @return: list of words
+
+        """
+        if self._words is None:
+            self._words = wordcomp.Completer(self._buffer)
+        return self._words.GetWordCompList(prefix, keywords)
+
     def GetCallTip(self, command, namespace = None):
         """Returns the calltip string for a command
         @param command: command to get callip for
@@ -121,12 +140,36 @@ class AutoCompService(object):
         @param lex_value: lexer id to get autocomp service for
 
         """
+        # The words are indexed by language so start over with the new one,
+        # the buffer is not scanned until words are first requested.
+        if self._words is not None:
+            self._words.Detach()
+        self._words = wordcomp.Completer(self._buffer)
+
         if lex_value == stc.STC_LEX_PYTHON:
             import pycomp
             self._completer = pycomp.Completer(self._buffer)
+            if Profile_Get('AUTO_COMP_INDEX', 'bool', True):
+                cache = ed_glob.CONFIG['CACHE_DIR'] + \
+                        util.GetPathChar() + u'pysymbols'
+                pycomp.IndexModules(cache, self._completer.GetSysPath())
         else:
             pass
 
+    def NotifyModified(self, position, lines_added):
+        """Tells the completer that text has been inserted or deleted in
+        the buffer so that it can update what it has cached about the
+        modified lines.
+        @param position: position of the modification
+        @param lines_added: number of lines added (negative when deleted)
+
+        """
+        if self._words is not None:
+            self._words.NotifyModified(position, lines_added)
+        if self._completer != None and hasattr(self._completer, \
+                                               'NotifyModified'):
+            self._completer.NotifyModified(position, lines_added)
+
     def UpdateNamespace(self, opt = None):
         """Tells the completer to update its namespace
         @keyword opt: specific option to pass to completer for updating the
@@ -12,7 +12,10 @@
 # AUTHOR: Cody Precord                                                     #
 # LANGUAGE: Python                                                         #
 # SUMMARY:                                                                 #
-#    Provides completion and calltip support for python documents          #
+#    Provides completion and calltip support for python documents. The     #
+# buffer is parsed into a static model of the names it defines and the     #
+# modules it imports (see pysymbols.py), none of the code in the buffer or #
+# in the modules it uses is ever imported or executed.                     #
 #                                                                          #
 # METHODS:
 #
@@ -27,31 +30,29 @@ __revision__ = "$Revision$"
 # Dependancies
 import sys
 import os
-import imp
-from wx.py import introspect
+import re
+import wx
+import util
+import pysymbols
+import pyworker
 
 #--------------------------------------------------------------------------#
-# BUGS: While trying to balance performance and uselfullness its left me
-#       with a bit to think about. Currently if any imports in the source
-#       buffer fail the autocomplete will fail as well.
-#
-#       Also if an import launches an application (i.e wx.App.MainLoop) the
-#       application will open. Then when it comes time to close Editra it will
-#       cause it to lock and crash due to missing references.
-#
-#       Autocompletion pops up when inside of comment blocks. This probably
+# Globals
+INDEXER = None      # pysymbols.Indexer shared by all completers
+WORKER = None       # pyworker.Worker shared by all completers
+RE_EOL = re.compile(u'\r\n|\r|\n')
+PARSE_DELAY = 1500  # Msecs to wait after an update before parsing the buffer
+
+#--------------------------------------------------------------------------#
+# BUGS: Autocompletion pops up when inside of comment blocks. This probably
 #       should be the case.
+#
+#       Types are only inferred for simple assignments, so names assigned from
+#       the return value of a function can not be completed.
 class Completer(object):
     """Code completer provider
-    @todo: This file was hacked together in a rather fast manner need to do
-           a code cleanup in the near future.
-    @note: This approach is fairly fast, but suffers from a number of other
-           draw backs. May need to look into writing a parser or even better
-           a static lexer. But brain is tired so think about it and come back.
-    @todo: Currently supports autocompletion only for imported libraries and 
-           their decendants. The code is in place but currently dissabled to 
-           allow for the autcompletion of local objects, due to some 
-           troublesome bugs that come up in certain cases.
+    @note: The symbols are looked up in a static model of the buffer, names
+           that are only created at runtime are not known to it.
 
     """
     def __init__(self, stc_buffer):
@@ -66,9 +67,13 @@ class Completer(object):
         self._calltip_keys = [ord('(')]
         self._case_sensitive = False
         self._collector = list()   # Collects important atoms from the document
-        self._namespaces = dict()  # Collection of namespace dictionaries
-        self._locals = dict()
-        self._modules = sys.modules.keys()
+        self._lines = None         # Import statement on each line or None
+        self._dirty = True         # The collector needs to be rebuilt
+        self._scope = None         # Module symbol for the buffer
+        self._parsed = None        # Module symbol from the last full parse
+        self._timer = None         # Deferred full parse of the buffer
+        self._modified = True      # Buffer changed since the last full parse
+        self._stmts = dict()       # Import statement -> parsed module symbol
         self._syspath = sys.path[:]
         # Adjust working path to documents path
         self._syspath.insert(0, os.path.dirname(self._buffer.GetFileName()))
@@ -82,32 +87,37 @@ class Completer(object):
                 self._syspath.remove('.')
             except ValueError:
                 break
-
-        # Need to set these two values in sys for introspect
-        # to function properly.
-        sys.ps1 = '>>> '
-        sys.ps2 = '... '
+        self._index = pysymbols.SymbolIndex(self._syspath, self.Introspect)
 
     def CollectNamespace(self):
         """Analyzes the buffer and collects available namespace
         data into the collector.
-        @note: Only collects import statements
-
-        """
-        self._collector = list()        # Clear the collector TEMP
-        for line in range(0, self._buffer.GetLineCount()):
-            text = self._buffer.GetLine(line)
-            if text not in self._collector and 'import ' in text:
-                self._collector.append(text)
-        tmp = list()
-        for item in self._collector:
-            pieces = item.split()
-            if pieces[0] not in "import from":
-                tmp.append(item)
-        for item in tmp:
-            self._collector.remove(item)
-        return
-                    
+        @note: Only collects import statements. The buffer is only scanned
+               the first time, after that the import statements are kept up
+               to date by L{NotifyModified}.
+        @return: whether the collected import statements changed
+
+        """
+        if self._lines is None:
+            self._lines = [GetImportText(text) for text in
+                           RE_EOL.split(self._buffer.GetText())]
+            self._dirty = True
+
+        if not self._dirty:
+            return False
+
+        collector = list()
+        seen = set()
+        for text in self._lines:
+            if text is not None and text not in seen:
+                seen.add(text)
+                collector.append(text)
+        self._dirty = False
+        if collector == self._collector:
+            return False
+        self._collector = collector
+        return True
+
     def GetAutoCompKeys(self):
         """Returns the list of key codes for activating the
         autocompletion.
@@ -127,10 +137,11 @@ class Completer(object):
         @keyword namespace: namespace to do lookup in
 
         """
-        if not len(self._locals) and namespace == None:
-            self.UpdateNamespace(True)
-        namespace = self._locals
-        lst = introspect.getAutoCompleteList(command, namespace)
+        sym = self.LookupSymbol(command)
+        if sym is None:
+            return list()
+        lst = self._index.GetMembers(sym).keys()
+        lst.sort(lambda x, y: cmp(x.upper(), y.upper()))
         return lst
 
     def GetAutoCompStops(self):
@@ -151,11 +162,11 @@ class Completer(object):
         @keyword namespace: namespace to do lookup in
 
         """
-        if not len(self._locals) and namespace == None:
-            self.UpdateNamespace(True)
-        namespace = self._locals
-        calltip = introspect.getCallTip(command, namespace)
-        return calltip[2]
+        sym = self.LookupSymbol(command)
+        if sym is None or \
+           sym.kind not in (pysymbols.SYM_CLASS, pysymbols.SYM_FUNCTION):
+            return u''
+        return sym.GetCallTip()
 
     def GetCallTipKeys(self):
         """Returns the list of keys to activate a calltip on
@@ -178,6 +189,65 @@ class Completer(object):
         else:
             return False
 
+    def Introspect(self, dotted):
+        """Describes a module that has no source by importing it in the
+        helper process.
+        @param dotted: dotted module name
+        @return: L{pysymbols.Symbol} or None if it could not be described
+                 in time.
+
+        """
+        global WORKER
+        if WORKER is None:
+            WORKER = pyworker.Worker()
+        return WORKER.GetModule(dotted, self._syspath)
+
+    def LookupSymbol(self, command):
+        """Finds the symbol that a command string refers to
+        @param command: dotted name (i.e os.path or os.path.)
+        @return: L{pysymbols.Symbol} or None
+
+        """
+        if self._scope is None:
+            self.UpdateNamespace(True)
+        command = command.strip().rstrip(u'.')
+        if not len(command):
+            return None
+        line = self._buffer.GetCurrentLine() + 1
+        return self._index.Lookup(self._scope, command, line)
+
+    def NotifyModified(self, position, lines_added):
+        """Updates the cached import statements of the lines changed by an
+        insertion or deletion of text in the buffer.
+        @param position: position the text was inserted or deleted at
+        @param lines_added: number of lines added (negative when deleted)
+
+        """
+        self._modified = True
+        if self._timer is not None and self._timer.IsRunning():
+            # Hold off the deferred parse while the buffer is being edited
+            self._timer.Restart(PARSE_DELAY)
+
+        if self._lines is None:
+            return
+
+        first = self._buffer.LineFromPosition(position)
+        if lines_added > 0:
+            self._lines[first + 1:first + 1] = [None] * lines_added
+        elif lines_added < 0:
+            del self._lines[first + 1:first + 1 - lines_added]
+
+        if len(self._lines) != self._buffer.GetLineCount():
+            # Out of sync, rescan the next time the namespace is collected
+            self._lines = None
+            return
+
+        for line in xrange(first, first + max(lines_added, 0) + 1):
+            text = GetImportText(self._buffer.GetLine(line))
+            if text != self._lines[line]:
+                self._lines[line] = text
+                self._dirty = True
+
     def SetCaseSensitive(self, value):
         """Sets whether the completer should be case sensitive
         or not, and returns True if the value was set.
@@ -190,52 +260,129 @@ class Completer(object):
         else:
             return False
 
+    def GetSysPath(self):
+        """Gets the directories modules are looked up in
+        @return: list of paths
+
+        """
+        return list(self._syspath)
+
     def UpdateNamespace(self, imports_only=False):
         """Updates the namespace to search for autocompletion lists
         and calltips in.
-        @keyword imports_only: build namespace from import statements only
-                               without using local namespace
+        @keyword imports_only: only update the import statements from the
+                               cached lines and leave parsing the whole
+                               buffer to a deferred refresh that runs once
+                               updates stop for L{PARSE_DELAY} msecs.
+        @return: whether the namespace was updated
 
         """
-        if imports_only:
-            self.CollectNamespace()
-            tmp = list()
-            for item in self._collector:
-                tmp.append(item.strip())
-            text = "\n".join(tmp)
-        else:
-            if not hasattr(self._buffer, 'GetText'):
-                return False
-            text = self._buffer.GetText()
+        if not hasattr(self._buffer, 'GetText'):
+            return False
 
-        dirname, filename = os.path.split(self._buffer.GetFileName())
+        dirname = os.path.dirname(self._buffer.GetFileName())
         if dirname not in self._syspath:
             self._syspath.insert(0, dirname)
-        syspath = sys.path
-        sys.path = self._syspath
-        text = text.replace('\r\n', '\n')
-        text = text.replace('\r', '\n')
-        name = dirname or filename
-        module = imp.new_module(name)
-        newspace = module.__dict__.copy()
-        try:
-            try:
-                code = compile(text, name, 'exec')
-            except SyntaxError:
-                return False
-            try:
-                exec code in newspace
-            except Exception:
+            self._index = pysymbols.SymbolIndex(self._syspath, self.Introspect)
+            if INDEXER is not None:
+                INDEXER.AddRoots([dirname])
+
+        name = os.path.basename(self._buffer.GetFileName())
+        name = os.path.splitext(name)[0] or u'__main__'
+        if imports_only:
+            self._ScheduleParse()
+            if not self.CollectNamespace() and self._scope is not None:
+                # Only the lines changed since the last update were looked
+                # at and none of them changed an import.
                 return False
-            else:
-                # No problems, so update the namespace.
-                self._locals.clear()
-                self._locals.update(newspace)
+        else:
+            if self._timer is not None:
+                self._timer.Stop()
+            self._modified = False
+            tree = pysymbols.ParseTree(self._buffer.GetText())
+            if tree is not None:
+                self._parsed = pysymbols.ParseModuleTree(tree, name)
+                self._scope = self._parsed
+                self._index.ClearCache()
                 return True
-        finally:
-            del module # Free tmp module
-            sys.path = syspath
-            for mod in sys.modules.keys():
-                if mod not in self._modules:
-                    del sys.modules[mod]
+            elif self._scope is not None:
+                # The buffer is most likely being edited and has a syntax
+                # error so keep the last namespace.
+                return False
+            self.CollectNamespace()
+
+        scope = pysymbols.ParseModuleTree(None, name)
+        if self._parsed is not None:
+            # Keep the definitions from the last time it could be parsed
+            scope.members.update(self._parsed.members)
+            scope.stars.extend(self._parsed.stars)
+        stmts = dict()
+        for line in self._collector:
+            stmt = self._stmts.get(line)
+            if stmt is None:
+                stmt = pysymbols.ParseSource(line, scope.name)
+            stmts[line] = stmt
+            scope.members.update(stmt.members)
+            for star in stmt.stars:
+                if star not in scope.stars:
+                    scope.stars.append(star)
+        self._stmts = stmts
+
+        self._scope = scope
+        self._index.ClearCache()
+        return True
+
+    def _OnParseTimer(self):
+        """Parses the whole buffer once updates have stopped if it was
+        modified since the last time it was parsed.
+
+        """
+        if self._buffer and (self._modified or self._parsed is None):
+            self.UpdateNamespace()
+
+    def _ScheduleParse(self):
+        """Starts or restarts the timer for the deferred full parse of the
+        buffer.
+
+        """
+        if self._timer is None:
+            self._timer = wx.CallLater(PARSE_DELAY, self._OnParseTimer)
+        else:
+            self._timer.Restart(PARSE_DELAY)
+
 #-----------------------------------------------------------------------------#
+
+def GetImportText(text):
+    """Gets the import statement on a line of code
+    @param text: line of code
+    @return: stripped statement or None if the line is not an import
+
+    """
+    text = text.strip()
+    if (text.startswith('import ') or text.startswith('from ')) and \
+       'import ' in text:
+        return text
+    return None
+
+def LogIndexer(msg):
+    """Logs a message from the indexer thread
+    @param msg: message string to log
+
+    """
+    wx.CallAfter(util.Log, msg)
+
+def IndexModules(cache_dir, roots):
+    """Keeps the symbols of the modules under the given directories in an
+    index on disk so that they do not need to be parsed again in later
+    sessions. The modules are indexed in the background, directories that
+    have already been indexed in this session are skipped.
+    @param cache_dir: directory to keep the index in
+    @param roots: list of directories to index
+
+    """
+    global INDEXER
+    if INDEXER is None:
+        pysymbols.SetCacheDir(cache_dir)
+        INDEXER = pysymbols.Indexer(cache_dir, LogIndexer)
+        INDEXER.start()
+    INDEXER.AddRoots(roots)
@@ -0,0 +1,1111 @@
+###############################################################################
+# Name: pysymbols.py                                                          #
+# Purpose: Static symbol model of python source code for autocompletion      #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2007 Cody Precord <staff@editra.org>                         #
+# Licence: wxWindows Licence                                                  #
+###############################################################################
+
+"""
+#--------------------------------------------------------------------------#
+# FILE: pysymbols.py                                                       #
+# AUTHOR: Cody Precord                                                     #
+# LANGUAGE: Python                                                         #
+# SUMMARY:                                                                 #
+#    Builds a model of the modules, classes, functions and variables that  #
+# are defined in python source code by parsing it into an abstract syntax  #
+# tree. Imported modules are located on the search path and parsed the    #
+# same way so no code is ever imported or executed to find out what names #
+# are available. Modules that only exist in compiled form are described   #
+# from the already loaded module object if there is one, or else by the   #
+# optional introspection callback (see pyworker.py).                       #
+#                                                                          #
+#--------------------------------------------------------------------------#
+"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__cvsid__ = "$Id$"
+__revision__ = "$Revision$"
+
+#--------------------------------------------------------------------------#
+# Dependancies
+import os
+import sys
+import types
+import marshal
+import threading
+import Queue
+import subprocess
+import __builtin__
+
+try:
+    from hashlib import md5
+except ImportError:
+    from md5 import new as md5
+
+try:
+    import multiprocessing
+except ImportError:
+    # Python < 2.6, modules are indexed on the indexer thread
+    multiprocessing = None
+
+try:
+    import ast
+except ImportError:
+    # Python < 2.6, no completions are available
+    ast = None
+
+#--------------------------------------------------------------------------#
+# Globals
+
+# Symbol types
+SYM_MODULE = u'module'
+SYM_CLASS = u'class'
+SYM_FUNCTION = u'function'
+SYM_VARIABLE = u'variable'
+
+# Reference types, used for names that are defined somewhere else
+REF_MODULE = u'module'      # import pkg.mod
+REF_FROM = u'from'          # from pkg.mod import name
+REF_NAME = u'name'          # name = other.name
+
+MAX_DEPTH = 10              # Max number of references to follow
+SRC_EXT = ('.py', '.pyw')
+
+# Persistent index
+INDEX_VERSION = 1           # Change when the format of the data changes
+INDEX_MANIFEST = u'manifest.idx'
+INDEX_MAX_FILES = 20000     # Max number of modules indexed under a root
+STORE = None                # SymbolStore used by all SymbolIndexes
+
+# Types of literal values used to resolve the type of simple assignments
+if ast is not None:
+    LITERALS = { ast.Str : 'str', ast.Num : 'int', ast.List : 'list',
+                 ast.ListComp : 'list', ast.Dict : 'dict',
+                 ast.Tuple : 'tuple' }
+else:
+    LITERALS = dict()
+
+#--------------------------------------------------------------------------#
+
+class Symbol(object):
+    """A name defined in python code along with what is known about it"""
+    def __init__(self, name, kind, scope=None, line=0):
+        """Create the symbol
+        @param name: name of the symbol
+        @param kind: one of the SYM_* types
+        @keyword scope: module symbol that names used by this symbol are
+                        looked up in.
+        @keyword line: line the symbol is defined on
+
+        """
+        object.__init__(self)
+        self.name = name
+        self.kind = kind
+        self.scope = scope
+        self.line = line
+        self.end = line         # Last line of the definition
+        self.args = u''         # Argument specification of callables
+        self.doc = u''          # First paragraph of the doc string
+        self.bases = list()     # Dotted names of a classes base classes
+        self.ref = None         # (REF_*, name[, member]) for aliases
+        self.stars = list()     # Modules imported with from x import *
+        self.path = u''         # Source file of a module
+        self.package = False    # Is the module a package
+        self.obj = None         # Live object of compiled modules
+        self.members = dict()
+
+    def __repr__(self):
+        return "<Symbol %s %s>" % (self.kind, self.name)
+
+    def GetCallTip(self):
+        """Gets the calltip text for this symbol
+        @return: string
+
+        """
+        if not self.args and self.doc.startswith(self.name + u"("):
+            # Compiled functions have their signature in the doc string
+            return self.doc
+
+        tip = u"%s(%s)" % (self.name, self.args)
+        if self.doc:
+            tip = u"%s\n\n%s" % (tip, self.doc)
+        return tip
+
+    def GetMembers(self):
+        """Gets the names defined directly in this symbol
+        @return: dict of name -> L{Symbol}
+
+        """
+        if self.obj is not None and not len(self.members):
+            self.members = ObjectMembers(self.obj, self)
+        return self.members
+
+#--------------------------------------------------------------------------#
+
+class SymbolIndex(object):
+    """Locates, parses and caches the modules on a search path and resolves
+    dotted names to the symbols that define them.
+
+    """
+    # Parsed modules shared by all indexes, path -> (mtime, Symbol)
+    MODULES = dict()
+
+    def __init__(self, syspath=None, introspect=None):
+        """Create the index
+        @keyword syspath: list of directories to search for modules in
+        @keyword introspect: callable that describes a module that has no
+                             source and is not loaded, taking its dotted
+                             name and returning a L{Symbol} or None.
+
+        """
+        object.__init__(self)
+        if syspath is None:
+            syspath = sys.path
+        self._path = [path for path in syspath if path not in ('', '.')]
+        self._introspect = introspect
+        self._found = dict()    # Dotted module name -> module symbol
+        self._memo = dict()     # Symbol -> all of its members
+        self._active = list()   # Symbols currently being resolved
+        self._builtins = None
+
+    def ClearCache(self):
+        """Clears the resolved modules and members so that they are
+        looked up again. Modules that have not changed on disk are not
+        parsed again.
+        @postcondition: lookups will check for modified modules
+
+        """
+        self._found.clear()
+        self._memo.clear()
+
+    def FindModuleFile(self, dotted):
+        """Finds the source file of a module on the search path
+        @param dotted: dotted module name
+        @return: (path, is_package) or (None, False)
+
+        """
+        parts = dotted.split(u'.')
+        for base in self._path:
+            path = os.path.join(base, *parts)
+            init = os.path.join(path, '__init__.py')
+            if os.path.isfile(init):
+                return init, True
+            for ext in SRC_EXT:
+                if os.path.isfile(path + ext):
+                    return path + ext, False
+        return None, False
+
+    def GetBuiltins(self):
+        """Gets the symbol for the builtin namespace
+        @return: L{Symbol}
+
+        """
+        if self._builtins is None:
+            self._builtins = ObjectSymbol(u'__builtin__', __builtin__)
+        return self._builtins
+
+    def GetModule(self, dotted):
+        """Gets the symbol for a module, parsing it if it has not been
+        seen before or has changed since it was last parsed.
+        @param dotted: dotted module name
+        @return: L{Symbol} or None if the module could not be found
+
+        """
+        if self._found.has_key(dotted):
+            mod = self._found[dotted]
+            # Modules without a path are not parsed from a file
+            if mod is None or not mod.path or \
+               self.MODULES.get(mod.path, (None, None))[1] is mod:
+                return mod
+
+        path, package = self.FindModuleFile(dotted)
+        if path is None:
+            # Compiled and builtin modules are described from the module
+            # object, but only if it has already been imported.
+            mod = sys.modules.get(dotted)
+            if isinstance(mod, types.ModuleType):
+                mod = ObjectSymbol(dotted, mod)
+            elif self._introspect is not None:
+                mod = self._introspect(dotted)
+            else:
+                mod = None
+        else:
+            mod = self.ParseModule(path, dotted)
+            mod.package = package
+        self._found[dotted] = mod
+        return mod
+
+    def GetMembers(self, sym, depth=0):
+        """Gets all the members available from a symbol including the
+        ones inherited from base classes and star imports.
+        @param sym: L{Symbol}
+        @return: dict of name -> L{Symbol}
+
+        """
+        sym = self.Resolve(sym)
+        if sym is None or depth > MAX_DEPTH:
+            return dict()
+        if self._memo.has_key(sym):
+            return self._memo[sym]
+
+        members = dict()
+        if sym.kind == SYM_CLASS:
+            for base in sym.bases:
+                base = self.Lookup(sym.scope, base)
+                if base is not None and base is not sym:
+                    members.update(self.GetMembers(base, depth + 1))
+        elif sym.kind == SYM_MODULE:
+            for star in sym.stars:
+                star = self.GetModule(star)
+                if star is not None and star is not sym:
+                    for name, member in self.GetMembers(star, depth + 1).items():
+                        if not name.startswith(u'_'):
+                            members[name] = member
+            if sym.package:
+                for name in self.GetSubModules(sym):
+                    members[name] = Symbol(name, SYM_VARIABLE, sym)
+                    members[name].ref = (REF_MODULE,
+                                         u"%s.%s" % (sym.name, name))
+        members.update(sym.GetMembers())
+        self._memo[sym] = members
+        return members
+
+    def GetSubModules(self, sym):
+        """Gets the names of the modules in a package
+        @param sym: package module symbol
+        @return: list of names
+
+        """
+        names = list()
+        pdir = os.path.dirname(sym.path)
+        try:
+            listing = os.listdir(pdir)
+        except OSError:
+            return names
+
+        for fname in listing:
+            name, ext = os.path.splitext(fname)
+            if name == '__init__':
+                continue
+            if ext in SRC_EXT or \
+               (not ext and \
+                os.path.isfile(os.path.join(pdir, fname, '__init__.py'))):
+                names.append(name)
+        return names
+
+    def Lookup(self, scope, dotted, line=0):
+        """Resolves a dotted name as seen from inside of a module
+        @param scope: module symbol to start the lookup in
+        @param dotted: dotted name (i.e os.path.join)
+        @keyword line: line the name is used on, used to find the class
+                       that self refers to.
+        @return: L{Symbol} or None
+
+        """
+        parts = [part for part in dotted.split(u'.') if part]
+        if not len(parts):
+            return None
+
+        name = parts.pop(0)
+        sym = None
+        if scope is not None:
+            if name == u'self' and line:
+                sym = FindClassAt(scope, line)
+            if sym is None:
+                sym = self.GetMembers(scope).get(name)
+        if sym is None:
+            sym = self.GetBuiltins().GetMembers().get(name)
+
+        for name in parts:
+            if sym is None:
+                break
+            sym = self.GetMembers(sym).get(name)
+        return self.Resolve(sym)
+
+    def ParseModule(self, path, dotted):
+        """Parses a module file into a symbol, the result is cached for as
+        long as the file is not modified.
+        @param path: path to the source file
+        @param dotted: dotted name of the module
+        @return: L{Symbol}
+
+        """
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            mtime = 0
+
+        cached = self.MODULES.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        if STORE is not None:
+            mod = STORE.Load(path, mtime, dotted)
+            if mod is not None:
+                self.MODULES[path] = (mtime, mod)
+                self._memo.clear()
+                return mod
+
+        try:
+            handle = open(path, 'rb')
+            try:
+                src = handle.read()
+            finally:
+                handle.close()
+        except IOError:
+            src = ''
+
+        mod = ParseSource(src, dotted, path)
+        self.MODULES[path] = (mtime, mod)
+        self._memo.clear()
+        if STORE is not None:
+            STORE.Save(path, mtime, mod)
+        return mod
+
+    def Resolve(self, sym):
+        """Follows a symbol that refers to a name defined somewhere else
+        to the symbol that defines it.
+        @param sym: L{Symbol}
+        @return: L{Symbol} or None if it could not be resolved
+
+        """
+        active = list()
+        try:
+            while sym is not None and sym.ref is not None:
+                # Guard against names that end up referring to themselves
+                if sym in self._active or len(active) > MAX_DEPTH:
+                    sym = None
+                    break
+                self._active.append(sym)
+                active.append(sym)
+
+                ref = sym.ref
+                if ref[0] == REF_MODULE:
+                    sym = self.GetModule(ref[1])
+                elif ref[0] == REF_FROM:
+                    mod = self.GetModule(ref[1])
+                    target = None
+                    if mod is not None:
+                        target = self.GetMembers(mod).get(ref[2])
+                    if target is None:
+                        target = self.GetModule(u"%s.%s" % (ref[1], ref[2]))
+                    sym = target
+                elif ref[0] == REF_NAME:
+                    sym = self.Lookup(sym.scope, ref[1])
+                else:
+                    sym = None
+        finally:
+            for item in active:
+                self._active.remove(item)
+        return sym
+
+#--------------------------------------------------------------------------#
+
+class SymbolStore(object):
+    """On disk store of the symbols of parsed modules so that modules only
+    need to be parsed again when they change.
+
+    """
+    def __init__(self, cache_dir):
+        """Create the store
+        @param cache_dir: directory to keep the symbol data in
+
+        """
+        object.__init__(self)
+        self._dir = cache_dir
+
+    def GetPath(self, path):
+        """Gets the path of the data file of a module
+        @param path: path of the module source file
+        @return: string
+
+        """
+        if isinstance(path, unicode):
+            path = path.encode('utf-8')
+        return os.path.join(self._dir, "%s.sym" % md5(path).hexdigest())
+
+    def Load(self, path, mtime, dotted):
+        """Loads the symbols of a module
+        @param path: path of the module source file
+        @param mtime: current modification time of the source file
+        @param dotted: dotted name of the module
+        @return: module L{Symbol} or None if there is no current data
+
+        """
+        try:
+            handle = open(self.GetPath(path), 'rb')
+            try:
+                data = marshal.load(handle)
+            finally:
+                handle.close()
+        except (IOError, OSError, EOFError, ValueError, TypeError):
+            return None
+
+        # Relative imports are resolved against the name the module was
+        # parsed with so the data is only valid for that name.
+        if not isinstance(data, tuple) or len(data) != 4 or \
+           data[0] != INDEX_VERSION or data[2] != mtime or \
+           data[3][0] != dotted:
+            return None
+
+        mod = DataToSymbol(data[3], None)
+        mod.path = path
+        return mod
+
+    def Save(self, path, mtime, mod):
+        """Saves the symbols of a module
+        @param path: path of the module source file
+        @param mtime: modification time of the source file
+        @param mod: module L{Symbol}
+        @return: bool
+
+        """
+        if not os.path.exists(self._dir):
+            try:
+                os.makedirs(self._dir)
+            except OSError:
+                return False
+
+        # Write to a temporary file first so that a reader never sees
+        # a partially written file.
+        dest = self.GetPath(path)
+        tmp = "%s.%d" % (dest, os.getpid())
+        try:
+            handle = open(tmp, 'wb')
+            try:
+                marshal.dump((INDEX_VERSION, path, mtime,
+                              SymbolToData(mod)), handle)
+            finally:
+                handle.close()
+            if os.path.exists(dest) and sys.platform.startswith('win'):
+                os.remove(dest)
+            os.rename(tmp, dest)
+        except (IOError, OSError, ValueError):
+            return False
+        return True
+
+#--------------------------------------------------------------------------#
+
+class Indexer(threading.Thread):
+    """Background thread that keeps the symbol store up to date with the
+    modules under a set of directories. The modules are indexed by a helper
+    process that is started by running this file as a script, it parses
+    them in a pool of processes when multiprocessing is available. The
+    pool is never forked from the editor itself since the children would
+    inherit its display connection and any locks held by its other threads.
+
+    """
+    def __init__(self, cache_dir, log=None):
+        """Create the indexer thread
+        @param cache_dir: directory of the L{SymbolStore}
+        @keyword log: callable to report indexing problems to, it is called
+                      from the indexer thread.
+
+        """
+        threading.Thread.__init__(self)
+        self.setDaemon(True)
+        self._dir = cache_dir
+        self._log = log
+        self._queue = Queue.Queue()
+        self._seen = list()     # Roots that have been queued
+
+    def AddRoots(self, roots):
+        """Queues directories to be indexed, directories that have already
+        been indexed by this indexer are ignored.
+        @param roots: list of directory paths
+
+        """
+        roots = [root for root in roots
+                 if root and root not in self._seen and os.path.isdir(root)]
+        if len(roots):
+            self._seen.extend(roots)
+            self._queue.put(roots)
+
+    def Index(self, roots):
+        """Indexes the given directories in the helper process and waits for
+        it to finish.
+        @param roots: list of directory paths
+        @return: error message or None if the directories were indexed
+
+        """
+        # Frozen applications can not run python scripts, index the modules
+        # on this thread instead.
+        if hasattr(sys, 'frozen'):
+            BuildIndex(roots, self._dir, 0)
+            return None
+
+        script = os.path.splitext(os.path.abspath(__file__))[0] + '.py'
+        try:
+            proc = subprocess.Popen([sys.executable, script],
+                                    stdin=subprocess.PIPE,
+                                    stdout=open(os.devnull, 'w'),
+                                    stderr=subprocess.PIPE)
+            err = proc.communicate(marshal.dumps((self._dir, roots)))[1]
+        except (OSError, IOError, ValueError), msg:
+            return str(msg)
+
+        if proc.returncode:
+            lines = err.strip().splitlines() or ['exit status %d' % \
+                                                 proc.returncode]
+            return lines[-1]
+        return None
+
+    def run(self):
+        """Indexes the queued directories"""
+        while True:
+            roots = self._queue.get()
+            try:
+                msg = self.Index(roots)
+            except Exception, msg:
+                # Never let a bad file or directory stop the indexer
+                msg = str(msg)
+            if msg is not None and self._log is not None:
+                self._log("[pysymbols][err] Failed to index %s: %s" % \
+                          (u", ".join(roots), msg))
+
+#--------------------------------------------------------------------------#
+
+def BuildIndex(roots, cache_dir, processes=None):
+    """Parses the modules under the given directories that have changed
+    since they were last indexed and saves their symbols in the store.
+    @param roots: list of directories
+    @param cache_dir: directory of the L{SymbolStore}
+    @keyword processes: number of processes to parse the modules with, 0
+                        to parse them in the calling process. This must
+                        only be run in the main thread of a process that
+                        can be forked safely (see L{Indexer}).
+    @return: number of modules that were indexed
+
+    """
+    manifest = os.path.join(cache_dir, INDEX_MANIFEST)
+    try:
+        handle = open(manifest, 'rb')
+        try:
+            mtimes = marshal.load(handle)
+        finally:
+            handle.close()
+    except (IOError, OSError, EOFError, ValueError, TypeError):
+        mtimes = dict()
+    if not isinstance(mtimes, dict):
+        mtimes = dict()
+
+    jobs = list()
+    for root in roots:
+        for path in FindSourceFiles(root):
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                continue
+            if mtimes.get(path) != mtime:
+                jobs.append((cache_dir, root, path))
+    if not len(jobs):
+        return 0
+
+    # Forking is not possible in frozen applications
+    if multiprocessing is not None and not hasattr(sys, 'frozen') and \
+       processes != 0 and len(jobs) > 1:
+        pool = multiprocessing.Pool(processes)
+        try:
+            results = pool.map(IndexFile, jobs, 16)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = map(IndexFile, jobs)
+
+    for path, mtime in results:
+        if mtime is not None:
+            mtimes[path] = mtime
+
+    try:
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        tmp = "%s.%d" % (manifest, os.getpid())
+        handle = open(tmp, 'wb')
+        try:
+            marshal.dump(mtimes, handle)
+        finally:
+            handle.close()
+        if os.path.exists(manifest) and sys.platform.startswith('win'):
+            os.remove(manifest)
+        os.rename(tmp, manifest)
+    except (IOError, OSError, ValueError):
+        pass
+    return len(jobs)
+
+def FindSourceFiles(root, limit=INDEX_MAX_FILES):
+    """Finds the importable modules under a directory. Sub directories are
+    only searched if they are packages.
+    @param root: directory to search
+    @keyword limit: max number of files to return
+    @return: list of file paths
+
+    """
+    found = list()
+    dirs = [root]
+    while len(dirs) and len(found) < limit:
+        cdir = dirs.pop(0)
+        try:
+            listing = os.listdir(cdir)
+        except OSError:
+            continue
+        for fname in listing:
+            path = os.path.join(cdir, fname)
+            if os.path.splitext(fname)[1] in SRC_EXT:
+                found.append(path)
+            elif os.path.isfile(os.path.join(path, '__init__.py')):
+                dirs.append(path)
+    return found[:limit]
+
+def GetModuleName(path, root):
+    """Gets the dotted name a module file is imported by when root is on
+    the search path.
+    @param path: path of the module source file
+    @param root: directory on the search path that contains the module
+    @return: string
+
+    """
+    parts = os.path.splitext(path[len(root):])[0].split(os.sep)
+    parts = [part for part in parts if part]
+    if len(parts) and parts[-1] == u'__init__':
+        parts.pop()
+    return u'.'.join(parts)
+
+def IndexFile(job):
+    """Parses a module and saves its symbols in the store. This is run in
+    the indexing processes.
+    @param job: (cache_dir, root, path)
+    @return: (path, mtime) mtime is None if the file could not be read
+
+    """
+    cache_dir, root, path = job
+    try:
+        mtime = os.path.getmtime(path)
+        handle = open(path, 'rb')
+        try:
+            src = handle.read()
+        finally:
+            handle.close()
+    except (IOError, OSError):
+        return path, None
+
+    mod = ParseSource(src, GetModuleName(path, root), path)
+    SymbolStore(cache_dir).Save(path, mtime, mod)
+    return path, mtime
+
+def SetCacheDir(cache_dir):
+    """Sets the directory to store the symbols of parsed modules in so
+    that they are kept between sessions.
+    @param cache_dir: directory path or None to not store symbols
+
+    """
+    global STORE
+    if cache_dir:
+        STORE = SymbolStore(cache_dir)
+    else:
+        STORE = None
+
+#--------------------------------------------------------------------------#
+
+def DataToSymbol(data, scope):
+    """Recreates a symbol from the data created by L{SymbolToData}
+    @param data: tuple
+    @param scope: module symbol the symbol is defined in or None if it is
+                  the module.
+    @return: L{Symbol}
+
+    """
+    sym = Symbol(data[0], data[1], scope, data[2])
+    if scope is None:
+        scope = sym
+    sym.end, sym.args, sym.doc = data[3:6]
+    sym.bases = list(data[6])
+    if data[7] is not None:
+        sym.ref = tuple(data[7])
+    sym.stars = list(data[8])
+    sym.package = data[9]
+    for member in data[10]:
+        member = DataToSymbol(member, scope)
+        sym.members[member.name] = member
+    return sym
+
+def SymbolToData(sym):
+    """Converts a symbol parsed from source into data that can be
+    marshaled.
+    @param sym: L{Symbol}
+    @return: tuple
+
+    """
+    return (sym.name, sym.kind, sym.line, sym.end, sym.args, sym.doc,
+            sym.bases, sym.ref, sym.stars, sym.package,
+            [SymbolToData(member) for member in sym.members.values()])
+
+#--------------------------------------------------------------------------#
+
+def FindClassAt(scope, line):
+    """Finds the innermost class whose definition contains a line
+    @param scope: module or class symbol to search
+    @param line: line number (1 based)
+    @return: class L{Symbol} or None
+
+    """
+    found = None
+    for sym in scope.members.values():
+        if sym.kind == SYM_CLASS and sym.scope is not None and \
+           sym.line <= line <= sym.end:
+            found = FindClassAt(sym, line) or sym
+            break
+    return found
+
+def FormatArgs(args, method=False):
+    """Formats an ast argument list as it would be written in a def
+    @param args: ast.arguments
+    @keyword method: drop the first argument
+    @return: string
+
+    """
+    names = list()
+    for arg in args.args:
+        if isinstance(arg, ast.Name):
+            names.append(arg.id)
+        else:
+            names.append(u"(...)")
+
+    defaults = [FormatValue(val) for val in args.defaults]
+    offset = len(names) - len(defaults)
+    for idx in xrange(offset, len(names)):
+        names[idx] = u"%s=%s" % (names[idx], defaults[idx - offset])
+
+    if method and len(names):
+        names.pop(0)
+    if args.vararg:
+        names.append(u"*" + args.vararg)
+    if args.kwarg:
+        names.append(u"**" + args.kwarg)
+    return u", ".join(names)
+
+def FormatValue(node):
+    """Gets a short string representation of a default value
+    @param node: ast node
+    @return: string
+
+    """
+    if isinstance(node, (ast.Str, ast.Num)):
+        return unicode(repr(getattr(node, 's', getattr(node, 'n', None))))
+    dotted = GetDottedName(node)
+    if dotted is not None:
+        return dotted
+    return u"..."
+
+def GetDocString(node):
+    """Gets the first paragraph of the doc string of a node
+    @param node: ast node
+    @return: string
+
+    """
+    try:
+        doc = ast.get_docstring(node)
+    except TypeError:
+        doc = None
+    if not doc:
+        return u''
+    if not isinstance(doc, unicode):
+        doc = doc.decode('utf-8', 'replace')
+    return doc.split(u"\n\n")[0].strip()
+
+def GetDottedName(node):
+    """Gets the dotted name of a Name or Attribute node
+    @param node: ast node
+    @return: string or None if the node is not a name
+
+    """
+    parts = list()
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return None
+    parts.append(node.id)
+    parts.reverse()
+    return u".".join(parts)
+
+def ObjectMembers(obj, scope):
+    """Describes the attributes of an object
+    @param obj: module, class or other object
+    @param scope: symbol that the attributes belong to
+    @return: dict of name -> L{Symbol}
+
+    """
+    members = dict()
+    for name in dir(obj):
+        try:
+            val = getattr(obj, name)
+        except Exception:
+            continue
+        members[name] = ObjectSymbol(name, val, scope)
+    return members
+
+def ObjectSymbol(name, obj, scope=None):
+    """Creates a symbol from a live object
+    @param name: name of the symbol
+    @param obj: object to describe
+    @keyword scope: symbol the object belongs to
+    @return: L{Symbol}
+
+    """
+    if isinstance(obj, types.ModuleType):
+        kind = SYM_MODULE
+    elif isinstance(obj, (type, types.ClassType)):
+        kind = SYM_CLASS
+    elif callable(obj):
+        kind = SYM_FUNCTION
+    else:
+        kind = SYM_VARIABLE
+
+    sym = Symbol(name, kind, scope)
+    if kind in (SYM_MODULE, SYM_CLASS):
+        sym.obj = obj
+    elif kind == SYM_VARIABLE:
+        sym.obj = type(obj)
+
+    doc = getattr(obj, '__doc__', None)
+    if kind != SYM_VARIABLE and isinstance(doc, basestring):
+        sym.doc = doc.split("\n\n")[0].strip()
+        if not isinstance(sym.doc, unicode):
+            sym.doc = sym.doc.decode('utf-8', 'replace')
+    return sym
+
+def ParseModuleTree(tree, name, path=u''):
+    """Creates a module symbol from an abstract syntax tree
+    @param tree: ast.Module
+    @param name: dotted name of the module
+    @keyword path: file the source was read from
+    @return: module L{Symbol}
+
+    """
+    mod = Symbol(name, SYM_MODULE)
+    mod.path = path
+    mod.package = os.path.basename(path) == '__init__.py'
+    if tree is not None:
+        _ParseBody(tree.body, mod, mod)
+        mod.doc = GetDocString(tree)
+    return mod
+
+def ParseSource(src, name, path=u''):
+    """Parses python source code into a module symbol
+    @param src: source code
+    @param name: dotted name of the module
+    @keyword path: file the source was read from
+    @return: module L{Symbol}, it will have no members if the code could
+             not be parsed.
+
+    """
+    return ParseModuleTree(ParseTree(src), name, path)
+
+def ParseTree(src):
+    """Parses source code into an abstract syntax tree
+    @param src: source code
+    @return: ast.Module or None on error
+
+    """
+    if ast is None:
+        return None
+    if isinstance(src, unicode):
+        src = src.encode('utf-8')
+    src = src.replace('\r\n', '\n').replace('\r', '\n')
+    try:
+        return compile(src, '<source>', 'exec', ast.PyCF_ONLY_AST, True)
+    except (SyntaxError, TypeError, ValueError):
+        return None
+
+#---- Private Parsing Functions ----#
+
+def _AddSymbol(container, sym, conditional):
+    """Adds a symbol to a container. Names defined in conditional blocks
+    (if/try/for...) do not replace a name that was already defined so that
+    the first of several alternative definitions is used.
+
+    """
+    if conditional and container.members.has_key(sym.name):
+        return
+    container.members[sym.name] = sym
+
+def _AssignRef(value):
+    """Gets the reference for the value of an assignment so that the type
+    of the assigned name can be looked up.
+    @param value: ast node
+    @return: reference tuple or None
+
+    """
+    if isinstance(value, ast.Call):
+        value = value.func
+    elif type(value) in LITERALS:
+        return (REF_NAME, LITERALS[type(value)])
+
+    dotted = GetDottedName(value)
+    if dotted is not None:
+        return (REF_NAME, dotted)
+    return None
+
+def _ParseAssign(node, container, mod, conditional):
+    """Adds the names assigned by an assignment statement"""
+    for target in node.targets:
+        targets = [target]
+        if isinstance(target, (ast.Tuple, ast.List)):
+            targets = target.elts
+        for tgt in targets:
+            if isinstance(tgt, ast.Name):
+                sym = Symbol(tgt.id, SYM_VARIABLE, mod, node.lineno)
+                if len(targets) == 1:
+                    sym.ref = _AssignRef(node.value)
+                _AddSymbol(container, sym, conditional)
+
+def _ParseBody(body, container, mod, conditional=False):
+    """Adds the symbols defined by a list of statements to a container
+    @param body: list of ast statements
+    @param container: module or class L{Symbol} to add the names to
+    @param mod: module symbol names are looked up in
+    @keyword conditional: statements are in a conditional block
+
+    """
+    for idx, node in enumerate(body):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.asname:
+                    sym = Symbol(alias.asname, SYM_VARIABLE, mod, node.lineno)
+                    sym.ref = (REF_MODULE, alias.name)
+                else:
+                    top = alias.name.split(u'.')[0]
+                    sym = Symbol(top, SYM_VARIABLE, mod, node.lineno)
+                    sym.ref = (REF_MODULE, top)
+                _AddSymbol(container, sym, conditional)
+        elif isinstance(node, ast.ImportFrom):
+            modname = _ResolveRelative(mod, node.module or u'',
+                                       getattr(node, 'level', 0))
+            for alias in node.names:
+                if alias.name == u'*':
+                    if modname not in container.stars:
+                        container.stars.append(modname)
+                    continue
+                sym = Symbol(alias.asname or alias.name, SYM_VARIABLE,
+                             mod, node.lineno)
+                sym.ref = (REF_FROM, modname, alias.name)
+                _AddSymbol(container, sym, conditional)
+        elif isinstance(node, ast.ClassDef):
+            sym = Symbol(node.name, SYM_CLASS, mod, node.lineno)
+            sym.end = _EndLine(body, idx, node)
+            sym.doc = GetDocString(node)
+            sym.bases = [base for base in map(GetDottedName, node.bases)
+                         if base is not None]
+            _ParseBody(node.body, sym, mod)
+            init = sym.members.get(u'__init__')
+            if init is not None and init.kind == SYM_FUNCTION:
+                sym.args = init.args
+            _AddSymbol(container, sym, conditional)
+        elif isinstance(node, ast.FunctionDef):
+            method = container.kind == SYM_CLASS
+            sym = Symbol(node.name, SYM_FUNCTION, mod, node.lineno)
+            sym.end = _EndLine(body, idx, node)
+            sym.doc = GetDocString(node)
+            sym.args = FormatArgs(node.args, method)
+            if method:
+                _ParseSelfAttrs(node, container, mod)
+            _AddSymbol(container, sym, conditional)
+        elif isinstance(node, ast.Assign):
+            _ParseAssign(node, container, mod, conditional)
+        elif isinstance(node, (ast.If, ast.For, ast.While)):
+            _ParseBody(node.body, container, mod, True)
+            _ParseBody(node.orelse, container, mod, True)
+        elif isinstance(node, ast.TryExcept):
+            _ParseBody(node.body, container, mod, True)
+            for handler in node.handlers:
+                _ParseBody(handler.body, container, mod, True)
+            _ParseBody(node.orelse, container, mod, True)
+        elif isinstance(node, ast.TryFinally):
+            _ParseBody(node.body, container, mod, conditional)
+            _ParseBody(node.finalbody, container, mod, conditional)
+        elif isinstance(node, ast.With):
+            _ParseBody(node.body, container, mod, conditional)
+
+def _ParseSelfAttrs(node, cls, mod):
+    """Adds the attributes assigned to self in a method to its class"""
+    if not len(node.args.args) or not isinstance(node.args.args[0], ast.Name):
+        return
+
+    this = node.args.args[0].id
+    for sub in _IterStatements(node.body):
+        if not isinstance(sub, ast.Assign):
+            continue
+        for target in sub.targets:
+            if isinstance(target, ast.Attribute) and \
+               isinstance(target.value, ast.Name) and \
+               target.value.id == this and \
+               not cls.members.has_key(target.attr):
+                sym = Symbol(target.attr, SYM_VARIABLE, mod, sub.lineno)
+                sym.ref = _AssignRef(sub.value)
+                cls.members[target.attr] = sym
+
+def _IterStatements(body):
+    """Iterates over a list of statements and the statements nested in
+    them, without going into nested functions or classes.
+
+    """
+    for node in body:
+        yield node
+        if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+            continue
+        for field in ('body', 'orelse', 'finalbody'):
+            # The body of an exec statement is an expression
+            stmts = getattr(node, field, None)
+            if isinstance(stmts, list):
+                for sub in _IterStatements(stmts):
+                    yield sub
+        for handler in getattr(node, 'handlers', ()):
+            for sub in _IterStatements(handler.body):
+                yield sub
+
+def _EndLine(body, idx, node):
+    """Gets the last line of a definition, which is taken to be the line
+    before the statement that follows it.
+
+    """
+    if idx + 1 < len(body):
+        return body[idx + 1].lineno - 1
+    end = node.lineno
+    for sub in ast.walk(node):
+        end = max(end, getattr(sub, 'lineno', end))
+    return end
+
+def _ResolveRelative(mod, modname, level):
+    """Gets the absolute name of a module imported with a relative import"""
+    if not level:
+        return modname
+
+    parts = mod.name.split(u'.')
+    if not mod.package:
+        parts = parts[:-1]
+    if level > 1:
+        parts = parts[:-(level - 1)]
+    if modname:
+        parts.append(modname)
+    return u".".join(parts)
+
+#--------------------------------------------------------------------------#
+# Helper process
+
+def Main():
+    """Indexes the directories read from stdin, this is run in the helper
+    process started by the L{Indexer}.
+
+    """
+    if sys.platform.startswith('win'):
+        import msvcrt
+        msvcrt.setmode(sys.stdin.fileno(), os.O_BINARY)
+    cache_dir, roots = marshal.loads(sys.stdin.read())
+    BuildIndex(roots, cache_dir)
+
+#--------------------------------------------------------------------------#
+
+if __name__ == '__main__':
+    Main()
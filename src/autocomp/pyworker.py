@@ -0,0 +1,338 @@
+###############################################################################
+# Name: pyworker.py                                                           #
+# Purpose: Introspects compiled python modules in a separate process          #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2007 Cody Precord <staff@editra.org>                         #
+# Licence: wxWindows Licence                                                  #
+###############################################################################
+
+"""
+#--------------------------------------------------------------------------#
+# FILE: pyworker.py                                                        #
+# AUTHOR: Cody Precord                                                     #
+# LANGUAGE: Python                                                         #
+# SUMMARY:                                                                 #
+#    Modules that have no python source (extension and builtin modules)   #
+# can only be described by importing them. Importing runs code that can   #
+# hang or crash so it is done in a helper process that is started by      #
+# running this file as a script. The editor sends it queries over a pipe  #
+# and waits for an answer only until a deadline, if the helper stops      #
+# answering it is killed and started again on the next query. The helper  #
+# keeps the modules it has imported and described so that later queries  #
+# are answered from memory.                                                #
+#                                                                          #
+#--------------------------------------------------------------------------#
+"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__svnid__ = "$Id$"
+__revision__ = "$Revision$"
+
+#--------------------------------------------------------------------------#
+# Dependancies
+import os
+import sys
+import time
+import signal
+import struct
+import marshal
+import threading
+import Queue
+import subprocess
+import pysymbols
+
+#--------------------------------------------------------------------------#
+# Globals
+DEADLINE = 0.25             # Max seconds to wait for an answer
+HANG_TIMEOUT = 10           # Seconds without an answer before restarting
+
+# Commands
+CMD_MODULE = u'module'      # Describe a module
+CMD_PATH = u'path'          # Set the module search path
+
+#--------------------------------------------------------------------------#
+
+class Worker(object):
+    """Editor side of the helper process"""
+    def __init__(self):
+        """Create the worker, the process is started on the first query"""
+        object.__init__(self)
+        self._proc = None
+        self._answers = Queue.Queue()
+        self._lock = threading.Lock()
+        self._qid = 0           # Id of the last query sent
+        self._pending = None    # (query id, time sent) of the unanswered query
+        self._syspath = None    # Search path last sent to the process
+        self._missing = dict()  # Modules the process could not describe
+
+    def GetModule(self, dotted, syspath):
+        """Gets a description of a module from the helper process
+        @param dotted: dotted module name
+        @param syspath: list of directories to search for the module in
+        @return: module L{pysymbols.Symbol} or None if it could not be
+                 described before the deadline.
+
+        """
+        if syspath != self._syspath:
+            self._missing.clear()
+        elif dotted in self._missing:
+            return None
+
+        if not self.IsRunning() and not self.Start():
+            return None
+
+        if syspath != self._syspath:
+            self._syspath = list(syspath)
+            self._Send(CMD_PATH, self._syspath, False)
+
+        data = self.Query(CMD_MODULE, dotted)
+        if data is None:
+            return None
+        elif data is False:
+            self._missing[dotted] = True
+            return None
+        return pysymbols.DataToSymbol(data, None)
+
+    def IsRunning(self):
+        """Is the helper process running
+        @return: bool
+
+        """
+        return self._proc is not None and self._proc.poll() is None
+
+    def Query(self, cmd, arg, deadline=DEADLINE):
+        """Sends a query to the helper process and waits for the answer
+        @param cmd: one of the CMD_* commands
+        @param arg: argument of the command
+        @keyword deadline: max number of seconds to wait
+        @return: answer or None if there was no answer before the deadline
+
+        """
+        pending = self._pending
+        if pending is not None:
+            # Don't queue up behind a query that has not been answered yet
+            if time.time() - pending[1] > HANG_TIMEOUT:
+                self.Stop()
+            return None
+
+        if not self.IsRunning() and not self.Start():
+            return None
+
+        qid = self._Send(cmd, arg)
+        if qid is None:
+            return None
+
+        end = time.time() + deadline
+        while True:
+            wait = end - time.time()
+            if wait <= 0:
+                return None
+            try:
+                answer = self._answers.get(True, wait)
+            except Queue.Empty:
+                return None
+            if answer is None:
+                # The process has exited
+                return None
+            elif answer[0] == qid:
+                return answer[1]
+            # Answers to queries that timed out earlier are discarded
+
+    def Start(self):
+        """Starts the helper process
+        @return: bool
+
+        """
+        self.Stop()
+        # Frozen applications can not run python scripts
+        if hasattr(sys, 'frozen'):
+            return False
+
+        script = os.path.splitext(os.path.abspath(__file__))[0] + '.py'
+        try:
+            self._proc = subprocess.Popen([sys.executable, '-u', script],
+                                          stdin=subprocess.PIPE,
+                                          stdout=subprocess.PIPE,
+                                          stderr=open(os.devnull, 'w'))
+        except (OSError, ValueError):
+            self._proc = None
+            return False
+
+        self._answers = Queue.Queue()
+        self._pending = None
+        self._syspath = None
+        reader = threading.Thread(target=self._ReadAnswers,
+                                  args=(self._proc, self._answers))
+        reader.setDaemon(True)
+        reader.start()
+        return True
+
+    def Stop(self):
+        """Stops the helper process"""
+        proc = self._proc
+        self._proc = None
+        self._pending = None
+        if proc is None:
+            return
+
+        try:
+            proc.stdin.close()
+        except (IOError, OSError):
+            pass
+        if proc.poll() is None:
+            try:
+                if hasattr(proc, 'kill'):
+                    proc.kill()
+                else:
+                    os.kill(proc.pid, signal.SIGTERM)
+            except (OSError, AttributeError):
+                pass
+
+    def _ReadAnswers(self, proc, answers):
+        """Reads the answers from a helper process until it exits. This is
+        run on a separate thread.
+        @param proc: Popen of the process
+        @param answers: Queue to put the answers in
+
+        """
+        while True:
+            try:
+                answer = ReadMessage(proc.stdout)
+            except (EOFError, ValueError, TypeError, IOError, OSError):
+                break
+            if not isinstance(answer, tuple) or len(answer) != 2:
+                break
+
+            self._lock.acquire()
+            try:
+                pending = self._pending
+                if proc is self._proc and pending is not None and \
+                   pending[0] == answer[0]:
+                    self._pending = None
+            finally:
+                self._lock.release()
+            answers.put(answer)
+        answers.put(None)
+
+    def _Send(self, cmd, arg, wait=True):
+        """Sends a command to the helper process
+        @param cmd: one of the CMD_* commands
+        @param arg: argument of the command
+        @keyword wait: will the answer be waited for
+        @return: query id or None if it could not be sent
+
+        """
+        self._lock.acquire()
+        try:
+            self._qid += 1
+            qid = self._qid
+            if wait:
+                self._pending = (qid, time.time())
+        finally:
+            self._lock.release()
+
+        try:
+            WriteMessage(self._proc.stdin, (qid, cmd, arg))
+        except (IOError, OSError, ValueError):
+            self.Stop()
+            return None
+        return qid
+
+#--------------------------------------------------------------------------#
+
+def ReadMessage(handle):
+    """Reads a message written by L{WriteMessage}. The data is read before
+    it is unmarshaled since marshal.load holds the interpreter lock while
+    it waits on the pipe.
+    @param handle: file to read from
+    @return: message object
+
+    """
+    head = handle.read(4)
+    if len(head) != 4:
+        raise EOFError
+    size = struct.unpack('!I', head)[0]
+    data = handle.read(size)
+    if len(data) != size:
+        raise EOFError
+    return marshal.loads(data)
+
+def WriteMessage(handle, msg):
+    """Writes a message to a file
+    @param handle: file to write to
+    @param msg: object that can be marshaled
+
+    """
+    data = marshal.dumps(msg)
+    handle.write(struct.pack('!I', len(data)) + data)
+    handle.flush()
+
+#--------------------------------------------------------------------------#
+# Helper process
+
+def DescribeModule(dotted):
+    """Imports a module and describes it along with the members of the
+    classes that it defines.
+    @param dotted: dotted module name
+    @return: data from L{pysymbols.SymbolToData} or False if the module
+             could not be imported.
+
+    """
+    try:
+        __import__(dotted)
+        mod = sys.modules[dotted]
+    except Exception:
+        return False
+    except SystemExit:
+        return False
+
+    sym = pysymbols.ObjectSymbol(dotted, mod)
+    for member in sym.GetMembers().values():
+        if member.kind == pysymbols.SYM_CLASS:
+            member.GetMembers()
+        elif member.kind == pysymbols.SYM_MODULE:
+            # Sub modules are described by their own queries
+            member.ref = (pysymbols.REF_MODULE,
+                          unicode(getattr(member.obj, '__name__', member.name)))
+    return pysymbols.SymbolToData(sym)
+
+def Main():
+    """Answers queries read from stdin until it is closed"""
+    # Keep the real stdout for the answers so that modules that print
+    # when imported can not corrupt them.
+    if sys.platform.startswith('win'):
+        import msvcrt
+        msvcrt.setmode(sys.stdin.fileno(), os.O_BINARY)
+        msvcrt.setmode(sys.stdout.fileno(), os.O_BINARY)
+    out = os.fdopen(os.dup(sys.stdout.fileno()), 'wb')
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, sys.stdout.fileno())
+    sys.stdout = sys.stderr
+
+    described = dict()
+    while True:
+        try:
+            qid, cmd, arg = ReadMessage(sys.stdin)
+        except (EOFError, ValueError, TypeError, IOError):
+            break
+
+        if cmd == CMD_PATH:
+            sys.path[:] = arg
+            described.clear()
+            answer = True
+        elif cmd == CMD_MODULE:
+            if arg not in described:
+                described[arg] = DescribeModule(arg)
+            answer = described[arg]
+        else:
+            answer = None
+
+        try:
+            WriteMessage(out, (qid, answer))
+        except (IOError, ValueError):
+            break
+
+#--------------------------------------------------------------------------#
+
+if __name__ == '__main__':
+    Main()
@@ -0,0 +1,370 @@
+###############################################################################
+# Name: wordcomp.py                                                           #
+# Purpose: Provides word completion from the words used in open documents     #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2007 Cody Precord <staff@editra.org>                         #
+# Licence: wxWindows Licence                                                  #
+###############################################################################
+
+"""
+#--------------------------------------------------------------------------#
+# FILE: wordcomp.py                                                        #
+# AUTHOR: Cody Precord                                                     #
+# LANGUAGE: Python                                                         #
+# SUMMARY:                                                                 #
+#    Provides word completion for documents of any language. The words    #
+# used in all the open documents of a language are kept in a prefix tree  #
+# along with how often they are used so that the most used words that     #
+# start with a prefix can be found quickly. Each document only updates    #
+# the tree for the lines that are modified.                                #
+#                                                                          #
+# METHODS:                                                                 #
+#
+#--------------------------------------------------------------------------#
+"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__svnid__ = "$Id$"
+__revision__ = "$Revision$"
+
+#--------------------------------------------------------------------------#
+# Dependancies
+import re
+import heapq
+import bisect
+import weakref
+
+#--------------------------------------------------------------------------#
+# Globals
+MAX_WORDS = 100             # Max number of completions to return
+MIN_LENGTH = 3              # Shortest word that is worth completing
+RE_EOL = re.compile(u'\r\n|\r|\n')
+RE_WORD = re.compile(u'[^\\W\\d]\\w{%d,}' % (MIN_LENGTH - 1), re.UNICODE)
+
+# Trie node fields
+_KIDS = 0                   # dict of character -> node
+_COUNT = 1                  # Number of times the word ending here is used
+_BEST = 2                   # Highest count in the sub tree of the node
+
+INDEXES = dict()            # Language id -> WordIndex
+
+#--------------------------------------------------------------------------#
+
+class WordTrie(object):
+    """Prefix tree of words weighted by how many times they are used. Each
+    node keeps the highest count in its sub tree so that the most used
+    completions of a prefix are found without visiting the rest.
+
+    """
+    def __init__(self):
+        """Create the tree"""
+        object.__init__(self)
+        self._root = [dict(), 0, 0]
+        self._words = 0         # Number of distinct words
+
+    def __len__(self):
+        return self._words
+
+    def Add(self, word, count=1):
+        """Adds uses of a word to the tree
+        @param word: string
+        @keyword count: number of uses to add
+
+        """
+        node = self._root
+        path = [node]
+        for char in word:
+            kids = node[_KIDS]
+            if char not in kids:
+                kids[char] = [dict(), 0, 0]
+            node = kids[char]
+            path.append(node)
+
+        if not node[_COUNT]:
+            self._words += 1
+        node[_COUNT] += count
+        best = node[_COUNT]
+        for node in path:
+            if node[_BEST] < best:
+                node[_BEST] = best
+
+    def Complete(self, prefix, limit=MAX_WORDS):
+        """Gets the most used words that start with a prefix
+        @param prefix: string
+        @keyword limit: max number of words to return
+        @return: list of words, most used first
+
+        """
+        node = self._root
+        for char in prefix:
+            node = node[_KIDS].get(char)
+            if node is None:
+                return list()
+
+        words = list()
+        heap = [(-node[_BEST], prefix, node)]
+        while len(heap) and len(words) < limit:
+            best, word, node = heapq.heappop(heap)
+            if node is None:
+                # Entries without a node are complete words
+                words.append(word)
+                continue
+            if node[_COUNT]:
+                heapq.heappush(heap, (-node[_COUNT], word, None))
+            for char, kid in node[_KIDS].iteritems():
+                if kid[_BEST]:
+                    heapq.heappush(heap, (-kid[_BEST], word + char, kid))
+        return words
+
+    def GetCount(self, word):
+        """Gets the number of times a word is used
+        @param word: string
+        @return: int
+
+        """
+        node = self._root
+        for char in word:
+            node = node[_KIDS].get(char)
+            if node is None:
+                return 0
+        return node[_COUNT]
+
+    def Remove(self, word, count=1):
+        """Removes uses of a word from the tree
+        @param word: string
+        @keyword count: number of uses to remove
+
+        """
+        node = self._root
+        path = [(None, node)]
+        for char in word:
+            node = node[_KIDS].get(char)
+            if node is None:
+                return
+            path.append((char, node))
+        if not node[_COUNT]:
+            return
+
+        node[_COUNT] = max(node[_COUNT] - count, 0)
+        if not node[_COUNT]:
+            self._words -= 1
+
+        # Update the best counts back up the path and drop the nodes that
+        # no longer lead to any words.
+        for idx in xrange(len(path) - 1, -1, -1):
+            char, node = path[idx]
+            best = node[_COUNT]
+            for kid in node[_KIDS].itervalues():
+                if kid[_BEST] > best:
+                    best = kid[_BEST]
+            if best == node[_BEST] and idx != len(path) - 1:
+                break
+            node[_BEST] = best
+            if not best and idx:
+                del path[idx - 1][1][_KIDS][char]
+
+#--------------------------------------------------------------------------#
+
+class WordIndex(object):
+    """The words used in all the open documents of a language"""
+    def __init__(self):
+        """Create the index"""
+        object.__init__(self)
+        self.trie = WordTrie()
+        self._docs = dict()     # Document key -> words on each line
+        self._refs = dict()     # Document key -> weakref to its completer
+
+    def AddDocument(self, completer):
+        """Adds a document to the index, its words are added to the tree
+        the first time they are needed.
+        @param completer: L{Completer} of the document
+
+        """
+        key = id(completer)
+        if key not in self._refs:
+            self._refs[key] = weakref.ref(completer,
+                                          lambda ref: self.RemoveDocument(key))
+
+    def GetLines(self, completer):
+        """Gets the cached words of each line of a document
+        @param completer: L{Completer} of the document
+        @return: list or None if the document has not been scanned
+
+        """
+        return self._docs.get(id(completer))
+
+    def RemoveDocument(self, key):
+        """Removes the words of a document from the tree
+        @param key: document key (id of its completer)
+
+        """
+        self._refs.pop(key, None)
+        lines = self._docs.pop(key, None)
+        if lines is not None:
+            self.RemoveLines(lines)
+
+    def AddLines(self, lines):
+        """Adds the words of some lines to the tree
+        @param lines: list of tuples of words
+
+        """
+        counts = dict()
+        for words in lines:
+            if words:
+                for word in words:
+                    counts[word] = counts.get(word, 0) + 1
+        for word, count in counts.iteritems():
+            self.trie.Add(word, count)
+
+    def RemoveLines(self, lines):
+        """Removes the words of some lines from the tree
+        @param lines: list of tuples of words
+
+        """
+        counts = dict()
+        for words in lines:
+            if words:
+                for word in words:
+                    counts[word] = counts.get(word, 0) + 1
+        for word, count in counts.iteritems():
+            self.trie.Remove(word, count)
+
+    def Scan(self):
+        """Makes sure all the documents in the index have been scanned"""
+        for key, ref in self._refs.items():
+            completer = ref()
+            if completer is not None:
+                try:
+                    completer.Scan()
+                except Exception:
+                    # The document's window has been destroyed
+                    self.RemoveDocument(key)
+
+    def SetLines(self, completer, lines):
+        """Sets the words of all the lines of a document
+        @param completer: L{Completer} of the document
+        @param lines: list of tuples of words
+
+        """
+        key = id(completer)
+        old = self._docs.get(key)
+        if old is not None:
+            self.RemoveLines(old)
+        self._docs[key] = lines
+        self.AddLines(lines)
+
+#--------------------------------------------------------------------------#
+
+class Completer(object):
+    """Word completion provider for a document. The document is scanned
+    the first time completions are requested, after that only the modified
+    lines are scanned again.
+
+    """
+    def __init__(self, stc_buffer):
+        """Create the completer
+        @param stc_buffer: buffer to complete words in
+
+        """
+        object.__init__(self)
+        self._buffer = stc_buffer
+        self._keywords = u''
+        self._kwlist = list()
+        self._index = GetIndex(stc_buffer.GetLangId())
+        self._index.AddDocument(self)
+
+    def Detach(self):
+        """Removes the document's words from the index
+        @postcondition: the completer can no longer be used
+
+        """
+        self._index.RemoveDocument(id(self))
+
+    def GetWordCompList(self, prefix, keywords=u''):
+        """Gets the words that complete a prefix from the open documents of
+        the same language along with the matching keywords.
+        @param prefix: string
+        @keyword keywords: space separated keywords of the language
+        @return: list of words, most used first followed by the keywords
+
+        """
+        self._index.Scan()
+        words = [word for word in self._index.trie.Complete(prefix)
+                 if word != prefix]
+
+        if keywords is not self._keywords:
+            self._keywords = keywords
+            self._kwlist = keywords.split()
+            self._kwlist.sort()
+
+        # The keywords are sorted so the matches are a contiguous range
+        idx = bisect.bisect_left(self._kwlist, prefix)
+        seen = set(words)
+        while idx < len(self._kwlist) and \
+              self._kwlist[idx].startswith(prefix):
+            kword = self._kwlist[idx]
+            if kword not in seen and kword != prefix:
+                words.append(kword)
+            idx += 1
+        return words
+
+    def NotifyModified(self, position, lines_added):
+        """Updates the words of the lines changed by an insertion or
+        deletion of text in the buffer.
+        @param position: position the text was inserted or deleted at
+        @param lines_added: number of lines added (negative when deleted)
+
+        """
+        lines = self._index.GetLines(self)
+        if lines is None:
+            return
+
+        first = self._buffer.LineFromPosition(position)
+        last = first + max(-lines_added, 0) + 1
+        old = lines[first:last]
+        new = [GetWords(self._buffer.GetLine(line))
+               for line in xrange(first, first + max(lines_added, 0) + 1)]
+        if len(lines) - len(old) + len(new) != self._buffer.GetLineCount():
+            # Out of sync, scan the whole buffer again
+            self._index.SetLines(self, self.ScanLines())
+            return
+
+        lines[first:last] = new
+        self._index.RemoveLines(old)
+        self._index.AddLines(new)
+
+    def Scan(self):
+        """Scans the buffer if it has not been scanned yet"""
+        if self._index.GetLines(self) is None:
+            self._index.SetLines(self, self.ScanLines())
+
+    def ScanLines(self):
+        """Gets the words used on each line of the buffer
+        @return: list of tuples of words
+
+        """
+        return [GetWords(text) for text in
+                RE_EOL.split(self._buffer.GetText())]
+
+#--------------------------------------------------------------------------#
+
+def GetIndex(lang_id):
+    """Gets the shared word index of a language
+    @param lang_id: language id of the documents
+    @return: L{WordIndex}
+
+    """
+    if lang_id not in INDEXES:
+        INDEXES[lang_id] = WordIndex()
+    return INDEXES[lang_id]
+
+def GetWords(text):
+    """Gets the words used on a line
+    @param text: line of text
+    @return: tuple of words or None if there are none
+
+    """
+    words = RE_WORD.findall(text)
+    if len(words):
+        return tuple(words)
+    return None
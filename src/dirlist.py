@@ -0,0 +1,214 @@
+###############################################################################
+# Name: dirlist.py                                                            #
+# Purpose: Cached directory listings                                          #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2007 Cody Precord <staff@editra.org>                         #
+# Licence: wxWindows Licence                                                  #
+###############################################################################
+
+"""
+#--------------------------------------------------------------------------#
+# FILE: dirlist.py                                                         #
+# AUTHOR: Cody Precord                                                     #
+# LANGUAGE: Python                                                         #
+# SUMMARY:                                                                 #
+#    Lists the contents of directories split up into sub directories and  #
+# files. When scandir is available (os.scandir or the scandir package)    #
+# the type of each entry is read along with the directory on most         #
+# platforms, otherwise every entry has to be stat'd to find out if it is  #
+# a directory. The listings are cached and are only read again when the   #
+# modification time of the directory changes, so that browsing and       #
+# completing paths in large directories does not hit the disk each time.  #
+#                                                                          #
+# METHODS:                                                                 #
+#   L{ListDir} Lists a directory                                           #
+#   L{DirCache} Cache of directory listings                                #
+#                                                                          #
+#--------------------------------------------------------------------------#
+"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__svnid__ = "$Id$"
+__revision__ = "$Revision$"
+
+#--------------------------------------------------------------------------#
+# Dependancies
+import os
+import time
+import threading
+
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+#--------------------------------------------------------------------------#
+# Globals
+MAX_DIRS = 512          # Max number of listings kept in a cache
+
+# Listings of directories modified less than this many seconds before they
+# were read are not trusted, since a change in the same second would not
+# change the modification time on file systems with coarse timestamps.
+MTIME_SLACK = 2
+
+#--------------------------------------------------------------------------#
+
+def IsHidden(name):
+    """Is the file or directory name a hidden one
+    @param name: file name
+    @return: bool
+
+    """
+    return name.startswith(u'.')
+
+def ListDir(path):
+    """Lists the contents of a directory. When the path is unicode the
+    names that can not be decoded are left out, since they can not be
+    joined to the path or compared with the other names.
+    @param path: directory to list
+    @return: (list of directory names, list of file names) both sorted
+             without regard to case
+    @raise: OSError if the directory can not be read
+
+    """
+    dirs = list()
+    files = list()
+    if scandir is not None:
+        for entry in scandir(path):
+            if not isinstance(entry.name, type(path)):
+                continue
+            try:
+                isdir = entry.is_dir()
+            except OSError:
+                isdir = False
+            if isdir:
+                dirs.append(entry.name)
+            else:
+                files.append(entry.name)
+    else:
+        for name in os.listdir(path):
+            if not isinstance(name, type(path)):
+                continue
+            if os.path.isdir(os.path.join(path, name)):
+                dirs.append(name)
+            else:
+                files.append(name)
+
+    dirs.sort(key=SortKey)
+    files.sort(key=SortKey)
+    return dirs, files
+
+def SortKey(name):
+    """Key to sort file names by
+    @param name: file name
+    @return: key
+
+    """
+    return name.lower()
+
+#--------------------------------------------------------------------------#
+
+class DirCache(object):
+    """Cache of directory listings. Listings are checked against the
+    modification time of the directory when they are used, unless they were
+    checked less than ttl seconds ago. The cache is safe to use from more
+    than one thread.
+
+    """
+    def __init__(self, ttl=0, max_dirs=MAX_DIRS):
+        """Create the cache
+        @keyword ttl: seconds to use a listing without checking the directory
+        @keyword max_dirs: max number of listings to keep
+
+        """
+        object.__init__(self)
+
+        # Attributes
+        self._ttl = ttl
+        self._max = max(max_dirs, 1)
+        self._lock = threading.Lock()
+        # path -> [mtime, time checked, dirs, files, (visible dirs, files)]
+        self._cache = dict()
+
+    def GetListing(self, path, hidden=True):
+        """Gets the listing of a directory, the directory is only read if
+        it has changed since it was last listed. The returned lists are
+        shared with the cache and must not be modified.
+        @param path: directory path
+        @keyword hidden: include hidden files and directories
+        @return: (list of directory names, list of file names)
+        @raise: OSError if the directory can not be read
+
+        """
+        now = time.time()
+        entry = self._cache.get(path)
+        if entry is not None and now - entry[1] < self._ttl:
+            return self._GetNames(entry, hidden)
+
+        mtime = os.stat(path).st_mtime
+        if entry is None or entry[0] is None or entry[0] != mtime:
+            dirs, files = ListDir(path)
+            if now - mtime < MTIME_SLACK:
+                mtime = None
+            entry = [mtime, now, dirs, files, None]
+            self._lock.acquire()
+            try:
+                self._cache[path] = entry
+                if len(self._cache) > self._max:
+                    oldest = min(self._cache.iteritems(),
+                                 key=lambda item: item[1][1])
+                    del self._cache[oldest[0]]
+            finally:
+                self._lock.release()
+        else:
+            entry[1] = now
+        return self._GetNames(entry, hidden)
+
+    def Invalidate(self, path=None):
+        """Drops a listing from the cache so that the directory is read
+        again the next time it is used.
+        @keyword path: directory path or None to drop all the listings
+
+        """
+        self._lock.acquire()
+        try:
+            if path is None:
+                self._cache.clear()
+            elif path in self._cache:
+                del self._cache[path]
+        finally:
+            self._lock.release()
+
+    def IsStale(self, path):
+        """Has the directory changed since it was last listed
+        @param path: directory path
+        @return: bool (True if it has no listing in the cache)
+
+        """
+        entry = self._cache.get(path)
+        if entry is None or entry[0] is None:
+            return True
+        try:
+            return os.stat(path).st_mtime != entry[0]
+        except OSError:
+            return True
+
+    def _GetNames(self, entry, hidden):
+        """Gets the names from a cache entry
+        @param entry: cache entry
+        @param hidden: include hidden names
+        @return: (dirs, files)
+
+        """
+        if hidden:
+            return entry[2], entry[3]
+
+        visible = entry[4]
+        if visible is None:
+            visible = ([name for name in entry[2] if not IsHidden(name)],
+                       [name for name in entry[3] if not IsHidden(name)])
+            entry[4] = visible
+        return visible
@@ -25,9 +25,21 @@ __revision__ = "$Revision$"
 #--------------------------------------------------------------------------#
 # Dependancies
 import os
+import zlib
+import marshal
 import util
 from profiler import Profile_Get
 
+try:
+    from hashlib import md5
+except ImportError:
+    from md5 import new as md5
+
+#--------------------------------------------------------------------------#
+# Globals
+
+LEXCACHE_MIN = 65536    # Documents smaller than this are not cached
+
 #--------------------------------------------------------------------------#
 
 class DocPositionMgr(object):
@@ -126,3 +138,145 @@ class DocPositionMgr(object):
             writer.close()
         except (IOError, AttributeError), msg:
             util.Log("[docpositionmgr] %s" % str(msg))
+
+#--------------------------------------------------------------------------#
+
+class LexerCacheMgr(object):
+    """Object for managing an on disk cache of the style bytes, fold
+    levels and line states that the lexer produced for a document.
+    Documents that have not changed since they were last opened can then
+    have their styling restored from the cache instead of being lexed
+    again. The cache is kept under a size limit by removing the least
+    recently used entries.
+    @note: saves data to ~/.Editra/cache/lexcache/
+
+    """
+    def __init__(self, cache_dir, max_size=None):
+        """Creates the cache manager
+        @param cache_dir: directory to store cache entries in
+        @keyword max_size: maximum size of the cache in bytes, defaults to
+                           the LEXCACHE_SIZE profile setting
+
+        """
+        object.__init__(self)
+        self._dir = cache_dir
+        if max_size is None:
+            max_size = Profile_Get('LEXCACHE_SIZE', 'int', 0)
+        self._max = max_size
+
+    def _GetPath(self, key):
+        """Get the path to the cache entry for the given key
+        @param key: key returned from L{GetKey}
+
+        """
+        return os.path.join(self._dir, key)
+
+    def GetKey(self, path, txt, lexer, sheet):
+        """Gets the key to store the style data of a document under
+        @param path: path of the document
+        @param txt: text of the document
+        @param lexer: id of the lexer used to style the document
+        @param sheet: string identifying the style sheet and its version
+        @return: string
+
+        """
+        if isinstance(txt, unicode):
+            txt = txt.encode('utf-8')
+        key = md5()
+        for val in (path, txt, lexer, sheet):
+            if isinstance(val, unicode):
+                val = val.encode('utf-8')
+            key.update(str(val))
+            key.update('\0')
+        return key.hexdigest()
+
+    def Load(self, key):
+        """Loads the cached data stored under key
+        @param key: key returned from L{GetKey}
+        @return: tuple of (style bytes, list of fold levels, list of line
+                 states) or None if there is no usable entry for the key.
+
+        """
+        path = self._GetPath(key)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            handle = open(path, 'rb')
+            data = handle.read()
+            handle.close()
+            styles, folds, states = marshal.loads(zlib.decompress(data))
+            # Update the access time used for removing old entries
+            os.utime(path, None)
+        except (IOError, OSError, EOFError, ValueError, TypeError,
+                zlib.error), msg:
+            util.Log("[lexcachemgr][err] Bad cache entry %s: %s" % \
+                     (key, str(msg)))
+            self.Remove(key)
+            return None
+        return styles, folds, states
+
+    def Prune(self):
+        """Removes the least recently used entries from the cache until
+        its total size is under the size limit.
+        @postcondition: cache directory is under the size limit
+
+        """
+        if not self._max or not os.path.exists(self._dir):
+            return
+
+        entries = list()
+        total = 0
+        for fname in os.listdir(self._dir):
+            path = os.path.join(self._dir, fname)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, fname))
+            total += stat.st_size
+
+        entries.sort()
+        while total > self._max and len(entries):
+            mtime, size, fname = entries.pop(0)
+            self.Remove(fname)
+            total -= size
+
+    def Remove(self, key):
+        """Remove the entry stored under key from the cache
+        @param key: key returned from L{GetKey}
+
+        """
+        try:
+            os.remove(self._GetPath(key))
+        except OSError:
+            pass
+
+    def Save(self, key, styles, folds, states):
+        """Stores the style data in the cache
+        @param key: key returned from L{GetKey}
+        @param styles: string of style bytes for the whole document
+        @param folds: list of fold levels for each line of the document
+        @param states: list of lexer line states for each line
+        @return: whether the data was saved or not
+
+        """
+        if not os.path.exists(self._dir):
+            try:
+                os.makedirs(self._dir)
+            except OSError, msg:
+                util.Log("[lexcachemgr][err] %s" % str(msg))
+                return False
+
+        try:
+            handle = open(self._GetPath(key), 'wb')
+            data = marshal.dumps((styles, folds, states))
+            handle.write(zlib.compress(data, 1))
+            handle.close()
+        except (IOError, OSError, ValueError), msg:
+            util.Log("[lexcachemgr][err] %s" % str(msg))
+            self.Remove(key)
+            return False
+
+        self.Prune()
+        return True
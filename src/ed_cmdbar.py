@@ -30,12 +30,20 @@ __revision__ = "$Revision$"
 import os
 import sys
 import re
+import threading
 import wx
 import util
+import bisect
 import ed_glob
 import ed_search
+import dirlist
+import pathindex
 
 _ = wx.GetTranslation
+
+COMPLETE_TTL = 2        # Seconds to use a listing before checking the dir
+DIR_CACHE = dirlist.DirCache(COMPLETE_TTL)  # Listings used for completion
+_LOWERED = dict()       # id(names) -> (names, lower case names)
 #--------------------------------------------------------------------------#
 # Close Button Bitmap
 from wx import ImageFromStream, BitmapFromImage
@@ -401,6 +409,76 @@ class CommandBar(wx.Panel):
 
 #-----------------------------------------------------------------------------#
 
+def GetCompletions(path, part, files=True):
+    """Gets the names in a directory that complete a partial name. The
+    names that start with the partial name are returned, if there are none
+    the names that contain its characters in the same order are returned.
+    Hidden names are only completed when the partial name starts with a dot.
+    @param path: directory to look in
+    @param part: partial name
+    @keyword files: complete files as well as directories
+    @return: list of names, directory names end with a path separator
+
+    """
+    try:
+        dirs, fnames = DIR_CACHE.GetListing(path, part.startswith(u'.'))
+    except OSError:
+        return list()
+
+    groups = [(dirs, os.sep)]
+    if files:
+        groups.append((fnames, u''))
+
+    matches = list()
+    for names, suffix in groups:
+        matches.extend([name + suffix for name in PrefixMatches(names, part)])
+
+    if not len(matches) and len(part):
+        search = pathindex.MakeRegex(part.lower()).search
+        for names, suffix in groups:
+            matches.extend([name + suffix for name in names
+                            if search(name.lower())])
+    return matches
+
+def PrefetchDir(path):
+    """Reads a directory into the completion cache, this is run on a
+    background thread.
+    @param path: directory path
+
+    """
+    try:
+        DIR_CACHE.GetListing(path)
+    except OSError:
+        pass
+
+def PrefixMatches(names, part):
+    """Gets the names that start with part without regard to case. The
+    lower case names of the most recent listings are kept so that the
+    matches can be found with a binary search.
+    @param names: list of names sorted by L{dirlist.SortKey}
+    @param part: partial name
+    @return: list of names
+
+    """
+    if not len(part):
+        return list(names)
+
+    lower = _LOWERED.get(id(names))
+    if lower is None or lower[0] is not names:
+        if len(_LOWERED) > 16:
+            _LOWERED.clear()
+        lower = (names, [dirlist.SortKey(name) for name in names])
+        _LOWERED[id(names)] = lower
+
+    lowered = lower[1]
+    part = part.lower()
+    start = end = bisect.bisect_left(lowered, part)
+    while end < len(lowered) and lowered[end].startswith(part):
+        end += 1
+    return names[start:end]
+
+#-----------------------------------------------------------------------------#
+
 class CommandExecuter(wx.SearchCtrl):
     """Part of the Vi emulation, opens a minibuffer to execute EX commands.
     @note: based on search ctrl so we get the nice roudned edges on wxmac.
@@ -420,6 +498,9 @@ class CommandExecuter(wx.SearchCtrl):
         self._histidx = -1
         self._curdir = wx.GetHomeDir() + os.sep
         self._bpath = None
+        self._complete = None   # (text, matches, index, prefix) of last tab
+        self._prefetch = None   # Directory last listed ahead of completion
+        self._cycle = 1         # Direction to cycle through the matches in
         if not hasattr(sys, 'frozen'):
             self._curdir = os.path.abspath(os.curdir) + os.sep
 
@@ -459,6 +540,32 @@ class CommandExecuter(wx.SearchCtrl):
         else:
             pass
 
+    def _SplitPath(self, cmd):
+        """Splits up a command that takes a path argument
+        @param cmd: command string (i.e 'cd ../foo/ba')
+        @return: (command, argument, directory path, partial name)
+
+        """
+        verb, arg = (cmd.split(u' ', 1) + [u''])[:2]
+        arg = arg.lstrip()
+        head, part = os.path.split(arg)
+        path = os.path.expanduser(head)
+        if not os.path.isabs(path):
+            path = os.path.join(self._curdir, path)
+        return verb, arg, os.path.normpath(path), part
+
+    def _SetCompletion(self, value, matches, idx, prefix):
+        """Sets the text of the control to a completion
+        @param value: new text
+        @param matches: list of matching names
+        @param idx: index of the match being shown
+        @param prefix: text before the name
+
+        """
+        self.SetValue(value)
+        self.SetInsertionPointEnd()
+        self._complete = (value, matches, idx, prefix)
+
     def ChangeDir(self, cmd):
         """Change to a directory based on cd command
         @param cmd: cd path
@@ -489,6 +596,41 @@ class CommandExecuter(wx.SearchCtrl):
         if len(self._cmdstack) > 25:
             self._cmdstack.pop()
 
+    def CompletePath(self, files=True):
+        """Completes the path argument of the current command. The first
+        completion fills in as much of the name as all the matches have in
+        common, after that each completion cycles through the matches.
+        @keyword files: complete files as well as directories
+
+        """
+        cmd = self.GetValue()
+        last = self._complete
+        if last is not None and cmd == last[0]:
+            matches, idx, prefix = last[1:]
+            if idx < 0 and self._cycle < 0:
+                idx = len(matches) - 1
+            else:
+                idx = (max(idx, -1) + self._cycle) % len(matches)
+            self._SetCompletion(prefix + matches[idx], matches, idx, prefix)
+            return
+
+        self._complete = None
+        verb, arg, path, part = self._SplitPath(cmd)
+        matches = GetCompletions(path, part, files)
+        if not len(matches):
+            wx.Bell()
+            return
+
+        prefix = u"%s %s" % (verb, arg[:len(arg) - len(part)])
+        common = os.path.commonprefix(matches)
+        if len(matches) == 1:
+            self.SetValue(prefix + matches[0])
+            self.SetInsertionPointEnd()
+        elif len(common) > len(part) and common.startswith(part):
+            self._SetCompletion(prefix + common, matches, -1, prefix)
+        else:
+            self._SetCompletion(prefix + matches[0], matches, 0, prefix)
+
     def EditCommand(self, cmd):
         """Perform an edit related command
         @param cmd: command string to execute
@@ -625,75 +767,19 @@ class CommandExecuter(wx.SearchCtrl):
         wins[widx].Raise()
         wx.CallAfter(wins[widx].nb.GetCurrentCtrl().SetFocus)
 
-    def GetNextDir(self):
-        """Get the next directory path from the current cmd path
-        @note: used for tab completion of cd, completion is based off cwd
-        @todo: finish working on this by starting over
-        @note: not currently used
-
-        """
-        cmd = self.GetValue()
-        if not cmd.startswith('cd '):
-            return
-
-        cmd = cmd.replace('cd ', u'', 1).strip()
-        if not os.path.exists(self._curdir):
-            self._curdir = wx.GetHomeDir()
-
-        if len(cmd) and (cmd[0].isalnum() or cmd.startswith('.')):
-            path = self._curdir
-            cmd = os.path.join(path, cmd)
-        else:
-            path = os.path.abspath(cmd)
-            if (len(cmd) and cmd[-1] == os.sep) or not len(cmd):
-                path = path + os.sep
-
-        if not os.path.exists(path):
-            path = self._curdir
-
-        # Filter Directories
-        if path[-1] != os.sep:
-            path = os.path.join(*os.path.split(path)[:-1]) + os.sep
-            if not path.startswith(os.sep):
-                path = os.sep + path
-        dirs = [ os.path.join(path, x) \
-                 for x in os.listdir(path) \
-                 if os.path.isdir(os.path.join(path, x)) ]
-        dirs.sort()
-        if not len(dirs):
-            return
-
-        if len(cmd):
-            npath = None
-            for next in dirs:
-                if next.startswith(cmd):
-                    if cmd[-1] != os.path.sep and next == cmd:
-                        idx = dirs.index(next) + 1
-                    else:
-                        idx = dirs.index(next)
-                    
-                    if idx < len(dirs):
-                        npath = dirs[idx] #.replace(path, u'', 1)
-                    break
-            if npath:
-                return npath
-        else:
-            return dirs[0]
-
     def ListDir(self):
-        """List the next directory from the current cmd path
+        """Complete the directory in the current cmd path
         @note: used for tab completion of cd, completion is based off cwd
 
         """
-        path = self.GetNextDir()
-        if path:
-            self.SetValue('cd ' + path)
+        self.CompletePath(False)
 
     def ListFile(self):
-        """List the next file in the current cmd path
+        """Complete the file in the current cmd path
         @note: used for tab completion of e, completion is based off cwd
 
         """
+        self.CompletePath(True)
 
     def OnEnter(self, evt):
         """Get the currently entered command string and execute it.
@@ -721,6 +807,10 @@ class CommandExecuter(wx.SearchCtrl):
             pass
         elif e_key == wx.WXK_TAB:
             # Provide Tab Completion or swallow key
+            if evt.ShiftDown():
+                self._cycle = -1
+            else:
+                self._cycle = 1
             if cmd.startswith('e '):
                 self.ListFile()
             elif cmd.startswith('cd '):
@@ -739,8 +829,25 @@ class CommandExecuter(wx.SearchCtrl):
 
         """
         self._AdjustSize()
+        self.Prefetch()
         evt.Skip()
 
+    def Prefetch(self):
+        """Starts listing the directory of the path being typed in the
+        background, so that the listing is ready when it is completed.
+
+        """
+        cmd = self.GetValue()
+        if not cmd.startswith(u'cd ') and not cmd.startswith(u'e '):
+            return
+
+        path = self._SplitPath(cmd)[2]
+        if path != self._prefetch:
+            self._prefetch = path
+            lister = threading.Thread(target=PrefetchDir, args=(path,))
+            lister.setDaemon(True)
+            lister.start()
+
     def Quit(self):
         """Tell the editor to exit
         @postcondition: Editor begins exit, confirming file saves
@@ -0,0 +1,340 @@
+###############################################################################
+# Name: ed_export.py                                                          #
+# Purpose: Batch export of files to styled documents from the command line    #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2007 Cody Precord <staff@editra.org>                         #
+# Licence: wxWindows Licence                                                  #
+###############################################################################
+
+"""
+#--------------------------------------------------------------------------#
+# FILE: ed_export.py                                                       #
+# AUTHOR: Cody Precord                                                     #
+# LANGUAGE: Python                                                         #
+# SUMMARY:                                                                 #
+#    Exports files to html, latex or rtf without showing any windows. It   #
+# is run from the command line (Editra --export html --out DIR files...). #
+# Each file is loaded into a hidden text control that is styled with the  #
+# users style sheet and then passed to the same generators that are used  #
+# from the Generator menu. The files are split up between a pool of       #
+# worker processes that each have their own hidden control. An index page #
+# that links to the documents along with how long each took to export is  #
+# written to the output directory.                                         #
+#                                                                          #
+#    The text control needs a display even though it is never shown, on    #
+# machines without one run the export under a virtual display              #
+# (i.e xvfb-run Editra --export ...).                                      #
+#                                                                          #
+# METHODS:                                                                 #
+#   L{ExportFiles} Exports a list of files and directories                 #
+#                                                                          #
+#--------------------------------------------------------------------------#
+"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__svnid__ = "$Id$"
+__revision__ = "$Revision$"
+
+#--------------------------------------------------------------------------#
+# Dependancies
+import os
+import sys
+import cgi
+import time
+import urllib
+import wx
+import ed_glob
+import util
+import ed_stc
+import generator
+
+try:
+    import multiprocessing
+except ImportError:
+    # Python < 2.6, the files are exported one at a time
+    multiprocessing = None
+
+#--------------------------------------------------------------------------#
+# Globals
+
+# Command line format names -> generator ids
+FORMATS = { 'html' : ed_glob.ID_HTML_GEN,
+            'latex' : ed_glob.ID_TEX_GEN,
+            'rtf' : ed_glob.ID_RTF_GEN }
+
+INDEX_PAGE = u"index.html"      # Renamed if a document has the same name
+
+# Exporter of the current process and why it could not be created
+EXPORTER = None
+INIT_ERROR = None
+
+#--------------------------------------------------------------------------#
+
+class Exporter(object):
+    """Generates documents from files using a hidden text control"""
+    def __init__(self, app):
+        """Create the hidden control that the files are loaded into
+        @param app: Editra application object
+
+        """
+        object.__init__(self)
+        self._frame = wx.Frame(None, wx.ID_ANY, ed_glob.PROG_NAME)
+        self._stc = ed_stc.EditraStc(self._frame, wx.ID_ANY)
+        self._stc.SetAutoComplete(False)
+        self._stc.SetUndoCollection(False)
+        self._gen = generator.Generator(app.GetPluginManager())
+
+    def ExportFile(self, fmt, path, outbase):
+        """Exports a file
+        @param fmt: one of the L{FORMATS}
+        @param path: file to export
+        @param outbase: path of the document without its extension
+        @return: (path of the document, number of characters exported,
+                  seconds taken)
+        @raise: IOError, OSError or ValueError if the file could not
+                be exported
+
+        """
+        start = time.time()
+        txt, enc = util.GetDecodedText(path)
+        if not len(txt):
+            # Empty files come back undecoded since u'' is false
+            txt = u''
+        if not isinstance(txt, unicode):
+            raise ValueError("Unable to decode the text of the file")
+
+        stc = self._stc
+        stc.SetText(txt, enc)
+        stc.SetFileName(path)
+
+        # Exported documents are always styled no matter their size
+        if stc.FindLexer() == 1:
+            stc.SetLargeFileMode(False)
+
+        doc = self._gen.GenerateStream(FORMATS[fmt], stc)
+        if not doc:
+            raise ValueError("The %s generator is not enabled" % fmt)
+
+        outpath = u"%s.%s" % (outbase, doc[0])
+        outdir = os.path.dirname(outpath)
+        if outdir and not os.path.exists(outdir):
+            os.makedirs(outdir)
+        generator.WriteChunks(doc[1], outpath, stc.GetTextLength())
+        return outpath, stc.GetTextLength(), time.time() - start
+
+#--------------------------------------------------------------------------#
+
+def _InitWorker():
+    """Creates the application and L{Exporter} of a worker process"""
+    global EXPORTER, INIT_ERROR
+    import Editra
+    try:
+        app = Editra.Editra(False)
+    except (SystemExit, Exception), msg:
+        INIT_ERROR = u"Unable to initialize: %s" % msg
+        return
+
+    # Errors are reported in the results instead of the error dialog
+    sys.excepthook = sys.__excepthook__
+    EXPORTER = Exporter(app)
+
+def _ExportJob(job):
+    """Exports a file in a worker process
+    @param job: (format, path, path of the document without its extension)
+    @return: (path, document path, characters, seconds, error message)
+
+    """
+    fmt, path, outbase = job
+    if EXPORTER is None:
+        return (path, None, 0, 0.0, INIT_ERROR)
+
+    try:
+        outpath, size, secs = EXPORTER.ExportFile(fmt, path, outbase)
+    except (IOError, OSError, ValueError), msg:
+        return (path, None, 0, 0.0, unicode(msg))
+    except Exception, msg:
+        # Errors in the lexers or generators only fail this file
+        return (path, None, 0, 0.0,
+                u"%s: %s" % (msg.__class__.__name__, unicode(msg)))
+    return (path, outpath, size, secs, None)
+
+#--------------------------------------------------------------------------#
+
+def ExportFiles(fmt, outdir, paths, processes=None):
+    """Exports files to styled documents and writes an index page for them
+    to the output directory. Directories are searched recursively.
+    @param fmt: one of the L{FORMATS}
+    @param outdir: directory to write the documents to
+    @param paths: list of files and directories to export
+    @keyword processes: number of worker processes (default cpu count)
+    @return: exit status for the command line
+
+    """
+    if fmt not in FORMATS:
+        print >> sys.stderr, "Unknown export format: %s (use %s)" % \
+                             (fmt, u", ".join(sorted(FORMATS.keys())))
+        return 2
+
+    if sys.platform.startswith('linux') and not os.environ.get('DISPLAY'):
+        print >> sys.stderr, ("No display is available, run the export under "
+                              "a virtual display (i.e xvfb-run)")
+        return 2
+
+    outdir = os.path.abspath(outdir)
+    jobs = [(fmt, path, os.path.join(outdir, name))
+            for path, name in GetExportList(paths)]
+    if not len(jobs):
+        print >> sys.stderr, "No files to export"
+        return 2
+
+    start = time.time()
+    results = list()
+    # Forking is not possible in frozen applications
+    if multiprocessing is not None and not hasattr(sys, 'frozen') and \
+       len(jobs) > 1 and processes != 1:
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+        processes = max(min(processes, len(jobs)), 1)
+        pool = multiprocessing.Pool(processes, _InitWorker)
+        try:
+            for result in pool.imap_unordered(_ExportJob, jobs):
+                PrintResult(result)
+                results.append(result)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        processes = 1
+        _InitWorker()
+        for job in jobs:
+            result = _ExportJob(job)
+            PrintResult(result)
+            results.append(result)
+    wall = time.time() - start
+
+    results.sort()
+    index = WriteIndex(outdir, results, fmt, wall, processes)
+    failed = len([result for result in results if result[4] is not None])
+    print "Exported %d of %d files in %.3fs with %d processes" % \
+          (len(results) - failed, len(results), wall, processes)
+    print "Index page: %s" % index
+    if failed:
+        return 1
+    return 0
+
+def GetExportList(paths):
+    """Gets the files to export and the names to give their documents.
+    Files in directories are named by their path from the parent of the
+    directory, hidden files and directories are skipped.
+    @param paths: list of files and directories
+    @return: list of (path, name) tuples
+
+    """
+    files = list()
+    names = dict()
+    for path in paths:
+        path = os.path.abspath(path)
+        if os.path.isdir(path):
+            parent = os.path.dirname(path.rstrip(os.sep))
+            found = list()
+            for root, dirs, fnames in os.walk(path):
+                dirs[:] = [dname for dname in dirs if not dname.startswith('.')]
+                found.extend([os.path.join(root, fname) for fname in fnames
+                              if not fname.startswith('.')])
+            found.sort()
+            found = util.FilterFiles(found)
+            files.extend([(fname, fname[len(parent):].lstrip(os.sep))
+                          for fname in found])
+        elif os.path.isfile(path):
+            files.append((path, os.path.basename(path)))
+
+    # Make sure that the documents don't overwrite each other
+    export = list()
+    seen = set()
+    for path, name in files:
+        if path in seen:
+            continue
+        seen.add(path)
+        count = names.get(name, 0)
+        names[name] = count + 1
+        if count:
+            base, ext = os.path.splitext(name)
+            name = u"%s_%d%s" % (base, count, ext)
+        export.append((path, name))
+    return export
+
+def GetIndexPath(outdir, results):
+    """Gets the path to write the index page to. An underscore is put in
+    front of the name of the page until it does not overwrite one of the
+    exported documents (i.e a file named index exported to html).
+    @param outdir: directory the documents were written to
+    @param results: list of tuples returned by L{_ExportJob}
+    @return: path of the index page
+
+    """
+    docs = set([os.path.normcase(result[1]) for result in results
+                if result[1] is not None])
+    name = INDEX_PAGE
+    while os.path.normcase(os.path.join(outdir, name)) in docs:
+        name = u"_" + name
+    return os.path.join(outdir, name)
+
+def PrintResult(result):
+    """Prints the result of exporting a file
+    @param result: tuple returned by L{_ExportJob}
+
+    """
+    path, outpath, size, secs, err = result
+    if err is None:
+        print "%8.3fs %10d %s" % (secs, size, path)
+    else:
+        print >> sys.stderr, "  FAILED %s: %s" % (path, err)
+    sys.stdout.flush()
+
+def WriteIndex(outdir, results, fmt, wall, processes):
+    """Writes the index page linking to the exported documents
+    @param outdir: directory the documents were written to
+    @param results: list of tuples returned by L{_ExportJob}
+    @param fmt: format the documents were exported to
+    @param wall: seconds the export took
+    @param processes: number of worker processes used
+    @return: path of the index page
+
+    """
+    rows = list()
+    total = 0.0
+    for path, outpath, size, secs, err in results:
+        name = cgi.escape(path)
+        if err is None:
+            total += secs
+            rel = outpath[len(outdir):].lstrip(os.sep).replace(os.sep, '/')
+            if isinstance(rel, unicode):
+                rel = rel.encode('utf-8')
+            rows.append(u"<tr><td><a href=\"%s\">%s</a></td>"
+                        u"<td align=\"right\">%d</td>"
+                        u"<td align=\"right\">%.3f</td></tr>" % \
+                        (urllib.quote(rel), name, size, secs))
+        else:
+            rows.append(u"<tr><td>%s</td><td colspan=\"2\">%s</td></tr>" % \
+                        (name, cgi.escape(err)))
+
+    page = (u"<html>\n<head>\n<title>%(title)s</title>\n"
+            u"<meta name=\"Generator\" content=\"Editra/%(version)s\">\n"
+            u"<meta http-equiv=\"content-type\" content=\"text/html; "
+            u"charset=utf-8\">\n</head>\n<body>\n<h1>%(title)s</h1>\n"
+            u"<p>%(count)d files exported to %(fmt)s in %(wall).3f seconds "
+            u"(%(total).3f seconds of work in %(procs)d processes)</p>\n"
+            u"<table>\n<tr><th>File</th><th>Characters</th>"
+            u"<th>Seconds</th></tr>\n%(rows)s\n</table>\n</body>\n</html>\n") % \
+           dict(title=cgi.escape(os.path.basename(outdir) or outdir),
+                version=ed_glob.VERSION, count=len(results), fmt=fmt,
+                wall=wall, total=total, procs=processes,
+                rows=u"\n".join(rows))
+
+    if not os.path.exists(outdir):
+        os.makedirs(outdir)
+    index = GetIndexPath(outdir, results)
+    handle = open(index, 'wb')
+    handle.write(page.encode('utf-8'))
+    handle.close()
+    return index
@@ -47,7 +47,8 @@ __all__ = [ 'CONFIG', 'SB_INFO', 'SB_ROWCOL', 'VERSION', 'PROG_NAME',
             'ID_KWHELPER', 'ID_PLUGMGR', 'ID_STYLE_EDIT', 'ID_MACRO_START', 
             'ID_MACRO_STOP', 'ID_MACRO_PLAY', 'ID_ABOUT', 'ID_HOMEPAGE', 
             'ID_CONTACT', 'ID_COMMAND_BAR', 'ID_DOCUMENTATION', 'ID_COMMAND',
-            'ID_CLOSE_WINDOW' 
+            'ID_CLOSE_WINDOW', 'ID_LARGE_FILE', 'ID_REFLOW_VIEW', 'ID_COPY_HTML',
+            'ID_COPY_RTF', 'ID_QUICK_OPEN'
 ]
 
 #---- Project Info ----#
@@ -83,6 +84,7 @@ DEBUG = False
 ID_NEW           = wx.ID_NEW
 ID_NEW_WINDOW    = wx.NewId()
 ID_OPEN          = wx.ID_OPEN
+ID_QUICK_OPEN    = wx.NewId()
 ID_FHIST         = wx.NewId()
 ID_CLOSE         = wx.ID_CLOSE
 ID_CLOSEALL      = wx.ID_CLOSE_ALL
@@ -104,6 +106,8 @@ ID_CUT           = wx.ID_CUT
 ID_COPY          = wx.ID_COPY
 ID_PASTE         = wx.ID_PASTE
 ID_SELECTALL     = wx.ID_SELECTALL
+ID_COPY_HTML     = wx.NewId()
+ID_COPY_RTF      = wx.NewId()
 ID_LINE_EDIT     = wx.NewId()
 ID_BOOKMARK      = wx.NewId()
 ID_ADD_BM        = wx.ID_ADD
@@ -162,6 +166,7 @@ ID_SHELF         = wx.NewId()
 ID_GOTO_LINE     = wx.NewId()
 ID_NEXT_MARK     = wx.ID_FORWARD
 ID_PRE_MARK      = wx.ID_BACKWARD
+ID_REFLOW_VIEW   = wx.NewId()
 
 # Format Menu IDs
 ID_FONT          = wx.NewId()
@@ -190,6 +195,7 @@ ID_SYN_OFF       = wx.NewId()
 ID_FOLDING       = wx.NewId()
 ID_BRACKETHL     = wx.NewId()
 ID_LEXER         = wx.NewId()
+ID_LARGE_FILE    = wx.NewId()
 
 # Tool Menu IDs
 ID_COMMAND       = wx.NewId()
@@ -43,6 +43,7 @@ import ed_pages
 import ed_menu
 import ed_print
 import ed_cmdbar
+import ed_quickopen
 import syntax.syntax as syntax
 import generator
 import plugin
@@ -162,6 +163,7 @@ class MainWindow(wx.Frame, viewmgr.PerspectiveManager):
         self._handlers['menu'].extend([# File Menu
                                        (ID_NEW, self.OnNew),
                                        (ID_OPEN, self.OnOpen),
+                                       (ID_QUICK_OPEN, self.OnQuickOpen),
                                        (ID_CLOSE, self.OnClosePage),
                                        (ID_CLOSE_WINDOW, self.OnClose),
                                        (ID_CLOSEALL, self.OnClosePage),
@@ -181,11 +183,14 @@ class MainWindow(wx.Frame, viewmgr.PerspectiveManager):
                                        (ID_FIND_REPLACE, 
                                         self.nb.FindService.OnShowFindDlg),
                                        (ID_QUICK_FIND, self.OnCommandBar),
+                                       (ID_COPY_HTML, self.OnCopyAs),
+                                       (ID_COPY_RTF, self.OnCopyAs),
                                        (ID_PREF, self.OnPreferences),
 
                                        # View Menu
                                        (ID_GOTO_LINE, self.OnCommandBar),
                                        (ID_VIEW_TOOL, self.OnViewTb),
+                                       (ID_REFLOW_VIEW, self.OnReflowView),
 
                                        # Format Menu
                                        (ID_FONT, self.OnFont),
@@ -390,6 +395,24 @@ class MainWindow(wx.Frame, viewmgr.PerspectiveManager):
         else:
             evt.Skip()
 
+    def OnQuickOpen(self, evt):
+        """Show the Quick Open dialog and open the file that is chosen
+        @param evt: Event fired that called this handler
+        @type evt: wxMenuEvent
+
+        """
+        if evt.GetId() == ID_QUICK_OPEN:
+            dlg = ed_quickopen.QuickOpenDlg(self)
+            dlg.CenterOnParent()
+            result = dlg.ShowModal()
+            path = dlg.GetPath()
+            dlg.Destroy()
+            if result == wx.ID_OK and path is not None:
+                self.DoOpen(evt, path)
+                self.UpdateToolBar()
+        else:
+            evt.Skip()
+
     def OnFileHistory(self, evt):
         """Open a File from the File History
         @param evt: Event fired that called this handler
@@ -671,6 +694,33 @@ class MainWindow(wx.Frame, viewmgr.PerspectiveManager):
     #---- End File Menu Functions ----#
 
     #---- Edit Menu Functions ----#
+    def OnCopyAs(self, evt):
+        """Copies the selected text to the clipboard as a styled document,
+        the visible lines are copied when there is no selection. Only the
+        copied range of the document is generated.
+        @param evt: Event fired that called this handler
+        @type evt: wxMenuEvent
+
+        """
+        gen_id = { ID_COPY_HTML : ID_HTML_GEN,
+                   ID_COPY_RTF : ID_RTF_GEN }.get(evt.GetId())
+        if gen_id is None:
+            evt.Skip()
+            return
+
+        ctrl = self.nb.GetCurrentCtrl()
+        start, end = ctrl.GetSelection()
+        if start == end:
+            start, end = ctrl.GetVisibleRange()
+
+        gen = generator.Generator(wx.GetApp().GetPluginManager())
+        doc = gen.GenerateText(gen_id, ctrl, start, end)
+        if not doc:
+            return
+        if generator.SetClipboardDoc(doc[0], doc[1],
+                                     ctrl.GetTextRange(start, end)):
+            self.PushStatusText(_("Copied as %s") % doc[0].upper(), SB_INFO)
+
     def OnPreferences(self, evt):
         """Open the Preference Panel
         @note: The dialogs module is not imported until this is 
@@ -693,6 +743,32 @@ class MainWindow(wx.Frame, viewmgr.PerspectiveManager):
     #---- End Edit Menu Functions ----#
 
     #---- View Menu Functions ----#
+    def OnReflowView(self, evt):
+        """Opens a read only copy of the current document with its long
+        lines broken up so that minified and single line files can be
+        viewed without slowing down the editor.
+        @param evt: Event fired that called this handler
+        @type evt: wxMenuEvent
+
+        """
+        if evt.GetId() == ID_REFLOW_VIEW:
+            ctrl = self.nb.GetCurrentCtrl()
+            fname = ctrl.GetFileName()
+            txt = ctrl.GetReflowedText()
+            self.nb.NewPage()
+            view = self.nb.GetCurrentCtrl()
+            view.SetText(txt)
+            if fname:
+                view.FindLexer(util.GetExtension(fname))
+                self.nb.SetPageText(self.nb.GetSelection(),
+                                    _("%s (Reflowed)") % \
+                                    util.GetFileName(fname))
+            view.EmptyUndoBuffer()
+            view.SetSavePoint()
+            view.SetReadOnly(True)
+        else:
+            evt.Skip()
+
     def OnViewTb(self, evt):
         """Toggles visibility of toolbar
         @note: On OSX there is a frame button for hidding the toolbar
@@ -727,8 +803,8 @@ class MainWindow(wx.Frame, viewmgr.PerspectiveManager):
 
     #---- Format Menu Functions ----#
     def OnFont(self, evt):
-        """Open Font Settings Dialog for changing fonts on a per document
-        basis.
+        """Open Font Settings Dialog for changing the font of the documents
+        open in this window.
         @status: This currently does not allow for font settings to stick
                  from one session to the next.
         @param evt: Event fired that called this handler
@@ -745,9 +821,10 @@ class MainWindow(wx.Frame, viewmgr.PerspectiveManager):
             dlg.Destroy()
             if result == wx.ID_OK:
                 font = data.GetChosenFont()
-                ctrl.SetGlobalFont(self.nb.control.FONT_PRIMARY, \
-                                   font.GetFaceName(), font.GetPointSize())
-                ctrl.UpdateAllStyles()
+                for stc in self.nb.GetTextControls():
+                    stc.SetGlobalFont(stc.FONT_PRIMARY, font.GetFaceName(),
+                                      font.GetPointSize())
+                self.nb.UpdateTextStyles()
         else:
             evt.Skip()
 
@@ -790,7 +867,8 @@ class MainWindow(wx.Frame, viewmgr.PerspectiveManager):
             evt.Skip()
 
     def OnGenerate(self, evt):
-        """Generates a given document type
+        """Generates a given document type and writes it to a file, the
+        file is opened in the editor afterwards if the profile says to.
         @requires: PluginMgr must be initialized and have active
                    plugins that implement the Generator Interface
         @param evt: Event fired that called this handler
@@ -798,15 +876,64 @@ class MainWindow(wx.Frame, viewmgr.PerspectiveManager):
 
         """
         e_id = evt.GetId()
+        ctrl = self.nb.GetCurrentCtrl()
         gen = generator.Generator(wx.GetApp().GetPluginManager())
-        doc = gen.GenerateText(e_id, self.nb.GetCurrentCtrl())
-        if doc:
-            self.nb.NewPage()
-            ctrl = self.nb.GetCurrentCtrl()
-            ctrl.SetText(doc[1]) 
-            ctrl.FindLexer(doc[0])
-        else:
+        doc = gen.GenerateStream(e_id, ctrl)
+        if not doc:
             evt.Skip()
+            return
+
+        # The document is written straight to disk instead of being held
+        # in memory so ask where to put it first.
+        fname = os.path.splitext(util.GetFileName(ctrl.GetFileName()))[0]
+        fname = u"%s.%s" % (fname or _("Untitled"), doc[0])
+        dlg = wx.FileDialog(self, _("Choose a Save Location"),
+                            util.GetPathName(ctrl.GetFileName()), fname,
+                            u"*.%s|*.%s" % (doc[0], doc[0]),
+                            wx.SAVE | wx.OVERWRITE_PROMPT)
+        if dlg.ShowModal() != wx.ID_OK:
+            dlg.Destroy()
+            return
+        path = dlg.GetPath()
+        dlg.Destroy()
+
+        pdlg = wx.ProgressDialog(_("Generator"), _("Generating %s") % fname,
+                                 100, self, wx.PD_APP_MODAL | \
+                                 wx.PD_CAN_ABORT | wx.PD_AUTO_HIDE)
+        def UpdateProgress(done):
+            """Updates the progress dialog, returns False if cancelled"""
+            return pdlg.Update(int(done * 100))[0]
+
+        start = time.time()
+        error = None
+        try:
+            try:
+                result = generator.WriteChunks(doc[1], path,
+                                               ctrl.GetTextLength(),
+                                               UpdateProgress)
+            except (IOError, OSError), msg:
+                error = msg
+        finally:
+            # Errors from the generator plugins must not leave the app
+            # modal progress dialog up.
+            pdlg.Destroy()
+
+        if error is not None:
+            self.LOG("[main][err] Generator failed: %s" % str(error))
+            dlg = wx.MessageDialog(self, _("Failed to save file: %s\n\n"
+                                           "Error:\n%s") % (path, str(error)),
+                                   _("Save Error"), wx.OK | wx.ICON_ERROR)
+            dlg.ShowModal()
+            dlg.Destroy()
+            return
+
+        if not result:
+            self.PushStatusText(_("Generation cancelled"), SB_INFO)
+            return
+        self.LOG("[main][info] Generation time %f" % (time.time() - start))
+        self.PushStatusText(_("Generated %s") % path, SB_INFO)
+        if _PGET('GEN_OPEN', 'bool', True):
+            self.nb.OpenPage(util.GetPathName(path), util.GetFileName(path))
 
     #---- Help Menu Functions ----#
     def OnAbout(self, evt):
@@ -881,7 +1008,7 @@ class MainWindow(wx.Frame, viewmgr.PerspectiveManager):
                          ID_TRIM_WS, ID_SHOW_EDGE, ID_MACRO_START, 
                          ID_MACRO_STOP, ID_MACRO_PLAY, ID_TO_LOWER, 
                          ID_TO_UPPER, ID_SELECTALL, ID_UNDO, ID_REDO, ID_CUT, 
-                         ID_COPY, ID_PASTE])
+                         ID_COPY, ID_PASTE, ID_LARGE_FILE])
         if evt.GetId() in menu_ids:
             self.nb.GetCurrentCtrl().ControlDispatch(evt)
             self.UpdateToolBar()
@@ -995,6 +1122,7 @@ class MainWindow(wx.Frame, viewmgr.PerspectiveManager):
             menu.Check(ID_SYNTAX, ctrl.IsHighlightingOn())
             menu.Check(ID_FOLDING, ctrl.IsFoldingOn())
             menu.Check(ID_BRACKETHL, ctrl.IsBracketHlOn())
+            menu.Check(ID_LARGE_FILE, ctrl.IsLargeFileMode())
         elif menu == self._menus['view']:
             zoom = ctrl.GetZoom()
             self.LOG("[menu_evt] Updating View Menu: zoom = %d" % zoom)
@@ -237,6 +237,9 @@ class EdMenuBar(wx.MenuBar):
                         "\tCtrl+Shift+N", _("Start a new file in a new window"))
         filemenu.AppendSeparator()
         filemenu.Append(ed_glob.ID_OPEN, _("Open") + "\tCtrl+O", _("Open"))
+        filemenu.Append(ed_glob.ID_QUICK_OPEN,
+                        _("Quick Open") + u"\tCtrl+Shift+O",
+                        _("Find a file to open by typing part of its name"))
         ## Setup File History in the File Menu
         filemenu.AppendMenu(ed_glob.ID_FHIST, _("Open Recent"), 
                             filehist, _("Recently Opened Files"))
@@ -293,6 +296,12 @@ class EdMenuBar(wx.MenuBar):
                         _("Copy Selected Text to Clipboard"))
         editmenu.Append(ed_glob.ID_PASTE, _("Paste") + "\tCtrl+V", 
                         _("Paste Text from Clipboard to File"))
+        editmenu.Append(ed_glob.ID_COPY_HTML, _("Copy as HTML"),
+                        _("Copy the selected or visible text to the "
+                          "clipboard as HTML"))
+        editmenu.Append(ed_glob.ID_COPY_RTF, _("Copy as RTF"),
+                        _("Copy the selected or visible text to the "
+                          "clipboard as RTF"))
         editmenu.AppendSeparator()
         editmenu.Append(ed_glob.ID_SELECTALL, _("Select All") + "\tCtrl+A", 
                         _("Select All Text in Document"))
@@ -364,6 +373,9 @@ class EdMenuBar(wx.MenuBar):
                                   _("Show Whitespace Markers"), wx.ITEM_CHECK)
         viewmenu.AppendSubMenu(self._vieweditmenu, _("Editor"), \
                                _("Toggle Editor View Options"))
+        viewmenu.Append(ed_glob.ID_REFLOW_VIEW, _("Reflowed View"),
+                        _("Open a read only copy of the document with "
+                          "long lines broken up"))
         viewmenu.AppendSeparator()
         viewmenu.Append(ed_glob.ID_GOTO_LINE, _("Goto Line") + u"\tCtrl+G",
                             _("Goto Line Number"))
@@ -444,6 +456,9 @@ class EdMenuBar(wx.MenuBar):
                             _("Toggle Code Foldering"), wx.ITEM_CHECK)
         settingsmenu.Append(ed_glob.ID_SYNTAX, _("Syntax Highlighting"), 
                             _("Color Highlight Code Syntax"), wx.ITEM_CHECK)
+        settingsmenu.Append(ed_glob.ID_LARGE_FILE, _("Large File Mode"),
+                            _("Disable expensive features for large files"),
+                            wx.ITEM_CHECK)
         # Lexer Menu Appended later by main frame
         self.Append(settingsmenu, _("Settings"))
         return settingsmenu
@@ -72,6 +72,8 @@ class EdPages(FNB.FlatNotebook):
         self.FindService = ed_search.TextFinder(self, self.GetCurrentCtrl)
         self.DocMgr = doctools.DocPositionMgr(ed_glob.CONFIG['CACHE_DIR'] + \
                                               util.GetPathChar() + u'positions')
+        self.LexCache = doctools.LexerCacheMgr(ed_glob.CONFIG['CACHE_DIR'] + \
+                                               util.GetPathChar() + u'lexcache')
         self.pg_num = -1              # Track new pages (aka untitled docs)
         self.control = None
         self.frame = self.GetTopLevelParent() # MainWindow
@@ -187,6 +189,34 @@ class EdPages(FNB.FlatNotebook):
         self.AddPage(self.control, u"Untitled - %d" % self.pg_num)
         self.SetPageImage(self.GetSelection(), str(self.control.GetLangId()))
 
+    def ColouriseFromCache(self, control, txt):
+        """Colourises the document in the given control using the style
+        data cached from the last time the same document was opened, or
+        colourises it normally and updates the cache if there is none.
+        @param control: EditraStc that has its lexer configured
+        @param txt: text of the document
+
+        """
+        if not Profile_Get('LEXCACHE', 'bool', False) or \
+           len(txt) < doctools.LEXCACHE_MIN or \
+           control.GetLexer() in (0, wx.stc.STC_LEX_NULL):
+            control.Colourise(0, -1)
+            return
+
+        sheet = control.GetStyleSheet() or u''
+        sheet = u"%s:%s:%s" % (ed_glob.VERSION, sheet,
+                               util.GetFileModTime(sheet))
+        key = self.LexCache.GetKey(control.GetFileName(), txt,
+                                   control.GetLexer(), sheet)
+        data = self.LexCache.Load(key)
+        if data is not None and control.SetStyleData(*data):
+            self.LOG("[ed_pages][info] Applied cached style data")
+            return
+
+        control.Colourise(0, -1)
+        styles, folds, states = control.GetStyleData()
+        self.LexCache.Save(key, styles, folds, states)
+
     def OpenPage(self, path, filename):
         """Open a File Inside of a New Page
         @param path: files base path
@@ -254,7 +284,8 @@ class EdPages(FNB.FlatNotebook):
         self.LOG("[nb_evt] Opened Page: ID = %d" % self.GetSelection())
 
         # Setup Document
-        self.control.FindLexer()
+        if self.control.FindLexer(colourise=False) == 0:
+            self.ColouriseFromCache(self.control, in_txt)
         self.control.CheckEOL()
         self.control.EmptyUndoBuffer()
 
@@ -279,6 +310,7 @@ class EdPages(FNB.FlatNotebook):
         self.LOG("[nb_info] Current Page = %d" % current_page)
 
         control = self.GetPage(current_page)
+        control.UpdateStaleStyles()
         control.SetFocus()
         self.control = control
         return current_page
@@ -423,6 +455,7 @@ class EdPages(FNB.FlatNotebook):
 
         """
         window = self.GetPage(pgid) # returns current stc
+        window.UpdateStaleStyles()
         window.SetFocus()
         self.control = window
         fname = self.control.GetFileName()
@@ -560,10 +593,26 @@ class EdPages(FNB.FlatNotebook):
                         to match profile settings
 
         """
+        self.UpdateTextStyles()
         for control in self.GetTextControls():
-            control.UpdateAllStyles()
             control.Configure()
 
+    def UpdateTextStyles(self):
+        """Updates the styles of the text controls after the style sheet
+        or fonts have changed. Only the visible control is restyled right
+        away, the others are marked as stale and restyled when they are
+        next shown.
+        @postcondition: current control is restyled and all others are
+                        marked as stale
+
+        """
+        current = self.GetCurrentCtrl()
+        for control in self.GetTextControls():
+            if control is current:
+                control.UpdateAllStyles()
+            else:
+                control.InvalidateStyles()
+
 #---- End Function Definitions ----#
 
 #-----------------------------------------------------------------------------#
@@ -0,0 +1,317 @@
+###############################################################################
+# Name: ed_quickopen.py                                                       #
+# Purpose: Dialog for finding and opening files by typing part of their name  #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2007 Cody Precord <staff@editra.org>                         #
+# Licence: wxWindows Licence                                                  #
+###############################################################################
+
+"""
+#--------------------------------------------------------------------------#
+# FILE: ed_quickopen.py                                                    #
+# AUTHOR: Cody Precord                                                     #
+# LANGUAGE: Python                                                         #
+# SUMMARY:                                                                 #
+#    The Quick Open dialog finds files under a set of folders chosen by    #
+# the user as a query is typed. The characters of the query only need to  #
+# be in the path of the file in the same order (i.e 'edmn' finds          #
+# ed_main.py). The files are found in a L{pathindex.PathIndex} that is    #
+# shared by all windows and is updated in the background each time the   #
+# dialog is opened. Files that were recently opened are ranked higher.    #
+#                                                                          #
+# METHODS:                                                                 #
+#   L{QuickOpenDlg} The Quick Open dialog                                  #
+#                                                                          #
+#--------------------------------------------------------------------------#
+"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__svnid__ = "$Id$"
+__revision__ = "$Revision$"
+
+#--------------------------------------------------------------------------#
+# Dependancies
+import os
+import wx
+import extern.listctrl as listmix
+import ed_glob
+from profiler import Profile_Get, Profile_Set
+import pathindex
+
+#--------------------------------------------------------------------------#
+# Globals
+ID_ADD_ROOT = wx.NewId()
+ID_REMOVE_ROOT = wx.NewId()
+ID_SEARCH_TIMER = wx.NewId()
+
+INDEX_FILE = u'quickopen'
+INDEX = None            # PathIndex shared by all windows
+
+MAX_RECENT = 50         # Number of recently opened files to remember
+MAX_RESULTS = 100       # Number of matches to show
+SEARCH_TIME = 0.012     # Seconds to search for between updates of the list
+SEARCH_INTERVAL = 15    # Milliseconds between searching and updating the list
+UPDATE_AGE = 60         # Seconds before the index is updated again
+
+_ = wx.GetTranslation
+#--------------------------------------------------------------------------#
+
+def AddRecent(path):
+    """Adds a file to the list of recently opened files
+    @param path: file path
+
+    """
+    recent = [fname for fname in Profile_Get('QOPEN_RECENT', default=list())
+              if fname != path]
+    recent.insert(0, path)
+    Profile_Set('QOPEN_RECENT', recent[:MAX_RECENT])
+
+def GetIndex():
+    """Gets the index shared by the quick open dialogs
+    @return: pathindex.PathIndex
+
+    """
+    global INDEX
+    if INDEX is None:
+        INDEX = pathindex.PathIndex(os.path.join(ed_glob.CONFIG['CACHE_DIR'],
+                                                 INDEX_FILE))
+    return INDEX
+
+#--------------------------------------------------------------------------#
+
+class QuickOpenDlg(wx.Dialog):
+    """Dialog that finds files as a query is typed"""
+    def __init__(self, parent, id_=wx.ID_ANY, title=_("Quick Open")):
+        """Create the dialog and start updating the index
+        @param parent: main window
+
+        """
+        wx.Dialog.__init__(self, parent, id_, title, size=(550, 400),
+                           style=wx.DEFAULT_DIALOG_STYLE | wx.RESIZE_BORDER)
+
+        # Attributes
+        self._index = GetIndex()
+        self._search = None
+        self._snapshot = None
+        self._path = None
+        self._recent = dict()   # path -> rank
+        self._query = wx.TextCtrl(self, wx.ID_ANY, style=wx.TE_PROCESS_ENTER)
+        self._list = ResultList(self)
+        self._status = wx.StaticText(self, label=u"")
+        self._timer = wx.Timer(self, ID_SEARCH_TIMER)
+
+        recent = Profile_Get('QOPEN_RECENT', default=list())
+        fhist = getattr(parent, 'filehistory', None)
+        if fhist is not None:
+            recent = recent + [fhist.GetHistoryFile(num)
+                               for num in xrange(fhist.GetCount())]
+        for path in recent:
+            if path not in self._recent:
+                self._recent[path] = len(self._recent)
+
+        # Layout
+        sizer = wx.BoxSizer(wx.VERTICAL)
+        sizer.Add(self._query, 0, wx.EXPAND | wx.ALL, 5)
+        sizer.Add(self._list, 1, wx.EXPAND | wx.LEFT | wx.RIGHT, 5)
+        bsizer = wx.BoxSizer(wx.HORIZONTAL)
+        bsizer.Add(self._status, 1, wx.ALIGN_CENTER_VERTICAL)
+        bsizer.Add(wx.Button(self, ID_ADD_ROOT, _("Add Folder")), 0, wx.LEFT, 5)
+        bsizer.Add(wx.Button(self, ID_REMOVE_ROOT, _("Remove Folder")),
+                   0, wx.LEFT, 5)
+        sizer.Add(bsizer, 0, wx.EXPAND | wx.ALL, 5)
+        self.SetSizer(sizer)
+        self.SetInitialSize()
+
+        # Event Handlers
+        self.Bind(wx.EVT_TEXT, self.OnQuery, self._query)
+        self.Bind(wx.EVT_TEXT_ENTER, self.OnOpen, self._query)
+        self.Bind(wx.EVT_LIST_ITEM_ACTIVATED, self.OnOpen, self._list)
+        self.Bind(wx.EVT_BUTTON, self.OnButton)
+        self.Bind(wx.EVT_TIMER, self.OnTimer, id=ID_SEARCH_TIMER)
+        self.Bind(wx.EVT_WINDOW_DESTROY, self.OnDestroy, id=self.GetId())
+        self._query.Bind(wx.EVT_KEY_DOWN, self.OnKeyDown)
+
+        self._index.SetRoots(Profile_Get('QOPEN_ROOTS', default=list()))
+        self._index.Update(UPDATE_AGE)
+        self.StartSearch()
+        self._query.SetFocus()
+
+    def GetPath(self):
+        """Gets the path of the file that was chosen
+        @return: path or None
+
+        """
+        return self._path
+
+    def OnButton(self, evt):
+        """Adds or removes a folder to search"""
+        e_id = evt.GetId()
+        roots = self._index.GetRoots()
+        if e_id == ID_ADD_ROOT:
+            dlg = wx.DirDialog(self, _("Choose a folder to search"))
+            if dlg.ShowModal() == wx.ID_OK:
+                path = dlg.GetPath()
+                if path not in roots:
+                    roots.append(path)
+            dlg.Destroy()
+        elif e_id == ID_REMOVE_ROOT:
+            if not len(roots):
+                return
+            dlg = wx.SingleChoiceDialog(self, _("Folder to stop searching"),
+                                        _("Remove Folder"), roots)
+            if dlg.ShowModal() == wx.ID_OK:
+                roots.remove(dlg.GetStringSelection())
+            dlg.Destroy()
+        else:
+            evt.Skip()
+            return
+
+        Profile_Set('QOPEN_ROOTS', roots)
+        self._index.SetRoots(roots)
+        self.StartSearch()
+        self._query.SetFocus()
+
+    def OnDestroy(self, evt):
+        """Stops the search timer when the dialog is destroyed"""
+        self._timer.Stop()
+        evt.Skip()
+
+    def OnKeyDown(self, evt):
+        """Moves the selection in the list while typing in the query"""
+        key = evt.GetKeyCode()
+        count = self._list.GetItemCount()
+        sel = self._list.GetFirstSelected()
+        page = max(self._list.GetCountPerPage(), 1)
+        moves = { wx.WXK_UP : -1, wx.WXK_DOWN : 1,
+                  wx.WXK_PAGEUP : -page, wx.WXK_PAGEDOWN : page }
+        if key == wx.WXK_ESCAPE:
+            self.EndModal(wx.ID_CANCEL)
+        elif key in moves and count:
+            self._list.SelectIndex(max(min(sel + moves[key], count - 1), 0))
+        else:
+            evt.Skip()
+
+    def OnOpen(self, evt):
+        """Closes the dialog with the selected file as the result"""
+        path = self._list.GetSelectedPath()
+        if path is not None:
+            self._path = path
+            AddRecent(path)
+            self.EndModal(wx.ID_OK)
+
+    def OnQuery(self, evt):
+        """Starts a new search when the query changes"""
+        self.StartSearch()
+
+    def OnTimer(self, evt):
+        """Continues the search and restarts it when the index changes"""
+        if self._index.GetSnapshot() is not self._snapshot:
+            self.StartSearch()
+        elif self._search is not None and not self._search.IsDone():
+            self._search.Step(SEARCH_TIME)
+            self.UpdateResults()
+        elif not self._index.IsUpdating():
+            self._timer.Stop()
+            self.UpdateStatus()
+
+    def StartSearch(self):
+        """Searches the index for the current query, the list is updated
+        with the matches found in the first part of the search right away
+        and the rest of the search is done from a timer.
+
+        """
+        snapshot = self._index.GetSnapshot()
+        last = self._search
+        if last is not None and last.snapshot is not snapshot:
+            last = None
+        self._snapshot = snapshot
+        self._search = pathindex.Search(snapshot, self._query.GetValue(),
+                                        self._recent, last)
+        self._search.Step(SEARCH_TIME)
+        self.UpdateResults()
+        if not self._timer.IsRunning():
+            self._timer.Start(SEARCH_INTERVAL)
+
+    def UpdateResults(self):
+        """Shows the best matches found so far in the list"""
+        search = self._search
+        self._list.SetPaths([search.GetPath(result)
+                             for result in search.GetResults(MAX_RESULTS)])
+        self.UpdateStatus()
+
+    def UpdateStatus(self):
+        """Updates the status text below the list"""
+        roots = self._index.GetRoots()
+        if not len(roots):
+            msg = _("Use Add Folder to choose the folders to search")
+        else:
+            msg = _("%(files)d files in %(folders)d folders") % \
+                  dict(files=len(self._snapshot), folders=len(roots))
+            if self._index.IsUpdating():
+                msg += u" " + _("(indexing)")
+        self._status.SetLabel(msg)
+
+#--------------------------------------------------------------------------#
+
+class ResultList(wx.ListCtrl, listmix.ListCtrlAutoWidthMixin):
+    """Virtual list of the files found by the L{QuickOpenDlg}"""
+    FILE_COL = 0
+    DIR_COL = 1
+
+    def __init__(self, parent):
+        """Create the list
+        @param parent: parent window
+
+        """
+        wx.ListCtrl.__init__(self, parent, wx.ID_ANY,
+                             style=wx.LC_REPORT | wx.LC_VIRTUAL | \
+                                   wx.LC_SINGLE_SEL)
+        self.InsertColumn(self.FILE_COL, _("File"), width=180)
+        self.InsertColumn(self.DIR_COL, _("Folder"))
+        listmix.ListCtrlAutoWidthMixin.__init__(self)
+
+        # Attributes
+        self._paths = list()
+
+    def GetSelectedPath(self):
+        """Gets the path of the selected file
+        @return: path or None
+
+        """
+        sel = self.GetFirstSelected()
+        if sel < 0 or sel >= len(self._paths):
+            return None
+        return self._paths[sel]
+
+    def OnGetItemText(self, item, col):
+        """Gets the text of a cell of the list
+        @param item: row
+        @param col: column
+
+        """
+        if item >= len(self._paths):
+            return u''
+        if col == self.FILE_COL:
+            return os.path.basename(self._paths[item])
+        return os.path.dirname(self._paths[item])
+
+    def SelectIndex(self, index):
+        """Selects a row and scrolls it into view
+        @param index: row
+
+        """
+        self.Select(index)
+        self.Focus(index)
+
+    def SetPaths(self, paths):
+        """Sets the files shown in the list, the first one is selected
+        @param paths: list of file paths
+
+        """
+        if paths == self._paths:
+            return
+        self._paths = paths
+        self.SetItemCount(len(paths))
+        if len(paths):
+            self.SelectIndex(0)
+            self.RefreshItems(0, len(paths) - 1)
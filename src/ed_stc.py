@@ -59,6 +59,13 @@ NONSPACE = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ" + \
            "0123456789_./\?[]{}<>!@#$%^&*():=-+\"';,"
 SPACECHARS = " \t\r\n"
 
+# Style runs
+STYLE_CHUNK = 1024 * 1024       # Bytes of styled text to fetch at a time
+RE_STYLE_RUN = re.compile('(.)\\1*', re.DOTALL)
+
+# Large file mode
+LONGLINE_SCAN = 100000          # Max lines checked for overly long lines
+
 #-------------------------------------------------------------------------#
 class EditraStc(wx.stc.StyledTextCtrl, ed_style.StyleMgr):
     """Defines a styled text control for editing text
@@ -112,7 +119,11 @@ class EditraStc(wx.stc.StyledTextCtrl, ed_style.StyleMgr):
                             autoindent=_PGET('AUTO_INDENT'),
                             brackethl=_PGET("BRACKETHL"),
                             folding=_PGET('CODE_FOLD'),
-                            highlight=_PGET("SYNTAX"))
+                            highlight=_PGET("SYNTAX"),
+                            largefile=False,    # Lightweight mode is active
+                            longlines=False,    # Has overly long lines
+                            lfoverride=False,   # User opted back in
+                            stylestale=False)   # Styles need updating
 
         # Code Related Objects
         self._code = dict(compsvc=autocomp.AutoCompService(self),
@@ -307,7 +318,10 @@ class EditraStc(wx.stc.StyledTextCtrl, ed_style.StyleMgr):
         self.SetIndentationGuides(_PGET('GUIDES'))
         self.SetEOLFromString(_PGET('EOL'))
         self.SetViewEOL(_PGET('SHOW_EOL'))
-        self.SyntaxOnOff(_PGET('SYNTAX'))  # <- do before autocomp
+        # Reconfiguring the lexer restyles the whole document so only do it
+        # when highlighting has actually been turned on or off.
+        if _PGET('SYNTAX') != self._config['highlight']:
+            self.SyntaxOnOff(_PGET('SYNTAX'))  # <- do before autocomp
         self.SetAutoComplete(_PGET('AUTO_COMP'))
         self.FoldingOnOff(_PGET('CODE_FOLD'))
         self.ToggleAutoIndent(_PGET('AUTO_INDENT'))
@@ -316,6 +330,130 @@ class EditraStc(wx.stc.StyledTextCtrl, ed_style.StyleMgr):
         self.SetViEmulationMode(_PGET('VI_EMU'))
         self.SetViewEdgeGuide(_PGET('SHOW_EDGE'))
 
+        # Profile settings must not re-enable the features that were
+        # turned off for a large file.
+        if self._config['largefile']:
+            self._DisableHeavyFeatures()
+
+    def CheckLargeFile(self):
+        """Checks the buffer against the large file thresholds set in
+        the profile and switches it into the lightweight large file mode
+        if any of them are exceeded. A threshold of zero disables that
+        check. Buffers that have been opted back in to full functionality
+        are left alone.
+        @return: whether the buffer is in large file mode or not
+
+        """
+        if self._config['largefile'] or self._config['lfoverride']:
+            return self._config['largefile']
+
+        large = False
+        size_lmt = _PGET('LARGEFILE_SIZE', 'int', 0)
+        line_lmt = _PGET('LARGEFILE_LINES', 'int', 0)
+        len_lmt = _PGET('LARGEFILE_LLEN', 'int', 0)
+        nlines = self.GetLineCount()
+        if size_lmt and self.GetLength() > size_lmt:
+            large = True
+        elif line_lmt and nlines > line_lmt:
+            large = True
+        elif len_lmt and self.HasLongLines(len_lmt, LONGLINE_SCAN):
+            # Only the first LONGLINE_SCAN lines are checked so the cost of
+            # the scan is bounded even when the other limits are disabled.
+            self._config['longlines'] = large = True
+
+        if large:
+            self.SetLargeFileMode(True)
+        return large
+
+    def HasLongLines(self, limit=None, max_lines=0):
+        """Checks if the document has any lines that are longer than the
+        given limit, such as in minified or single line data files.
+        @keyword limit: line length to check for, defaults to the
+                        LARGEFILE_LLEN profile setting
+        @keyword max_lines: only check this many lines from the start of
+                            the document (0 to check them all)
+        @return: bool
+
+        """
+        if limit is None:
+            limit = _PGET('LARGEFILE_LLEN', 'int', 0)
+        if not limit or self.GetLength() <= limit:
+            return False
+
+        nlines = self.GetLineCount()
+        if max_lines:
+            nlines = min(nlines, max_lines)
+        LineLength = self.LineLength
+        for line in xrange(nlines):
+            if LineLength(line) > limit:
+                return True
+        return False
+
+    def IsLargeFileMode(self):
+        """Returns whether the buffer is in large file mode or not
+        @return: whether large file mode is active
+
+        """
+        return self._config['largefile']
+
+    def SetLargeFileMode(self, enable=True):
+        """Switches the buffer into or out of the lightweight large file
+        mode. While active the lexer, code folding, bracket highlighting,
+        autocompletion, indentation guides and word wrap are disabled.
+        Leaving the mode restores the profile settings and stops the
+        buffer from being automatically switched back into it.
+        @keyword enable: turn large file mode on or off
+
+        """
+        if enable == self._config['largefile']:
+            return
+
+        self._config['largefile'] = enable
+        if enable:
+            self.LOG("[stc_evt] Large File Mode Turned On")
+            self._config['lfoverride'] = False
+            self._DisableHeavyFeatures()
+            if self._config['longlines']:
+                msg = _("Long lines: highlighting and folding are disabled. "
+                        "Use View > Reflowed View for a readable copy.")
+            else:
+                msg = _("Large file: highlighting and folding are disabled. "
+                        "Use Settings > Large File Mode to turn them back "
+                        "on.")
+        else:
+            self.LOG("[stc_evt] Large File Mode Turned Off")
+            self._config['lfoverride'] = True
+            self.SetLayoutCache(wx.stc.STC_CACHE_CARET)
+            self.Configure()
+            if self._config['highlight']:
+                self.FindLexer()
+            if self._config['autocomp']:
+                self.ConfigureAutoComp()
+            msg = _("Large file mode turned off")
+
+        evt = ed_event.StatusEvent(ed_event.edEVT_STATUS, self.GetId(),
+                                   msg, ed_glob.SB_INFO)
+        wx.PostEvent(self.GetTopLevelParent(), evt)
+
+    def _DisableHeavyFeatures(self):
+        """Turns off the features whose cost grows with the size of
+        the document.
+        @postcondition: buffer is set to the lightweight large file settings
+
+        """
+        self.SetWrapMode(False)
+        self.SetIndentationGuides(False)
+        self.FoldingOnOff(False)
+        self.ToggleBracketHL(False)
+        self._config['autocomp'] = False
+        if self._config['longlines']:
+            # Laying out very long lines is expensive in both time and
+            # memory so do not keep any line layouts cached.
+            self.SetLayoutCache(wx.stc.STC_CACHE_NONE)
+        if self.GetLexer() != wx.stc.STC_LEX_NULL:
+            self.SetLexer(wx.stc.STC_LEX_NULL)
+            self.ClearDocumentStyle()
+
     def Comment(self, uncomment=False):
         """(Un)Comments a line or a selected block of text
         in a document.
@@ -529,6 +667,166 @@ class EditraStc(wx.stc.StyledTextCtrl, ed_style.StyleMgr):
         """
         return self._finfo['filename']
 
+    def GetReflowedText(self, width=None):
+        """Gets the text of the document with all lines longer than
+        width broken up. Lines are broken after the last delimiter
+        character that fits in the width, or at the width if there is none.
+        @keyword width: maximum line length, defaults to the edge column
+        @return: string
+
+        """
+        if width is None:
+            width = max(_PGET('EDGE', 'int', 80), 1)
+
+        lines = list()
+        for line in self.GetText().splitlines():
+            start = 0
+            llen = len(line)
+            while llen - start > width:
+                end = start + width
+                brk = max([line.rfind(char, start, end)
+                           for char in u";,{}()[]> "])
+                if brk < start:
+                    brk = end - 1
+                lines.append(line[start:brk + 1])
+                start = brk + 1
+            lines.append(line[start:])
+        return self.GetEOLChar().join(lines)
+
+    def GetStyleData(self):
+        """Gets the style bytes, fold levels and line states that the lexer
+        has produced for the document.
+        @return: tuple of (style byte string, list of fold levels,
+                 list of line states)
+
+        """
+        styles = self.GetStyledText(0, self.GetLength())[1::2]
+        lines = xrange(self.GetLineCount())
+        GetFoldLevel = self.GetFoldLevel
+        folds = [GetFoldLevel(line) for line in lines]
+        GetLineState = self.GetLineState
+        states = [GetLineState(line) for line in lines]
+        return styles, folds, states
+
+    def GetStyleRuns(self, start=0, end=-1):
+        """Gets the runs of text that have the same style. The styles are
+        fetched from the control in large blocks so this is much faster than
+        checking the style of each position.
+        @keyword start: position to start at
+        @keyword end: position to stop at (-1 for the end of the document)
+        @return: generator of (style_id, start, end) tuples
+
+        """
+        return self._IterStyleRuns(start, end, False)
+
+    def GetStyleIds(self, start=0, end=-1):
+        """Gets the style numbers that are used in a range of the document
+        @keyword start: position to start at
+        @keyword end: position to stop at (-1 for the end of the document)
+        @return: sorted list of style numbers
+
+        """
+        length = self.GetLength()
+        if end < 0 or end > length:
+            end = length
+        mask = (1 << self.GetStyleBits()) - 1
+        used = set()
+        for pos in xrange(max(0, start), end, STYLE_CHUNK):
+            data = self.GetStyledText(pos, min(pos + STYLE_CHUNK, end))
+            used.update(data[1::2])
+        used = list(set([ord(style) & mask for style in used]))
+        used.sort()
+        return used
+
+    def GetVisibleRange(self):
+        """Gets the range of the document that is shown on screen, from the
+        start of the first visible line to the end of the last one.
+        @return: (start position, end position)
+
+        """
+        first = self.GetFirstVisibleLine()
+        last = first + max(self.LinesOnScreen() - 1, 0)
+        last = min(self.DocLineFromVisible(last), self.GetLineCount() - 1)
+        return (self.PositionFromLine(self.DocLineFromVisible(first)),
+                self.GetLineEndPosition(last))
+
+    def GetStyledTextRuns(self, start=0, end=-1):
+        """Gets the runs of text that have the same style along with the
+        text of each run. This is intended for generating styled documents
+        from the contents of the control (see generator.py).
+        @keyword start: position to start at
+        @keyword end: position to stop at (-1 for the end of the document)
+        @return: generator of (style_id, text) tuples
+
+        """
+        return self._IterStyleRuns(start, end, True)
+
+    def _IterStyleRuns(self, start, end, with_text):
+        """Generates the style runs for L{GetStyleRuns} and
+        L{GetStyledTextRuns}.
+        @param start: position to start at
+        @param end: position to stop at (-1 for the end of the document)
+        @param with_text: yield the text of the runs instead of the end
+                          positions.
+
+        """
+        length = self.GetLength()
+        if end < 0 or end > length:
+            end = length
+        start = max(0, min(start, end))
+
+        # Only keep the style bits, the rest are used for indicators
+        table = None
+        mask = (1 << self.GetStyleBits()) - 1
+        if mask != 0xff:
+            table = ''.join([chr(num & mask) for num in xrange(256)])
+
+        run_id = None
+        run_start = start
+        text = list()
+        pos = start
+        while pos < end:
+            stop = min(pos + STYLE_CHUNK, end)
+            data = self.GetStyledText(pos, stop)
+            styles = data[1::2]
+            if table is not None:
+                styles = styles.translate(table)
+            if with_text:
+                chars = data[0::2]
+
+            # Runs that continue into the next block are joined to it
+            for match in RE_STYLE_RUN.finditer(styles):
+                style_id = ord(match.group(1))
+                if style_id != run_id:
+                    if run_id is not None:
+                        if with_text:
+                            yield run_id, self._DecodeRun(text)
+                            text = list()
+                        else:
+                            yield run_id, run_start, pos + match.start()
+                    run_id = style_id
+                    run_start = pos + match.start()
+                if with_text:
+                    text.append(chars[match.start():match.end()])
+            pos = stop
+
+        if run_id is not None:
+            if with_text:
+                yield run_id, self._DecodeRun(text)
+            else:
+                yield run_id, run_start, end
+
+    def _DecodeRun(self, text):
+        """Decodes the bytes of a style run
+        @param text: list of byte strings
+        @return: unicode in unicode builds
+
+        """
+        text = ''.join(text)
+        if wx.USE_UNICODE:
+            text = text.decode('utf-8', 'replace')
+        return text
+
     def GetStyleSheet(self, sheet_name=None):
         """Finds the current style sheet and returns its path. The
         Lookup is done by first looking in the users config directory
@@ -717,12 +1015,25 @@ class EditraStc(wx.stc.StyledTextCtrl, ed_style.StyleMgr):
             self.CallTipShow(max(tip_pos, fail_safe), tip)
 
     def ShowKeywordHelp(self):
-        """Displays the keyword helper
+        """Displays the keyword helper, when autocompletion is on the words
+        used in the open documents of the same language are shown as well.
         @postcondition: shows keyword helper list control
 
         """
         if self.AutoCompActive():
             self.AutoCompCancel()
+        elif self._config['autocomp']:
+            # Complete the word from the words used in the open documents
+            pos = self.GetCurrentPos()
+            pos2 = self.WordStartPosition(pos, True)
+            lst = self._code['compsvc'].GetWordCompList(\
+                                self.GetTextRange(pos2, pos),
+                                self._code['keywords'])
+            if len(lst):
+                best = lst[0]
+                lst.sort(lambda x, y: cmp(x.upper(), y.upper()))
+                self.AutoCompShow(pos - pos2, u' '.join(lst))
+                self.AutoCompSelect(best)
         elif len(self._code['keywords']) > 1:
             pos = self.GetCurrentPos()
             pos2 = self.WordStartPosition(pos, True)
@@ -736,6 +1047,9 @@ class EditraStc(wx.stc.StyledTextCtrl, ed_style.StyleMgr):
         @type evt: wx.stc.StyledTextEvent
 
         """
+        if self._config['autocomp']:
+            self._code['compsvc'].NotifyModified(evt.GetPosition(),
+                                                 evt.GetLinesAdded())
         wx.PostEvent(self.GetParent(), evt)
 
     def OnUpdateUI(self, evt):
@@ -749,6 +1063,14 @@ class EditraStc(wx.stc.StyledTextCtrl, ed_style.StyleMgr):
         char_before = None
         caret_pos = self.GetCurrentPos()
 
+        # Matching braces on very long lines makes the caret unusable
+        if self._config['longlines'] and \
+           self.LineLength(self.GetCurrentLine()) > \
+           _PGET('LARGEFILE_LLEN', 'int', 0):
+            self.BraceHighlight(-1, -1)
+            evt.Skip()
+            return
+
         if caret_pos > 0:
             char_before = self.GetCharAt(caret_pos - 1)
 
@@ -867,12 +1189,18 @@ class EditraStc(wx.stc.StyledTextCtrl, ed_style.StyleMgr):
                 line = line + 1
         return line
 
-    def FindLexer(self, set_ext=u''):
+    def FindLexer(self, set_ext=u'', colourise=True):
         """Sets Text Controls Lexer Based on File Extension
         @param set_ext: explicit extension to use in search
+        @keyword colourise: colourise the document after setting the lexer
         @postcondition: lexer is configured for file
+        @return: 0 if the lexer was configured, 1 if in large file mode
+                 and 2 if highlighting is turned off
 
         """
+        if self.CheckLargeFile():
+            return 1
+
         if not self._config['highlight']:
             return 2
 
@@ -902,7 +1230,9 @@ class EditraStc(wx.stc.StyledTextCtrl, ed_style.StyleMgr):
                            "bash" : "sh", "csh" : "csh", "perl" : "pl",
                            "ksh" : "ksh", "php" : "php" }
                 self.ConfigureLexer(ex_map.get(interp, interp))
-        self.Colourise(0, -1)
+
+        if colourise:
+            self.Colourise(0, -1)
 
         # Configure Autocompletion
         # NOTE: must be done after syntax configuration
@@ -981,6 +1311,8 @@ class EditraStc(wx.stc.StyledTextCtrl, ed_style.StyleMgr):
             self.FindLexer(f_ext)
         elif e_id == ed_glob.ID_AUTOCOMP:
             self.SetAutoComplete(not self.GetAutoComplete())
+        elif e_id == ed_glob.ID_LARGE_FILE:
+            self.SetLargeFileMode(not self.IsLargeFileMode())
         elif e_id == ed_glob.ID_UNCOMMENT:
             self.Comment(True)
         elif e_id == ed_glob.ID_LINE_BEFORE:
@@ -1011,7 +1343,15 @@ class EditraStc(wx.stc.StyledTextCtrl, ed_style.StyleMgr):
                 eol += tmp
         if eol != self.GetEOLChar():
             diff = True
-        for line in range(self.GetLineCount() - 1):
+
+        # Scanning every line of a large file is too slow so only the
+        # first line is used to decide the mode.
+        if self._config['largefile']:
+            nlines = 0
+        else:
+            nlines = self.GetLineCount() - 1
+
+        for line in xrange(nlines):
             end = self.GetLineEndPosition(line)
             tmp = chr(self.GetCharAt(end))
             if tmp == "\r":
@@ -1223,6 +1563,34 @@ class EditraStc(wx.stc.StyledTextCtrl, ed_style.StyleMgr):
         """Set the value of the files last modtime"""
         self._finfo['modtime'] = modtime
 
+    def SetStyleData(self, styles, folds, states):
+        """Applies style bytes, fold levels and line states previously
+        retrieved with L{GetStyleData} to the document instead of
+        colourising it. The line states must be restored as well as the
+        styles since stateful lexers read them when restyling from an
+        edited line.
+        @param styles: string of style bytes for the whole document
+        @param folds: list of fold levels for each line
+        @param states: list of lexer line states for each line
+        @return: whether the data was applied or not
+
+        """
+        nlines = self.GetLineCount()
+        if len(styles) != self.GetLength() or \
+           len(folds) != nlines or len(states) != nlines:
+            self.LOG("[stc][warn] Style data does not match document")
+            return False
+
+        self.StartStyling(0, 0xff)
+        self.SetStyleBytes(len(styles), styles)
+        SetFoldLevel = self.SetFoldLevel
+        for line, level in enumerate(folds):
+            SetFoldLevel(line, level)
+        SetLineState = self.SetLineState
+        for line, state in enumerate(states):
+            SetLineState(line, state)
+        return True
+
     def SetViEmulationMode(self, use_vi):
         """Activate/Deactivate Vi eumulation mode
         @param use_vi: Turn vi emulation on/off
@@ -1294,7 +1662,8 @@ class EditraStc(wx.stc.StyledTextCtrl, ed_style.StyleMgr):
         @postcondition: all trailing whitespace is removed from document
 
         """
-        txt = u''
+        txt = list()
+        tlen = 0
         cpos = self.GetCurrentPos()
         cline = self.GetCurrentLine()
         for line in xrange(self.GetLineCount()):
@@ -1308,13 +1677,15 @@ class EditraStc(wx.stc.StyledTextCtrl, ed_style.StyleMgr):
             if line == cline:
                 npos = cpos - (abs(len(self.GetTextRange(0, \
                                        self.GetLineEndPosition(cline-1))) - \
-                                   len(txt)) + 1)
+                                   tlen) + 1)
                 next = cpos - 1
                 while self.GetTextRange(next, cpos).isspace() and next > 0:
                     next = next - 1
                 cpos = npos - ((cpos - next) - 1)
-            txt = txt + tmp.rstrip() + eol
-        self.SetText(txt)
+            tmp = tmp.rstrip() + eol
+            txt.append(tmp)
+            tlen += len(tmp)
+        self.SetText(u''.join(txt))
         self.GotoPos(cpos)
 
     def ViCmdDispatch(self):
@@ -2015,27 +2386,13 @@ class EditraStc(wx.stc.StyledTextCtrl, ed_style.StyleMgr):
         @param syn_lst: [(STYLE_ID, "STYLE_TYPE"), (STYLE_ID2, "STYLE_TYPE2)]
 
         """
-        # Parses Syntax Specifications list, ignoring all bad values
+        # Bad values in the list are dropped when the table is compiled
         self.UpdateBaseStyles()
-        valid_settings = list()
-        for syn in syn_lst:
-            if len(syn) != 2:
-                self.LOG("[ed_stc][warn] Error setting syntax spec")
-                continue
-            else:
-                if not isinstance(syn[0], basestring) or \
-                   not hasattr(wx.stc, syn[0]):
-                    self.LOG("[ed_stc][warn] Unknown syntax region: %s" % \
-                             str(syn[0]))
-                    continue
-                elif not isinstance(syn[1], basestring):
-                    self.LOG("[ed_stc][warn] Poorly formated styletag: %s" % \
-                             str(syn[1]))
-                    continue
-                else:
-                    self.StyleSetSpec(getattr(wx.stc, syn[0]), \
-                                      self.GetStyleByName(syn[1]))
-                    valid_settings.append(syn)
+        scope = syntax.GetStyleScope(self._code['lang_id'])
+        table, valid_settings = self.GetStyleTable(scope, syn_lst)
+        StyleSetSpec = self.StyleSetSpec
+        for style_id, spec in table:
+            StyleSetSpec(style_id, spec)
         self._code['syntax_set'] = valid_settings
         return True
 
@@ -2066,13 +2423,26 @@ class EditraStc(wx.stc.StyledTextCtrl, ed_style.StyleMgr):
 
         """
         self.Freeze()
-        self.StyleClearAll()
-        self.UpdateBaseStyles()
         self.SetSyntax(self._code['syntax_set'])
-        self.DefineMarkers()
         self.Thaw()
         self.Refresh()
 
+    def InvalidateStyles(self):
+        """Marks the styles of the control as out of date so that they
+        are updated by L{UpdateStaleStyles} the next time the control is
+        shown instead of right away.
+        @postcondition: control is marked as having stale styles
+
+        """
+        self._config['stylestale'] = True
+
+    def IsStylesStale(self):
+        """Returns whether the styles of the control need to be updated
+        @return: bool
+
+        """
+        return self._config['stylestale']
+
     def StyleDefault(self):
         """Clears the editor styles to default
         @postcondition: style is reset to default
@@ -2086,9 +2456,12 @@ class EditraStc(wx.stc.StyledTextCtrl, ed_style.StyleMgr):
     def UpdateBaseStyles(self):
         """Updates the base styles of editor to the current settings
         @postcondtion: base style info is updated
+        @note: the document is not recolourised as changing the style
+               specifications does not change the style of any text
 
         """
-        self.StyleDefault()
+        self.StyleResetDefault()
+        self.StyleClearAll()
         self.SetMargins(0, 0)
         # Global default styles for all languages
         self.StyleSetSpec(0, self.GetStyleByName('default_style'))
@@ -2107,7 +2480,6 @@ class EditraStc(wx.stc.StyledTextCtrl, ed_style.StyleMgr):
         self.CallTipSetForeground(calltip.GetFore())
         self.SetCaretForeground(self.GetDefaultForeColour())
         self.DefineMarkers()
-        self.Colourise(0, -1)
 
     def UpdateAllStyles(self, spec_style=None):
         """Refreshes all the styles and attributes of the control
@@ -2116,10 +2488,55 @@ class EditraStc(wx.stc.StyledTextCtrl, ed_style.StyleMgr):
 
         """
         if spec_style != self.style_set:
-            self.LoadStyleSheet(self.GetStyleSheet(spec_style), force=True)
-        self.UpdateBaseStyles()
+            self.LoadStyleSheet(self.GetStyleSheet(spec_style))
+        # SetSyntax updates the base styles before applying the table
+        self.Freeze()
         self.SetSyntax(self._code['syntax_set'])
-        self.DefineMarkers()
+        self.Thaw()
+        self.Refresh()
+        self._config['stylestale'] = False
+
+    def UpdateStaleStyles(self):
+        """Updates the styles of the control if they were marked as
+        stale by L{InvalidateStyles} while it was hidden.
+        @return: whether the styles were updated or not
+
+        """
+        if not self._config['stylestale']:
+            return False
+        self.UpdateAllStyles()
+        return True
+
+    def UpdateStyleTags(self, tags):
+        """Applies changes made to the given style tags by only updating
+        the style numbers that use them instead of reapplying the whole
+        style set. Changes to the tags that the other styles are based on
+        still cause all the styles to be refreshed.
+        @param tags: list of style tag names that were changed
+        @postcondition: styles using the tags are updated
+
+        """
+        base = ('default_style', 'line_num', 'ctrl_char', 'brace_good',
+                'brace_bad', 'calltip')
+        for tag in tags:
+            if tag in base:
+                self.RefreshStyles()
+                return
+
+        scope = syntax.GetStyleScope(self._code['lang_id'])
+        changed = set(tags)
+        table = self.GetStyleTable(scope, self._code['syntax_set'])[0]
+        default = self.GetStyleByName('default_style')
+        for syn, (style_id, spec) in zip(self._code['syntax_set'], table):
+            if syn[1] in changed or u"%s.%s" % (scope, syn[1]) in changed:
+                # Reset the style to the default as StyleSetSpec only
+                # sets the attributes that are in the spec.
+                self.StyleSetBold(style_id, False)
+                self.StyleSetItalic(style_id, False)
+                self.StyleSetUnderline(style_id, False)
+                self.StyleSetEOLFilled(style_id, False)
+                self.StyleSetSpec(style_id, default)
+                self.StyleSetSpec(style_id, spec)
         self.Refresh()
 
     #---- End Style Definitions ----#
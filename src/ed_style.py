@@ -30,23 +30,76 @@ __revision__ = "$Revision$"
 # Dependancies
 import os
 import re
+import marshal
 import wx
+import wx.stc
+import ed_glob
 import util
 from profiler import Profile_Get, Profile_Set
 
+try:
+    from hashlib import md5
+except ImportError:
+    from md5 import new as md5
+
 # Globals
 STY_ATTRIBUTES     = u"face fore back size"
 STY_EX_ATTRIBUTES  = u"eol bold italic underline"
+
+# Value validation for the face and size attributes
+# TODO these regular expressions need work
+FMT_VALUE = re.compile("\%\([a-zA-Z0-9]*\)")
+NAME_VALUE = re.compile("[a-zA-Z0-9]*")
+
+# Style sheet tokens, comments are allowed anywhere whitespace is. Every
+# character can only be matched one way by the patterns so that text that
+# does not match (i.e an unclosed block) never makes the regex backtrack
+# through all the ways of splitting up its comments.
+ESS_CMT = r"/\*(?:[^*]|\*(?!/))*\*/"
+ESS_SPACE = r"\s*(?:" + ESS_CMT + r"\s*)*"
+ESS_BODY = r"[^{}/]*(?:(?:/(?!\*)|" + ESS_CMT + r")[^{}/]*)*"
+ESS_TOKENS = re.compile(ESS_SPACE + r"(?:"
+                        # Complete definition block
+                        r"(?P<block>(?P<tag>[^\s{}:;/@]*)" + ESS_SPACE + r"\{"
+                        r"(?P<body>" + ESS_BODY + r")\})|"
+                        # Definition block that is missing its closing brace
+                        r"(?P<open>(?P<otag>[^\s{}:;/@]*)" + ESS_SPACE + r"\{"
+                        r"(?P<obody>(?:[^{}/]|/(?!\*)|" + ESS_CMT + r")*?))"
+                        r"(?=[^\s{}:;/@]+" + ESS_SPACE + r"\{|\{|\Z)|"
+                        r"(?P<scope>@(?P<lang>[a-zA-Z0-9_]+)" + ESS_SPACE + \
+                        r"\{)|"
+                        r"(?P<close>\})|"
+                        r"(?P<comment>/\*)|"
+                        r"(?P<bad>[^\s{}]+)|"
+                        r"(?P<end>\Z))", re.S)
+ESS_COMMENT = re.compile(ESS_CMT)
+
+# Diagnostic levels
+ESS_ERROR = u"error"
+ESS_WARNING = u"warning"
+
+# Caches shared by all StyleItems
+SPEC_ORDER = (u'fore', u'back', u'face', u'size')
+SPEC_INDEX = dict([(attr, idx) for idx, attr in enumerate(SPEC_ORDER)])
+CACHE_LIMIT = 4096      # Max entries in each cache before it is reset
+ATTR_CACHE = dict()     # Style string -> parsed (attribute, value) pairs
+ITEM_CACHE = dict()     # Style string -> interned StyleItem
+RGB_CACHE = dict()      # Colour string -> (red, green, blue)
 #--------------------------------------------------------------------------#
 
 class StyleItem(object):
-    """A storage class for holding styling information
+    """A storage class for holding styling information. StyleItems are
+    immutable values, the Set functions return a new item with the change
+    made instead of modifying the item, so the same item can be shared by
+    any number of style sets and controls.
     @todo: The extra Attributes should be saved as a separate attribute in the
            StyleItem. This currenlty causes problems when customizing values in
            the StyleEditor Changing this is fairly easy in this class but it 
            will require changes to the StyleMgr and Editor as well.
 
     """
+    __slots__ = ('_vals', '_spec')
+
     def __init__(self, fore=wx.EmptyString, back=wx.EmptyString, 
                        face=wx.EmptyString, size=wx.EmptyString):
         """Initiliazes the Style Object.
@@ -66,14 +119,18 @@ class StyleItem(object):
             %(size)s      = Format string to be swapped at runtime
         """
         object.__init__(self)
-        if fore != wx.EmptyString:
-            self.fore = fore        # Foreground color hex code
-        if face != wx.EmptyString:
-            self.face = face        # Font face name
-        if back != wx.EmptyString:
-            self.back = back        # Background color hex code
-        if size != wx.EmptyString:
-            self.size = size        # Font point size
+        vals = list()
+        spec = list()
+        for attr, val in zip(SPEC_ORDER, (fore, back, face, size)):
+            if val is None or val == wx.EmptyString:
+                val = None
+            else:
+                spec.append(u"%s:%s" % (attr, val))
+            vals.append(val)
+
+        # Values in SPEC_ORDER (None if unset) and the spec string
+        object.__setattr__(self, '_vals', tuple(vals))
+        object.__setattr__(self, '_spec', u",".join(spec))
 
     def __eq__(self, si2):
         """Defines the == operator for the StyleItem Class
@@ -87,23 +144,61 @@ class StyleItem(object):
         else:
             return False
 
+    def __hash__(self):
+        """Hashes the item by its spec string so that equal items
+        hash the same.
+        @return: hash value
+
+        """
+        return hash(self._spec)
+
+    def __ne__(self, si2):
+        """Defines the != operator for the StyleItem Class
+        @param si2: style item to compare to
+        @return: whether the two items are not equal
+        @rtype: bool
+
+        """
+        return not self.__eq__(si2)
+
+    def __setattr__(self, name, value):
+        """StyleItems can not be changed once they are created
+        @raise AttributeError: always
+
+        """
+        raise AttributeError, "StyleItem objects are immutable"
+
+    __delattr__ = __setattr__
+
     def __str__(self):
-        """Converts StyleItem to a string
+        """Converts StyleItem to a string. The string is built when the
+        item is created.
         @return: string representation of the StyleItem
 
         """
-        style_str = wx.EmptyString
-        if hasattr(self, u'fore'):
-            style_str = u"fore:%s," % self.fore
-        if hasattr(self, u'back'):
-            style_str += u"back:%s," % self.back
-        if hasattr(self, u'face'):
-            style_str += u"face:%s," % self.face
-        if hasattr(self, u'size'):
-            style_str += u"size:%s," % str(self.size)
-        if len(style_str) and style_str[-1] == u',':
-            style_str = style_str[0:-1]
-        return style_str
+        return self._spec
+
+    def _Replace(self, attr, value):
+        """Gets the shared item that has the given attribute changed
+        @param attr: attribute name (fore, back, face, size)
+        @param value: new value for the attribute
+        @return: L{StyleItem}
+
+        """
+        vals = list(self._vals)
+        vals[SPEC_INDEX[attr]] = value
+        return _InternItem(StyleItem(*vals))
+
+    def _Value(self, attr):
+        """Gets the value of an attribute
+        @param attr: attribute name (fore, back, face, size)
+        @return: value or wx.EmptyString if it is not set
+
+        """
+        val = self._vals[SPEC_INDEX[attr]]
+        if val is None:
+            return wx.EmptyString
+        return val
 
     #---- Get Functions ----#
     def GetBack(self):
@@ -111,97 +206,112 @@ class StyleItem(object):
         @return: style items background attribute
 
         """
-        return getattr(self, 'back', wx.EmptyString)
+        return self._Value(u'back')
 
     def GetFace(self):
         """Returns the value of the face attribute
         @return: style items font face attribute
 
         """
-        return getattr(self, 'face', wx.EmptyString)
+        return self._Value(u'face')
+
+    def GetBackRGB(self):
+        """Returns the background colour as a tuple
+        @return: (red, green, blue) or None if no valid colour is set
+
+        """
+        return HexToRGB(self.GetBack())
 
     def GetFore(self):
         """Returns the value of the fore attribute
         @return: style items foreground attribute
 
         """
-        return getattr(self, 'fore', wx.EmptyString)
+        return self._Value(u'fore')
+
+    def GetForeRGB(self):
+        """Returns the foreground colour as a tuple
+        @return: (red, green, blue) or None if no valid colour is set
+
+        """
+        return HexToRGB(self.GetFore())
 
     def GetSize(self):
         """Returns the value of the size attribute as a string
         @return: style items font size attribute
 
         """
-        return getattr(self, 'size', wx.EmptyString)
+        return self._Value(u'size')
 
     #---- Set Functions ----#
     def SetAttrFromStr(self, style_str):
-        """Takes style string and sets the objects attributes
-        by parsing the string for the values. Only sets or 
-        overwrites values does not zero out previously set values.
-        Returning True if value(s) are set or false otherwise.
+        """Takes style string and makes an item with the attributes
+        parsed from the string set. Only sets or overwrites values does
+        not zero out previously set values.
         @param style_str: style information string (i.e fore:#888444)
         @type style_str: string
+        @return: L{StyleItem} with the values set
 
         """
-        last_set = wx.EmptyString
-        for atom in style_str.split(u','):
-            attrib = atom.split(u':')
-            if len(attrib) == 2 and attrib[0] in STY_ATTRIBUTES:
-                last_set = attrib[0]
-                setattr(self, attrib[0], attrib[1])
-            elif attrib[0] in STY_EX_ATTRIBUTES and last_set != wx.EmptyString:
-                l_val = getattr(self, last_set)
-                setattr(self, last_set, u",".join([l_val, attrib[0]]))
-            else:
-                pass
+        attrs = ATTR_CACHE.get(style_str)
+        if attrs is None:
+            attrs = ParseAttrStr(style_str)
+            if len(ATTR_CACHE) >= CACHE_LIMIT:
+                ATTR_CACHE.clear()
+            ATTR_CACHE[style_str] = attrs
+
+        if not len(attrs):
+            return self
 
-        return last_set != wx.EmptyString
+        vals = list(self._vals)
+        for attr, val in attrs:
+            vals[SPEC_INDEX[attr]] = val
+        return _InternItem(StyleItem(*vals))
 
     def SetBack(self, back, ex=wx.EmptyString):
         """Sets the Background Value
         @param back: hex color string
         @keyword ex: extra attribute (i.e bold, italic, underline)
+        @return: L{StyleItem} with the value set
 
         """
-        if ex == wx.EmptyString:
-            self.back = back
-        else:
-            self.back = u"%s,%s" % (back, ex)
+        if ex != wx.EmptyString:
+            back = u"%s,%s" % (back, ex)
+        return self._Replace(u'back', back)
 
     def SetFace(self, face, ex=wx.EmptyString):
         """Sets the Face Value
         @param back: font name string
         @keyword ex: extra attribute (i.e bold, italic, underline)
+        @return: L{StyleItem} with the value set
 
         """
-        if ex == wx.EmptyString:
-            self.face = face
-        else:
-            self.face = u"%s,%s" % (face, ex)
+        if ex != wx.EmptyString:
+            face = u"%s,%s" % (face, ex)
+        return self._Replace(u'face', face)
 
     def SetFore(self, fore, ex=wx.EmptyString):
         """Sets the Foreground Value
         @param back: hex color string
         @keyword ex: extra attribute (i.e bold, italic, underline)
+        @return: L{StyleItem} with the value set
 
         """
-        if ex == wx.EmptyString:
-            self.fore = fore
-        else:
-            self.fore = u"%s,%s" % (fore, ex)
+        if ex != wx.EmptyString:
+            fore = u"%s,%s" % (fore, ex)
+        return self._Replace(u'fore', fore)
 
     def SetSize(self, size, ex=wx.EmptyString):
         """Sets the Font Size Value
         @param back: font point size
         @type back: string or int
         @keyword ex: extra attribute (i.e bold, italic, underline)
+        @return: L{StyleItem} with the value set
 
         """
-        if ex == wx.EmptyString:
-            self.size = size
-        else:
-            self.size = u"%s,%s" % (str(size), ex)
+        if ex != wx.EmptyString:
+            size = u"%s,%s" % (str(size), ex)
+        return self._Replace(u'size', size)
 
     def SetExAttr(self, ex_attr, add=True):
         """Adds an extra text attribute to a StyleItem. Currently
@@ -211,26 +321,20 @@ class StyleItem(object):
         @param ex_attr: extra style attribute (bold, eol, italic, underline)
         @type ex_attr: string
         @keyword add: Add a style (True) or remove a style (False)
+        @return: L{StyleItem} with the attribute added or removed
 
         """
         # Get currently set attributes
         cur_str = self.__str__()
         if not add:
             cur_str = cur_str.replace(u',' + ex_attr, wx.EmptyString)
-            self.SetAttrFromStr(cur_str)
-        else:
-            if ex_attr not in cur_str:
-                attr_map = { u"fore" : self.GetFore(),
-                             u"back" : self.GetBack(),
-                             u"face" : self.GetFace(),
-                             u"size" : self.GetSize()
-                           }
-                for key in attr_map:
-                    if len(attr_map[key]) and u"," not in attr_map[key]:
-                        setattr(self, key, u",".join([attr_map[key], ex_attr]))
-                        break
-            else:
-                pass
+            return self.SetAttrFromStr(cur_str)
+        elif ex_attr not in cur_str:
+            for attr, val in zip(SPEC_ORDER, self._vals):
+                if val is not None and len(unicode(val)) and \
+                   u"," not in unicode(val):
+                    return self._Replace(attr, u",".join([val, ex_attr]))
+        return self
 
     def SetNamedAttr(self, attr, value):
         """Sets a StyleItem attribute by named string.
@@ -238,15 +342,15 @@ class StyleItem(object):
                attributes such as bold, eol, ect..
         @param attr: a particular attribute to set (i.e fore, face, back, size)
         @param value: value to set the attribute to contain
+        @return: L{StyleItem} with the value set
 
         """
-        if hasattr(self, attr):
-            cur_val = getattr(self, attr)
-            if u"," in cur_val:
-                tmp = cur_val.split(u",")
-                tmp[0] = value
-                value = u",".join(tmp)
-        setattr(self, attr, value)
+        cur_val = self._Value(attr)
+        if u"," in cur_val:
+            tmp = cur_val.split(u",")
+            tmp[0] = value
+            value = u",".join(tmp)
+        return self._Replace(attr, value)
 
 #-----------------------------------------------------------------------------#
 
@@ -257,6 +361,8 @@ class StyleMgr(object):
 
     """
     STYLES         = dict()         # Cache for loaded style set(s)
+    MTIMES         = dict()         # Modtimes of the loaded style sheets
+    TABLES         = dict()         # Cache of compiled per language tables
     FONT_PRIMARY   = u"primary"
     FONT_SECONDARY = u"secondary"
     FONT_SIZE      = u"size"
@@ -359,12 +465,13 @@ class StyleMgr(object):
         @rtype: wx.Colour or string
 
         """
-        fore = self.GetItemByName('default_style').GetFore()
-        if fore == wx.EmptyString:
-            fore = u"#000000"
-        if not as_hex:
-            fore = wx.ColourRGB(int(fore[1:], 16))
-        return fore
+        item = self.GetItemByName('default_style')
+        if as_hex:
+            fore = item.GetFore()
+            if fore == wx.EmptyString:
+                fore = u"#000000"
+            return fore
+        return wx.Colour(*(item.GetForeRGB() or (0, 0, 0)))
 
     def GetDefaultBackColour(self, as_hex=False):
         """Gets the background color of the default style and returns
@@ -376,12 +483,13 @@ class StyleMgr(object):
         @rtype: wx.Colour or string 
 
         """
-        back = self.GetItemByName('default_style').GetBack()
-        if back == wx.EmptyString:
-            back = u"#FFFFFF"
-        if not as_hex:
-            back = wx.ColourRGB(int(back[1:], 16))
-        return back
+        item = self.GetItemByName('default_style')
+        if as_hex:
+            back = item.GetBack()
+            if back == wx.EmptyString:
+                back = u"#FFFFFF"
+            return back
+        return wx.Colour(*(item.GetBackRGB() or (255, 255, 255)))
 
     def GetItemByName(self, name):
         """Gets and returns a style item using its name for the search
@@ -391,15 +499,15 @@ class StyleMgr(object):
 
         """
         if self.HasNamedStyle(name):
-            if u"%" in unicode(self.STYLES[self.style_set][name]):
-                val = unicode(self.STYLES[self.style_set][name]) % self.fonts
-                item = StyleItem()
-                item.SetAttrFromStr(val)
-                return item
+            item = self.STYLES[self.style_set][name]
+            spec = unicode(item)
+            if u"%" in spec:
+                # Items with the same fonts substituted in are shared
+                return InternStyleItem(spec % self.fonts)
             else:
-                return self.STYLES[self.style_set][name]
+                return item
         else:
-            return StyleItem()
+            return InternStyleItem(u"")
 
     def GetStyleFont(self, primary=True):
         """Returns the primary font facename by default
@@ -424,10 +532,55 @@ class StyleMgr(object):
 
         """
         if self.HasNamedStyle(name):
-            return str(self.GetItemByName(name))
+            return unicode(self.GetItemByName(name))
         else:
             return wx.EmptyString
 
+    def GetStyleTable(self, scope, syn_lst):
+        """Gets the table of style numbers to style spec strings for a
+        language. The table is only compiled the first time it is requested
+        for the current style sheet and fonts, after that it is shared by
+        all controls using the same language. Style tags that have a
+        language scoped definition (i.e. python.keyword_style) use it in
+        place of the global definition.
+        @param scope: language scope name (see L{syntax.GetStyleScope})
+        @param syn_lst: [(STYLE_ID, "STYLE_TYPE"), (STYLE_ID2, "STYLE_TYPE2)]
+        @return: tuple of (list of (style number, spec string), list of the
+                 valid items from syn_lst)
+
+        """
+        fonts = self.fonts.items()
+        fonts.sort()
+        key = (self.style_set, scope, tuple(fonts))
+        cached = self.TABLES.get(key)
+        if cached is not None and cached[0] == syn_lst:
+            return cached[1:]
+
+        table = list()
+        valid = list()
+        for syn in syn_lst:
+            if len(syn) != 2:
+                self.LOG("[styles][warn] Error setting syntax spec")
+                continue
+            elif not isinstance(syn[0], basestring) or \
+                 not hasattr(wx.stc, syn[0]):
+                self.LOG("[styles][warn] Unknown syntax region: %s" % \
+                         str(syn[0]))
+                continue
+            elif not isinstance(syn[1], basestring):
+                self.LOG("[styles][warn] Poorly formated styletag: %s" % \
+                         str(syn[1]))
+                continue
+
+            tag = u"%s.%s" % (scope, syn[1])
+            if not self.HasNamedStyle(tag):
+                tag = syn[1]
+            table.append((getattr(wx.stc, syn[0]), self.GetStyleByName(tag)))
+            valid.append(syn)
+
+        self.TABLES[key] = (list(syn_lst), table, valid)
+        return table, valid
+
     def GetStyleSet(self):
         """Returns the current set of styles or the default set if 
         there is no current set.
@@ -452,18 +605,35 @@ class StyleMgr(object):
                         data when available
         @return: whether style sheet was loaded or not
         @rtype: bool
+        @note: parsed style sheets are cached in memory and on disk until the
+               style sheet file is modified.
 
         """
         if isinstance(style_sheet, basestring) and \
-           os.path.exists(style_sheet) and \
-           ((force or not self.STYLES.has_key(style_sheet)) or \
-             style_sheet != self.style_set):
+           os.path.exists(style_sheet):
+            mtime = util.GetFileModTime(style_sheet)
+            if not force and self.MTIMES.get(style_sheet) == mtime and \
+               self.STYLES.has_key(style_sheet):
+                self.LOG("[styles][info] Using cached style data")
+                self.style_set = style_sheet
+                return True
+
+            if not force:
+                style_dict = LoadCachedSheet(style_sheet, mtime)
+                if style_dict is not None:
+                    self.LOG("[styles][info] Using compiled style sheet")
+                    self.MTIMES[style_sheet] = mtime
+                    return self.SetStyles(style_sheet, style_dict, True)
+
             reader = util.GetFileReader(style_sheet)
             if reader == -1:
                 self.LOG("[styles][err] Failed to open style sheet: %s" % style_sheet)
                 return False
             ret_val = self.SetStyles(style_sheet, self.ParseStyleData(reader.read()))
             reader.close()
+            if ret_val:
+                self.MTIMES[style_sheet] = mtime
+                WriteCachedSheet(style_sheet, mtime, self.STYLES[style_sheet])
             return ret_val
         elif not self.STYLES.has_key(style_sheet):
             self.LOG("[styles] Style sheet %s does not exists" % style_sheet)
@@ -482,16 +652,24 @@ class StyleMgr(object):
 
         """
         if isinstance(style_set, dict) and style_set.has_key('default_style'):
-            default = style_set['default_style']
-            for tag in style_set:
-                if style_set[tag].GetFace() == wx.EmptyString:
-                    style_set[tag].SetFace(default.GetFace())
-                if style_set[tag].GetFore() == wx.EmptyString:
-                    style_set[tag].SetFore(default.GetFore())
-                if style_set[tag].GetBack() == wx.EmptyString:
-                    style_set[tag].SetBack(default.GetBack())
-                if style_set[tag].GetSize() == wx.EmptyString:
-                    style_set[tag].SetSize(default.GetSize())
+            # Language scoped tags are packed last so that they can take
+            # their unset values from the packed global tag of the same name.
+            tags = [tag for tag in style_set if u'.' not in tag]
+            tags.extend([tag for tag in style_set if u'.' in tag])
+            for tag in tags:
+                default = style_set['default_style']
+                if u'.' in tag:
+                    default = style_set.get(tag.split(u'.', 1)[1], default)
+                item = style_set[tag]
+                if item.GetFace() == wx.EmptyString:
+                    item = item.SetFace(default.GetFace())
+                if item.GetFore() == wx.EmptyString:
+                    item = item.SetFore(default.GetFore())
+                if item.GetBack() == wx.EmptyString:
+                    item = item.SetBack(default.GetBack())
+                if item.GetSize() == wx.EmptyString:
+                    item = item.SetSize(default.GetSize())
+                style_set[tag] = item
         else:
             pass
         return style_set
@@ -506,130 +684,24 @@ class StyleMgr(object):
         @keyword strict: should the parser raise errors or ignore
         @return: dictionary of StyleItems constructed from the style sheet
                  data.
+        @see: L{ParseStyleSheet}
 
         """
-        # Compact data into a contiguous string
-        style_data = style_data.replace(u"\r\n", u"").replace(u"\n", u"")
-        style_data = style_data.replace(u"\t", u"")
-
-        ## Build style data tree
-        # Tree Level 1 split tag from data
-        style_tree = [style.split(u"{") for style in style_data.split(u'}')]
-        if len(style_tree) and style_tree[-1][0] == wx.EmptyString:
-            style_tree.pop()
-
-        # Check for Level 1 Syntax Errors
-        tmp = style_tree
-        for style in tmp:
-            if len(style) != 2:
-                self.LOG("[styles][error] There was an error parsing "
-                         "the syntax data from " + self.style_set)
-                self.LOG("[styles][error] You are missing a { or } " +
-                        "in Def: " + style[0].split()[0])
-                if strict:
-                    raise SyntaxError, \
-                          "Missing { or } near Def: %s" % style[0].split()[0]
-                else:
-                    style_tree.remove(style)
-
-        # Tree Level 2 Build small trees of tag and style attributes
-        # Tree Level 3 Branch tree into TAG => Attr => Value String
-        for branch in style_tree:
-            tmp2 = [leaf.strip().split(u":") 
-                    for leaf in branch[1].strip().split(u";")]
-            if len(tmp2) and tmp2[-1][0] == wx.EmptyString:
-                tmp2.pop()
-            branch[1] = tmp2
-
-        # Check for L2/L3 Syntax errors and build a clean dictionary
-        # of Tags => Valid Attributes
-        style_dict = dict()
-        for branch in style_tree:
-            value = list()
-            tag = branch[0].replace(u" ", u"")
-            for leaf in branch[1]:
-                leaf[0] = leaf[0].strip() # Remove any remaining whitespace
-                if len(leaf) != 2:
-                    self.LOG("[styles][error] Missing a : or ; in the "
-                             "declaration of %s" % tag)
-                    if strict:
-                        raise SyntaxError, "Missing : or ; in def: %s" % tag
-                elif leaf[0] not in STY_ATTRIBUTES:
-                    self.LOG(("[styles][warning] Unknown style attribute: %s"
-                             ", In declaration of %s") % (leaf[0], tag))
-                    if strict:
-                        raise SyntaxWarning, "Unknown attribute %s" % leaf[0]
+        style_dict, diagnostics = ParseStyleSheet(style_data)
+        for line, col, level, msg in diagnostics:
+            self.LOG("[styles][%s] %s: line %d, column %d: %s" % \
+                     (level, self.style_set, line, col, msg))
+            if strict:
+                if level == ESS_ERROR:
+                    raise SyntaxError, "Line %d, column %d: %s" % \
+                                       (line, col, msg)
                 else:
-                    value.append(leaf)
-            style_dict[tag] = value
-
-        # Trim the leafless branches from the dictionary
-        tmp = style_dict
-        for style_def in tmp:
-            if len(tmp[style_def]) == 0:
-                style_dict.pop(style_def)
-
-        # Validate leaf values and format into stylestring
-        for style_def in style_dict:
-            if not style_def[0][0].isalpha():
-                self.LOG("[styles] [syntax_error] The style def %s is not a "
-                         "valid name" % style_def[0])
-                if strict:
-                    raise SyntaxError, "%s is an invalid name" % style_def[0]
-            else:
-                style_str = wx.EmptyString
-                for attrib in style_dict[style_def]:
-                    values = [ val for val in attrib[1].split(u" ") 
-                               if val != wx.EmptyString ]
-                    if len(values) > 2:
-                        self.LOG("[styles][warning] Only one extra " +
-                                 "attribute can be set per style. See " +
-                                 style_def + " => " + attrib[0])
-                        if strict:
-                            raise SyntaxWarning
-
-                    # Validate values
-                    v1ok = v2ok = False
-                    if len(values) and attrib[0] in "fore back":
-                        if values[0][0] == u"#" and len(values[0]) == 7 and \
-                           values[0][1:].isalnum():
-                            v1ok = True
-                    elif len(values) and attrib[0] in "face size": 
-                        # TODO these regular expressions need work
-                        match1 = re.compile("\%\([a-zA-Z0-9]*\)")
-                        match2 = re.compile("[a-zA-Z0-9]*")
-                        if match1.match(values[0]) or match2.match(values[0]):
-                            v1ok = True
-                        else:
-                            self.LOG("[styles] [syntax_warning] Bad value in %s"
-                                     " the value %s is invalid." % \
-                                     (attrib[0], values[0]))
-
-                    if len(values) == 2 and values[1] in STY_EX_ATTRIBUTES:
-                        v2ok = True
-                    elif len(values) == 2:
-                        self.LOG("[styles][warning] Unknown extra " + \
-                                 "attribute '" + values[1] + \
-                                 "' in attribute: " + attrib[0])
-
-                    if v1ok and v2ok:
-                        value = u",".join(values)
-                    elif v1ok:
-                        value = values[0]
-                    else:
-                        continue
-                    
-                    style_str = u",".join([style_str, 
-                                           u":".join([attrib[0], value])])
-
-                if style_str != wx.EmptyString:
-                    style_dict[style_def] = style_str.strip(u",")
+                    raise SyntaxWarning, "Line %d, column %d: %s" % \
+                                         (line, col, msg)
 
         # Build a StyleItem Dictionary
         for key in style_dict:
-            new_item = StyleItem()
-            new_item.SetAttrFromStr(style_dict[key])
-            style_dict[key] = new_item
+            style_dict[key] = InternStyleItem(style_dict[key])
 
         return style_dict
 
@@ -669,6 +741,11 @@ class StyleMgr(object):
 
         """
         self.STYLES[self.style_set][style_tag] = value
+        ClearStyleTables(self.style_set)
+
+        # The set no longer matches its file so reload it the next time
+        if self.MTIMES.has_key(self.style_set):
+            del self.MTIMES[self.style_set]
 
     def SetStyles(self, name, style_dict, nomerge=False):
         """Sets the managers style data and returns True on success.
@@ -682,6 +759,7 @@ class StyleMgr(object):
         if nomerge:
             self.style_set = name
             self.STYLES[name] = self.PackStyleSet(style_dict)
+            ClearStyleTables(name)
             return True
 
         # Merge the given style set with the default set to fill in any
@@ -696,6 +774,7 @@ class StyleMgr(object):
             self.style_set = name
             tmp = MergeStyles(DefaultStyleDictionary(), style_dict)
             self.STYLES[name] = self.PackStyleSet(tmp)
+            ClearStyleTables(name)
             return True
         else:
             self.LOG("[styles][error] SetStyles expects a " \
@@ -704,6 +783,17 @@ class StyleMgr(object):
 
 #-----------------------------------------------------------------------------#
 # Utility Functions
+def ClearStyleTables(style_set):
+    """Removes the compiled style tables of a style set from the cache
+    so that they are rebuilt with its new values the next time they are
+    requested.
+    @param style_set: name of style set that has changed
+
+    """
+    for key in StyleMgr.TABLES.keys():
+        if key[0] == style_set:
+            del StyleMgr.TABLES[key]
+
 def DefaultStyleDictionary():
     """This is the default style values that are used for styling
     documents. Its used as a fallback for undefined values in a 
@@ -756,6 +846,299 @@ def DefaultStyleDictionary():
          }
     return def_dict
 
+def GetSheetCachePath(style_sheet):
+    """Gets the path to the compiled version of a style sheet in the
+    cache directory.
+    @param style_sheet: path of style sheet
+    @return: path to compiled style sheet or None if there is no cache dir
+
+    """
+    cache = ed_glob.CONFIG.get('CACHE_DIR', u'')
+    if not cache or not os.path.exists(cache):
+        return None
+
+    if isinstance(style_sheet, unicode):
+        style_sheet = style_sheet.encode('utf-8')
+    return os.path.join(cache, u"%s.ssc" % md5(style_sheet).hexdigest())
+
+def HexToRGB(hex_str):
+    """Converts a hex colour string to a tuple of integers. Any extra
+    attributes following the colour are ignored. The results are cached
+    as the same few colours are looked up over and over when generating
+    documents.
+    @param hex_str: colour string (i.e #FF0000 or #FF0000,bold)
+    @return: (red, green, blue) or None if the string is not a colour
+
+    """
+    if RGB_CACHE.has_key(hex_str):
+        return RGB_CACHE[hex_str]
+
+    rgb = None
+    val = hex_str.split(u',')[0].strip().lstrip(u'#')
+    if 0 < len(val) <= 6:
+        val += (6 - len(val)) * u"0"
+        try:
+            rgb = (int(val[0:2], 16), int(val[2:4], 16), int(val[4:6], 16))
+        except ValueError:
+            pass
+
+    if len(RGB_CACHE) >= CACHE_LIMIT:
+        RGB_CACHE.clear()
+    RGB_CACHE[hex_str] = rgb
+    return rgb
+
+def InternStyleItem(style_str):
+    """Gets the shared StyleItem for a style string, only creating a
+    new one the first time the string is seen.
+    @param style_str: style information string (i.e fore:#888444,bold)
+    @return: L{StyleItem}
+
+    """
+    item = ITEM_CACHE.get(style_str)
+    if item is None:
+        item = _InternItem(StyleItem().SetAttrFromStr(style_str))
+        if len(ITEM_CACHE) >= CACHE_LIMIT:
+            ITEM_CACHE.clear()
+        ITEM_CACHE[style_str] = item
+    return item
+
+def _InternItem(item):
+    """Gets the shared StyleItem that is equal to the given one
+    @param item: L{StyleItem}
+    @return: L{StyleItem}
+
+    """
+    spec = unicode(item)
+    shared = ITEM_CACHE.get(spec)
+    if shared is None:
+        if len(ITEM_CACHE) >= CACHE_LIMIT:
+            ITEM_CACHE.clear()
+        ITEM_CACHE[spec] = shared = item
+    return shared
+
+def LoadCachedSheet(style_sheet, mtime):
+    """Loads the compiled version of a style sheet from the cache
+    directory if it is up to date with the style sheet file.
+    @param style_sheet: path of style sheet
+    @param mtime: current modtime of the style sheet file
+    @return: dictionary of StyleItems or None if there is no usable
+             compiled version
+
+    """
+    path = GetSheetCachePath(style_sheet)
+    if path is None or not os.path.exists(path):
+        return None
+
+    try:
+        handle = open(path, 'rb')
+        name, stime, version, style_strs = marshal.loads(handle.read())
+        handle.close()
+    except (IOError, OSError, EOFError, ValueError, TypeError), msg:
+        util.Log("[styles][err] Bad compiled style sheet %s" % str(msg))
+        return None
+
+    # The defaults are merged into the compiled data so it must also be
+    # rebuilt when Editra is updated.
+    if name != style_sheet or stime != mtime or version != ed_glob.VERSION:
+        return None
+
+    style_dict = dict()
+    for tag, style_str in style_strs.iteritems():
+        style_dict[tag] = InternStyleItem(style_str)
+    return style_dict
+
+def WriteCachedSheet(style_sheet, mtime, style_dict):
+    """Writes a compiled version of a style sheet to the cache directory
+    @param style_sheet: path of style sheet
+    @param mtime: modtime of style sheet file the data was parsed from
+    @param style_dict: dictionary of StyleItems parsed from the sheet
+
+    """
+    path = GetSheetCachePath(style_sheet)
+    if path is None:
+        return
+
+    style_strs = dict()
+    for tag, item in style_dict.iteritems():
+        style_strs[tag] = unicode(item)
+
+    try:
+        handle = open(path, 'wb')
+        handle.write(marshal.dumps((style_sheet, mtime, ed_glob.VERSION,
+                                    style_strs)))
+        handle.close()
+    except (IOError, OSError, ValueError), msg:
+        util.Log("[styles][err] Failed to write compiled style sheet %s" % \
+                 str(msg))
+
+def ParseAttrStr(style_str):
+    """Parses a style string into the attributes it sets
+    @param style_str: style information string (i.e fore:#888444,bold)
+    @return: tuple of (attribute, value) pairs
+
+    """
+    attrs = list()
+    last = None
+    for atom in style_str.split(u','):
+        attrib = atom.split(u':')
+        if len(attrib) == 2 and attrib[0] in SPEC_ORDER:
+            last = [attrib[0], attrib[1]]
+            attrs.append(last)
+        elif attrib[0] in STY_EX_ATTRIBUTES and last is not None:
+            last[1] = u",".join([last[1], attrib[0]])
+        else:
+            pass
+    return tuple([tuple(attr) for attr in attrs])
+
+def ParseStyleSheet(style_data):
+    """Parses the text of an Editra Style Sheet in a single pass. Style
+    definitions can be scoped to a language by either prefixing the tag with
+    the language name (python.keyword_style) or by putting them in a block
+    (@python { keyword_style { ... } }). C style comments are allowed.
+    Errors do not stop the parser, the bad definitions are skipped and
+    reported in the list of diagnostics.
+    @param style_data: style sheet data string
+    @return: tuple of (dictionary of tag names to style strings, list of
+             (line, column, level, message) diagnostics)
+
+    """
+    style_dict = dict()
+    diagnostics = list()
+    attributes = STY_ATTRIBUTES.split()
+    ex_attributes = STY_EX_ATTRIBUTES.split()
+
+    def Report(level, offset, msg):
+        """Adds a diagnostic message for the first non whitespace character
+        at or after the given offset in the data.
+
+        """
+        while offset < len(style_data) - 1 and style_data[offset].isspace():
+            offset += 1
+        line = style_data.count(u"\n", 0, offset) + 1
+        col = offset - style_data.rfind(u"\n", 0, offset)
+        diagnostics.append((line, col, level, msg))
+
+    def Blank(match):
+        """Replaces a comment with spaces so offsets are unchanged"""
+        return u" " * len(match.group(0))
+
+    def ParseBody(tag, body, offset):
+        """Parses the declarations in the body of a definition block and
+        stores the resulting style string under tag.
+
+        """
+        if u"/*" in body:
+            body = ESS_COMMENT.sub(Blank, body)
+
+        values = list()
+        for decl in body.split(u";"):
+            parts = decl.split(u":")
+            if len(parts) == 2:
+                value = ParseDecl(parts[0].strip(), parts[1].split(), offset)
+                if value is not None:
+                    values.append(value)
+            elif len(parts) > 2:
+                Report(ESS_ERROR, offset, u"Missing ; in the declaration "
+                                          u"of %s" % tag)
+            elif not decl.isspace() and len(decl):
+                Report(ESS_ERROR, offset, u"Missing : in the declaration "
+                                          u"of %s" % tag)
+            offset += len(decl) + 1
+
+        if not len(tag):
+            return
+        elif not tag[0].isalpha():
+            Report(ESS_ERROR, tag_pos, u"%s is not a valid name" % tag)
+        elif len(values):
+            style_dict[tag] = u",".join(values)
+
+    def ParseDecl(attr, words, offset):
+        """Validates an attribute declaration and returns its style string
+        or None if it is not valid.
+
+        """
+        if attr not in attributes:
+            Report(ESS_WARNING, offset, u"Unknown style attribute: %s" % attr)
+            return None
+        elif not len(words):
+            Report(ESS_ERROR, offset, u"Missing value for %s" % attr)
+            return None
+        elif len(words) > 2:
+            Report(ESS_WARNING, offset, u"Only one extra attribute can be "
+                                        u"set per style attribute: %s" % attr)
+
+        value = words[0]
+        if attr == u"fore" or attr == u"back":
+            if value[0] != u"#" or len(value) != 7 or \
+               not value[1:].isalnum():
+                Report(ESS_ERROR, offset, u"Bad color value for %s: %s" % \
+                                          (attr, value))
+                return None
+        elif not FMT_VALUE.match(value) and not NAME_VALUE.match(value):
+            Report(ESS_WARNING, offset, u"Bad value for %s: %s" % \
+                                        (attr, value))
+            return None
+
+        if len(words) > 1:
+            if words[1] in ex_attributes:
+                value = u",".join(words[:2])
+            else:
+                Report(ESS_WARNING, offset, u"Unknown extra attribute %s in "
+                                            u"attribute: %s" % \
+                                            (words[1], attr))
+        return u":".join([attr, value])
+
+    scope = None        # Name of current language scope
+    scope_pos = 0
+    tag_pos = 0
+    pos = 0
+    match = ESS_TOKENS.match
+    while True:
+        token = match(style_data, pos)
+        kind = token.lastgroup
+        pos = token.end()
+        if kind == 'block' or kind == 'open':
+            if kind == 'block':
+                groups = ('tag', 'body')
+            else:
+                groups = ('otag', 'obody')
+            tag, body = token.group(*groups)
+            tag_pos = token.start(kind)
+            if not len(tag):
+                Report(ESS_ERROR, tag_pos, u"Missing style name before {")
+            elif scope is not None:
+                tag = u"%s.%s" % (scope, tag)
+            if kind == 'open':
+                Report(ESS_ERROR, tag_pos, u"Missing } in the definition "
+                                           u"of %s" % tag)
+            ParseBody(tag, body, token.start(groups[1]))
+        elif kind == 'scope':
+            if scope is not None:
+                Report(ESS_ERROR, token.start(kind), u"Language blocks can "
+                                                     u"not be nested")
+            else:
+                scope = token.group('lang').lower()
+                scope_pos = token.start(kind)
+        elif kind == 'close':
+            if scope is not None:
+                scope = None
+            else:
+                Report(ESS_ERROR, token.start(kind), u"Unexpected }")
+        elif kind == 'comment':
+            Report(ESS_ERROR, token.start(kind), u"Comment is not closed")
+            break
+        elif kind == 'bad':
+            Report(ESS_ERROR, token.start(kind), u"Unexpected %s" % \
+                                                 token.group(kind))
+        else:
+            break
+
+    if scope is not None:
+        Report(ESS_ERROR, scope_pos, u"Missing } at end of @%s" % scope)
+
+    diagnostics.sort()
+    return style_dict, diagnostics
+
 def MergeFonts(style_dict, font_dict):
     """Does any string substitution that the style dictionary
     may need to have fonts and their sizes set.
@@ -767,7 +1150,8 @@ def MergeFonts(style_dict, font_dict):
     for style in style_dict:
         st_str = str(style_dict[style])
         if u'%' in st_str:
-            style_dict[style].SetAttrFromStr(st_str % font_dict)
+            style_dict[style] = style_dict[style].SetAttrFromStr(st_str % \
+                                                                 font_dict)
     return style_dict
 
 def MergeStyles(styles1, styles2):
@@ -30,11 +30,13 @@ __revision__ = "$Revision$"
 
 #--------------------------------------------------------------------------#
 # Dependancies
+import os
+import re
 import wx
 import wx.stc
 import ed_glob
 import ed_menu
-from ed_style import StyleItem
+from ed_style import StyleItem, HexToRGB
 import util
 import plugin
 import time
@@ -43,6 +45,33 @@ import time
 _ = wx.GetTranslation
 
 FONT_FALLBACKS = "Trebuchet, Tahoma, sans-serif"
+CHUNK_SIZE = 65536          # Characters of output to collect into a chunk
+
+# LaTeX special characters
+TEX_MAP = { "#" : "\\#", "$" : "\\$", "^" : "\\^",
+            "%" : "\\%", "&" : "\\&", "_" : "\\_",
+            "{" : "\\{", "}" : "\\}", "~" : "\\~",
+            "\\": "$\\backslash$", "\n" : "\\\\\n",
+            "@" : "$@$", "<" : "$<$", ">" : "$>$",
+            "-" : "$-$", "|" : "$|$"
+          }
+RE_TEX_SPECIAL = re.compile(u"[%s]" % re.escape(u"".join(TEX_MAP.keys())))
+
+# RTF special characters, anything outside of ascii is escaped as unicode
+RTF_MAP = { u"\t" : u"\\tab ", u"{" : u"\\{", u"}" : u"\\}",
+            u"\\" : u"\\\\", u"\n" : u"\\par\n", u"\r" : u"\\par\n",
+            u"\r\n" : u"\\par\n" }
+RE_RTF_SPECIAL = re.compile(u"\r\n|[\t{}\\\\\n\r]|[^\x00-\x7f]")
+RTF_CACHE = dict()          # Non ascii character -> rtf escape
+RTF_CACHE_LIMIT = 4096      # Max entries in RTF_CACHE before it is reset
+
+# Clipboard format names of generated documents on each platform
+CLIP_FORMATS = { 'html' : { '__WXGTK__' : "text/html",
+                            '__WXMAC__' : "public.html",
+                            '__WXMSW__' : "HTML Format" },
+                 'rtf'  : { '__WXGTK__' : "text/rtf",
+                            '__WXMAC__' : "public.rtf",
+                            '__WXMSW__' : "Rich Text Format" } }
 
 #--------------------------------------------------------------------------#
 # Plugin Interface
@@ -57,12 +86,32 @@ class GeneratorI(plugin.Interface):
         function needs to be a 2 item tuple with the first item being
         an associated file extention to use for setting highlighting
         if available and the second item is the string of the new document.
+        Generators that can generate part of a document should also take
+        start and end position keywords (see L{Generator.GenerateText}).
         @param stc: reference to an an stc defined in ed_stc.py
+        @note: use stc.GetStyledTextRuns or stc.GetStyleRuns to get the
+               styled regions of the document instead of looking at the
+               style of each position.
         @see: L{ed_stc.py}
 
         """
         pass
 
+    def GenerateStream(self, stc, start=0, end=-1):
+        """Optional, generators that can produce the document in parts
+        should implement this so that large documents can be written
+        straight to disk. The return value is a 2 item tuple of the file
+        extension and an iterable of (text, progress) tuples where progress
+        is the number of characters of the source document that have been
+        processed so far.
+        @param stc: reference to an an stc defined in ed_stc.py
+        @keyword start: position to start generating from
+        @keyword end: position to stop at (-1 for the end of the document)
+        @see: L{ChunkText}
+
+        """
+        pass
+
     def GetId(self):
         """Must return the Id used for the generator objects
         menu id. This is used to identify which Generator to
@@ -111,25 +160,61 @@ class Generator(plugin.Plugin):
         menu.AppendMenu(ed_glob.ID_GENERATOR, _("Generator"), genmenu,
                              _("Generate Code and Documents"))
 
-    def GenerateText(self, e_id, txt_ctrl):
+    def GenerateText(self, e_id, txt_ctrl, start=0, end=-1):
         """Generates the new document text based on the given
         generator id and contents of the given ED_STC text control.
         @param e_id: event id originating from menu entry
         @param txt_ctrl: reference document to generate from
         @type txt_ctrl: EditraStc
+        @keyword start: position to start generating from
+        @keyword end: position to stop at (-1 for the end of the document)
         @return: the generated text
         @rtype: string
+        @note: the range is only passed on to the generator when it is not
+               the whole document.
         
         """
         gentext = None
-        start = time.time()
+        stime = time.time()
         for observer in self.observers:
-            if observer.GetId() == e_id:
+            if observer.GetId() != e_id:
+                continue
+            if start == 0 and end == -1:
                 gentext = observer.Generate(txt_ctrl)
+            else:
+                gentext = observer.Generate(txt_ctrl, start, end)
         wx.GetApp().GetLog()("[generator][info] Generation time %f" % \
-                                                        (time.time() - start))
+                                                        (time.time() - stime))
         return gentext
 
+    def GenerateStream(self, e_id, txt_ctrl, start=0, end=-1):
+        """Gets the generator for the given id to generate the new document
+        in parts. Generators that do not support streaming generate the
+        whole document as a single part.
+        @param e_id: event id originating from menu entry
+        @param txt_ctrl: reference document to generate from
+        @type txt_ctrl: EditraStc
+        @keyword start: position to start generating from
+        @keyword end: position to stop at (-1 for the end of the document)
+        @return: (file extension, iterable of (text, progress)) or None
+        @see: L{WriteChunks}
+
+        """
+        for observer in self.observers:
+            if observer.GetId() != e_id:
+                continue
+
+            if hasattr(observer, 'GenerateStream'):
+                return observer.GenerateStream(txt_ctrl, start, end)
+            if start == 0 and end == -1:
+                doc = observer.Generate(txt_ctrl)
+            else:
+                doc = observer.Generate(txt_ctrl, start, end)
+            if doc:
+                return (doc[0], [(doc[1], GetRangeLength(txt_ctrl,
+                                                         start, end))])
+        return None
+
 #--------------------------------------------------------------------------#
 
 class Html(plugin.Plugin):
@@ -149,6 +234,7 @@ class Html(plugin.Plugin):
 
         # Attributes
         self._id = ed_glob.ID_HTML_GEN
+        self._range = (0, -1)
         self.stc = None
         self.head = wx.EmptyString
         self.css = dict()
@@ -159,16 +245,7 @@ class Html(plugin.Plugin):
         @return string version of html object
 
         """
-        style = "<style type=\"text/css\">\n%s</style>"
-        css = wx.EmptyString
-        for key in self.css:
-            css += str(self.css[key]) + "\n"
-        css = css % self.stc.GetFontDictionary()
-        style = style % css
-        head = self.head.replace('</head>', style + "\n</head>")
-        html = "<html>\n%s\n%s\n</html>"
-        html = html % (head, self.body)
-        return html
+        return u"".join([txt for txt, done in self.IterHtml()])
 
     def Unicode(self):
         """Returns the html as unicode
@@ -177,16 +254,40 @@ class Html(plugin.Plugin):
         """
         return unicode(self.__str__())
 
-    def Generate(self, stc_ctrl):
+    def Generate(self, stc_ctrl, start=0, end=-1):
         """Generates and returns the document
         @param stc_ctrl: text control to get text from
+        @keyword start: position to start generating from
+        @keyword end: position to stop at (-1 for the end of the document)
 
         """
         self.stc = stc_ctrl
-        self.head = self.GenerateHead()
-        self.body = self.GenerateBody()
+        self._range = (start, end)
         return ("html", self.__str__())
 
+    def GenerateCss(self):
+        """Generates the css for the styles that are used in the part of
+        the document that is being generated.
+        @return: html style block
+
+        """
+        self.css = dict()
+        stc = self.stc
+        tags = ['default_style']
+        tags.extend([stc.FindTagById(style_id)
+                     for style_id in stc.GetStyleIds(*self._range)])
+        for tag in tags:
+            if not self.css.has_key(tag):
+                s_item = stc.GetItemByName(tag)
+                self.css[tag] = CssItem(tag.split('_')[0], s_item)
+        self.OptimizeCss()
+
+        css = wx.EmptyString
+        for key in self.css:
+            css += str(self.css[key]) + "\n"
+        css = css % stc.GetFontDictionary()
+        return "<style type=\"text/css\">\n%s</style>" % css
+
     def GenerateHead(self):
         """Generates the html head block
         @return: html header information
@@ -201,66 +302,64 @@ class Html(plugin.Plugin):
                               ed_glob.VERSION)
 
     def GenerateBody(self):
-        """Generates the body of the html from the stc's content. To do
-        this it does a character by character parse of the stc to determine
-        style regions and generate css and and styled spans of html in order
-        to generate an 'exact' html reqresentation of the stc's window.
+        """Generates the body of the html from the stc's content.
         @return: the body section of the html generated from the text control
+        @see: L{IterBody}
 
         """
-        html = list()
-        parse_pos = 0
-        style_start = 0
-        style_end = 0
-        last_pos = self.stc.GetLineEndPosition(self.stc.GetLineCount()) + 1
-
-        # Get Document start point info
-        last_id = self.stc.GetStyleAt(parse_pos)
-        tag = self.stc.FindTagById(last_id)
-        if tag != wx.EmptyString:
-            s_item = StyleItem()
-            s_item.SetAttrFromStr(self.stc.GetStyleByName(tag))
-            self.css[tag] = CssItem(tag.split('_')[0], s_item)
- 
-        # Optimizations
-        stc = self.stc
-        GetStyleAt = stc.GetStyleAt
-
-        # Build Html
-        while parse_pos < last_pos:
-            parse_pos += 1
-            curr_id = GetStyleAt(parse_pos)
-            style_end = parse_pos
-            # If style region has changed close section
-            if curr_id == 0 and GetStyleAt(parse_pos + 1) == last_id:
-                curr_id = last_id
-
-            if curr_id != last_id or parse_pos == last_pos:
-                tmp = stc.GetTextRange(style_start, style_end)
-                tmp = self.TransformText(tmp)
-                if tmp.isspace() or tag in ["default_style", "operator_style"]:
-                    html.append(tmp)
-                else:
-                    tmp2 = "<span class=\"%s\">%s</span>"
-                    html.append(tmp2 % (tag.split('_')[0], tmp))
-
-                last_id = curr_id
-                style_start = style_end
-                tag = stc.FindTagById(last_id)
-                if not self.css.has_key(tag):
-                    s_item = StyleItem()
-                    s_item.SetAttrFromStr(stc.GetStyleByName(tag))
-                    self.css[tag] = CssItem(tag.split('_')[0], s_item)
-        if len(html) == 0:
-            # Case for unstyled documents
-            s_item = StyleItem()
-            s_item.SetAttrFromStr(stc.GetStyleByName('default_style'))
-            self.css['default_style'] = CssItem('default', s_item)
-            html.append(self.TransformText(stc.GetText()))
-        else:
-            self.OptimizeCss()
         return "<body class=\"default\">\n<pre>\n%s\n</pre>\n</body>" % \
-                                                                   "".join(html)
+               u"".join([txt for txt, size in self.IterBody()])
+
+    def GenerateStream(self, stc_ctrl, start=0, end=-1):
+        """Generates the document in parts
+        @param stc_ctrl: text control to get text from
+        @keyword start: position to start generating from
+        @keyword end: position to stop at (-1 for the end of the document)
+        @return: ("html", generator of (text, progress) tuples)
+
+        """
+        self.stc = stc_ctrl
+        self._range = (start, end)
+        return ("html", self.IterHtml())
+
+    def IterBody(self):
+        """Generates the html of the stc's content. To do this it walks the
+        style runs of the stc to generate styled spans of html in order to
+        generate an 'exact' html reqresentation of the stc's window.
+        @return: generator of (html, number of characters of text) tuples
+
+        """
+        stc = self.stc
+        tags = dict()
+        plain = ("default_style", "operator_style")
+        span = "<span class=\"%s\">%s</span>"
+        TransformText = self.TransformText
+
+        for style_id, txt in stc.GetStyledTextRuns(*self._range):
+            tag = tags.get(style_id)
+            if tag is None:
+                tag = tags[style_id] = stc.FindTagById(style_id)
+
+            size = len(txt)
+            txt = TransformText(txt)
+            if tag in plain or txt.isspace():
+                yield txt, size
+            else:
+                yield span % (tag.split('_')[0], txt), size
+
+    def IterHtml(self):
+        """Generates the whole html document in parts
+        @return: generator of (text, progress) tuples
+
+        """
+        # The css of all the styles is needed before the body
+        head = self.GenerateHead().replace('</head>', 
+                                           self.GenerateCss() + "\n</head>")
+        yield "<html>\n%s\n<body class=\"default\">\n<pre>\n" % head, 0
+        for chunk in ChunkText(self.IterBody()):
+            yield chunk
+        yield "\n</pre>\n</body>\n</html>", GetRangeLength(self.stc,
+                                                          *self._range)
 
     def GetId(self):
         """Returns the menu identifier for the HTML generator
@@ -493,6 +592,7 @@ class LaTeX(plugin.Plugin):
         plugin.Plugin.__init__(self, plgmgr)
         self._stc = None
         self._id = ed_glob.ID_TEX_GEN
+        self._range = (0, -1)
         self._dstyle = StyleItem()
         self._cmds = dict()
 
@@ -517,89 +617,90 @@ class LaTeX(plugin.Plugin):
         @returns: the main body of the reference document marked up with latex
 
         """
-        tex = list()
-        tmp = u''
-        start = parse_pos = 0
-        last_pos = self._stc.GetLineEndPosition(self._stc.GetLineCount())
-
-        # Define the default style
-        self.RegisterStyleCmd('default_style', \
-                              self._stc.GetItemByName('default_style'))
+        self.RegisterStyles()
+        body = u"".join([txt for txt, size in self.IterBody()])
+        return "\\begin{document}\n%s\n\\end{document}" % body
 
-        # Get Document start point info
-        last_id = self._stc.GetStyleAt(parse_pos)
-        tmp = self.TransformText(self._stc.GetTextRange(parse_pos, 
-                                                        parse_pos + 1))
-        tag = self._stc.FindTagById(last_id)
-        if tag != wx.EmptyString:
-            self.RegisterStyleCmd(tag, self._stc.GetItemByName(tag))
+    def IterBody(self):
+        """Generates the LaTeX of the document text, the style commands must
+        have been registered first.
+        @return: generator of (text, number of characters of text) tuples
+        @see: L{RegisterStyles}
 
-        # Optimizations
+        """
         stc = self._stc
-        GetStyleAt = stc.GetStyleAt
-        GetTextRange = stc.GetTextRange
+        cmds = dict()
         TransformText = self.TransformText
 
-        # Build LaTeX
-        for parse_pos in xrange(last_pos + 1):
-            curr_id = GetStyleAt(parse_pos)
-            if parse_pos > 1:
-                # This is the performance bottleneck, changeing the text
-                # collection to when the style changes is much faster as
-                # it only needs to be done once per style section instead
-                # of once per character. Doing that however causes problems
-                # with the style and resulting document formatting.
-                tmp = TransformText(GetTextRange((parse_pos - 1), parse_pos))
-
-            if curr_id == 0 and GetStyleAt(parse_pos + 1) == last_id:
-                curr_id = last_id
-
-            # If style region has changed close section
-            if curr_id != last_id or tmp[-1] == "\n":
-                tmp_tex = TransformText(GetTextRange(start, parse_pos))
-#                 tmp_tex = u"".join(tmp)
-                if tag == "operator_style" or \
-                   (tag == "default_style" and \
-                    tmp_tex.isspace() and len(tmp_tex) <= 2):
+        # Build LaTeX, styled sections are closed at the end of each line
+        # so that the line breaks are not inside of the style commands.
+        for style_id, txt in stc.GetStyledTextRuns(*self._range):
+            if style_id not in cmds:
+                tag = stc.FindTagById(style_id)
+                cmds[style_id] = (tag, self.CreateCmdName(tag))
+            tag, cmd = cmds[style_id]
+
+            tex = list()
+            size = len(txt)
+            txt = txt.replace(u"\r\n", u"\n").replace(u"\r", u"\n")
+            lines = txt.split(u"\n")
+            last = len(lines) - 1
+            for idx, line in enumerate(lines):
+                if idx:
+                    tex.append(u"\\\\\n")
+                if not len(line.strip()):
+                    # A line break needs something on the line before it
+                    if idx != last:
+                        tex.append(u"\\mbox{}")
+                    tex.append(line)
+                    continue
+                tmp_tex = TransformText(line)
+                if tag == "operator_style":
                     tex.append(tmp_tex)
                 else:
-                    if "\\\\\n" in tmp_tex:
-                        tmp_tex = tmp_tex.replace("\\\\\n", "")
-                        tmp2 = "\\%s{%s}\\\\\n"
-                    else:
-                        tmp2 = "\\%s{%s}"
-
-                    cmd = self.CreateCmdName(tag)
-                    if cmd in [None, wx.EmptyString]:
-                        cmd = "defaultstyle"
-                    tex.append(tmp2 % (cmd, tmp_tex))
-
-                last_id = curr_id
-                tag = stc.FindTagById(last_id)
-                if tag not in [None, wx.EmptyString]:
-                    self.RegisterStyleCmd(tag, stc.GetItemByName(tag))
-                tmp = list()
-                start = parse_pos
-        if tex == wx.EmptyString:
-            # Case for unstyled documents
-            tex.append(self.TransformText(stc.GetText()))
-        return "\\begin{document}\n%s\n\\end{document}" % "".join(tex)
-
-    def Generate(self, stc_doc):
+                    tex.append(u"\\%s{%s}" % (cmd, tmp_tex))
+            yield u"".join(tex), size
+
+    def Generate(self, stc_doc, start=0, end=-1):
         """Generates the LaTeX document
         @param stc_doc: text control to generate latex from
+        @keyword start: position to start generating from
+        @keyword end: position to stop at (-1 for the end of the document)
         @return: the reference document marked up in LaTeX.
 
+        """
+        ext, chunks = self.GenerateStream(stc_doc, start, end)
+        return (ext, u"".join([txt for txt, done in chunks]))
+
+    def GenerateStream(self, stc_doc, start=0, end=-1):
+        """Generates the LaTeX document in parts
+        @param stc_doc: text control to generate latex from
+        @keyword start: position to start generating from
+        @keyword end: position to stop at (-1 for the end of the document)
+        @return: ("tex", generator of (text, progress) tuples)
+
         """
         self._stc = stc_doc
+        self._range = (start, end)
+        self._cmds = dict()
         default_si = self._stc.GetItemByName('default_style')
-        self._dstyle.SetBack(default_si.GetBack().split(',')[0])
-        self._dstyle.SetFore(default_si.GetFore().split(',')[0])
-        self._dstyle.SetFace(default_si.GetFace().split(',')[0])
-        self._dstyle.SetSize(default_si.GetSize().split(',')[0])
-        body = self.GenDoc()
-        preamble = self.GenPreamble()
-        return ("tex", u"".join([preamble, body]))
+        self._dstyle = StyleItem(default_si.GetFore().split(',')[0],
+                                 default_si.GetBack().split(',')[0],
+                                 default_si.GetFace().split(',')[0],
+                                 default_si.GetSize().split(',')[0])
+        return ("tex", self.IterDoc())
+
+    def IterDoc(self):
+        """Generates the whole LaTeX document in parts
+        @return: generator of (text, progress) tuples
+
+        """
+        # The style commands are defined in the preamble
+        self.RegisterStyles()
+        yield self.GenPreamble() + "\\begin{document}\n", 0
+        for chunk in ChunkText(self.IterBody()):
+            yield chunk
+        yield "\n\\end{document}", GetRangeLength(self._stc, *self._range)
 
     def GenPreamble(self):
         """Generates the Preamble of the document
@@ -651,17 +752,24 @@ class LaTeX(plugin.Plugin):
         @param hex_str: hex string to convert to latex rgb format
         
         """
-        r_hex = hex_str
-        if r_hex[0] == u"#":
-            r_hex = r_hex[1:]
-        ldiff = 6 - len(r_hex)
-        r_hex += ldiff * u"0"
-        # Convert hex values to integer
-        red = round(float(float(int(r_hex[0:2], 16)) / 255), 2)
-        green = round(float(float(int(r_hex[2:4], 16)) / 255), 2)
-        blue = round(float(float(int(r_hex[4:], 16)) / 255), 2)
+        rgb = HexToRGB(hex_str) or (0, 0, 0)
+        red, green, blue = [round(float(val) / 255, 2) for val in rgb]
         return "%s,%s,%s" % (str(red), str(green), str(blue))
 
+    def RegisterStyles(self):
+        """Registers the style commands for all the styles that are used
+        in the part of the document that is being generated.
+        @postcondition: style commands are registered
+
+        """
+        stc = self._stc
+        self.RegisterStyleCmd('default_style',
+                              stc.GetItemByName('default_style'))
+        for style_id in stc.GetStyleIds(*self._range):
+            tag = stc.FindTagById(style_id)
+            if tag not in ("operator_style", "default_style"):
+                self.RegisterStyleCmd(tag, stc.GetItemByName(tag))
+
     def RegisterStyleCmd(self, cmd_name, s_item):
         """Registers and generates a command from the
         supplied StyleItem.
@@ -714,17 +822,7 @@ class LaTeX(plugin.Plugin):
         @return: txt with all special characters transformed
         
         """
-        ch_map = { "#" : "\\#", "$" : "\\$", "^" : "\\^",
-                   "%" : "\\%", "&" : "\\&", "_" : "\\_",
-                   "{" : "\\{", "}" : "\\}", "~" : "\\~",
-                   "\\": "$\\backslash$", "\n" : "\\\\\n",
-                   "@" : "$@$", "<" : "$<$", ">" : "$>$",
-                   "-" : "$-$", "|" : "$|$"
-                 }
-        tmp = list()
-        for char in txt:
-            tmp.append(ch_map.get(char, char))
-        return u''.join(tmp)
+        return RE_TEX_SPECIAL.sub(lambda match: TEX_MAP[match.group()], txt)
 
 #-----------------------------------------------------------------------------#
 
@@ -744,6 +842,7 @@ class Rtf(plugin.Plugin):
         plugin.Plugin.__init__(self, mgr)
         self._stc = None
         self._id = ed_glob.ID_RTF_GEN
+        self._range = (0, -1)
         self._colortbl = RtfColorTbl()
 
     def __str__(self):
@@ -763,62 +862,87 @@ class Rtf(plugin.Plugin):
         """
         if not self._stc:
             return u''
+        return u"".join([txt for txt, done in self._IterRtf()])
+
+    def _IterRtf(self):
+        """Generates the RTF document in parts
+        @precondition: self._stc must have been set by a call to Generate
+        @return: generator of (text, progress) tuples
+
+        """
         stc = self._stc
-        def_fore = stc.GetDefaultForeColour(as_hex=True)
-        self._colortbl.AddColor(def_fore)
-        def_back = stc.GetDefaultBackColour(as_hex=True)
-        self._colortbl.AddColor(def_back)
-        last_pos = stc.GetLineEndPosition(stc.GetLineCount())
-        parse_pos = 0
-        last_id = None
+        self._colortbl = RtfColorTbl()
+        AddColor = self._colortbl.AddColor
+        GetColorIndex = self._colortbl.GetColorIndex
+        AddColor(stc.GetDefaultForeColour(as_hex=True))
+        AddColor(stc.GetDefaultBackColour(as_hex=True))
+
+        # The color table is needed before the text
+        colors = dict()
+        for sty_id in stc.GetStyleIds(*self._range):
+            s_item = stc.GetItemByName(stc.FindTagById(sty_id))
+            AddColor(s_item.GetFore())
+            AddColor(s_item.GetBack())
+            colors[sty_id] = (GetColorIndex(s_item.GetFore()),
+                              GetColorIndex(s_item.GetBack()))
+
+        head = "{\\rtf1\\ansi\\deff0{\\fonttbl{\\f0 %s;}}" % \
+                self.TransformText(stc.GetDefaultFont().GetFaceName())
+        yield u"%s%s" % (head, self._colortbl), 0
+        for chunk in ChunkText(self._IterBody(colors)):
+            yield chunk
+        yield u"}", GetRangeLength(stc, *self._range)
+
+    def _IterBody(self, colors):
+        """Generates the RTF of the document text
+        @param colors: dict of style id -> (fore index, back index)
+        @return: generator of (text, number of characters of text) tuples
+
+        """
         last_fore = None
         last_back = None
-        start = end = 0
-        tmp_txt = list()
         font_tmp = "\\f0"
         fore_tmp = "\\cf%d"
         back_tmp = "\\cb%d"
-        AddColor = self._colortbl.AddColor
-        GetColorIndex = self._colortbl.GetColorIndex
-        GetStyleAt = stc.GetStyleAt
-        for parse_pos in xrange(last_pos + 1):
-            sty_id = GetStyleAt(parse_pos)
-            end = parse_pos
-            # If style has changed build the previous section
-            if sty_id != last_id:
-                tag = stc.FindTagById(last_id)
-                s_item = stc.GetItemByName(tag)
-                AddColor(s_item.GetFore())
-                AddColor(s_item.GetBack())
-                tplate = font_tmp
-                fid = GetColorIndex(s_item.GetFore())
-                if fid != last_fore:
-                    last_fore = fid
-                    tplate = tplate + (fore_tmp % fid)
-                bid = GetColorIndex(s_item.GetBack())
-                if bid != last_back:
-                    last_back = bid
-                    tplate = tplate + (back_tmp % bid)
-                tmp_txt.append(tplate + " " + \
-                               self.TransformText(stc.GetTextRange(start, end)))
-                start = end
-            last_id = sty_id
-        head = "{\\rtf1\\ansi\\deff0{\\fonttbl{\\f0 %s;}}" % \
-                stc.GetDefaultFont().GetFaceName()
-        return u"%s%s%s}" % (head, self._colortbl, "".join(tmp_txt))
+        TransformText = self.TransformText
+        for sty_id, txt in self._stc.GetStyledTextRuns(*self._range):
+            fid, bid = colors[sty_id]
+            tplate = font_tmp
+            if fid != last_fore:
+                last_fore = fid
+                tplate = tplate + (fore_tmp % fid)
+            if bid != last_back:
+                last_back = bid
+                tplate = tplate + (back_tmp % bid)
+            yield tplate + " " + TransformText(txt), len(txt)
 
     #---- End Protected Member Functions ----#
 
-    def Generate(self, stc_doc):
+    def Generate(self, stc_doc, start=0, end=-1):
         """Implements the GeneratorI's Generator Function by
         returning the RTF equvialent of the given stc_doc
         @param stc_doc: document to generate text from
+        @keyword start: position to start generating from
+        @keyword end: position to stop at (-1 for the end of the document)
         @return: document marked up in rtf
     
         """
         self._stc = stc_doc
+        self._range = (start, end)
         return ('rtf', self._GenRtf())
 
+    def GenerateStream(self, stc_doc, start=0, end=-1):
+        """Generates the RTF document in parts
+        @param stc_doc: document to generate text from
+        @keyword start: position to start generating from
+        @keyword end: position to stop at (-1 for the end of the document)
+        @return: ('rtf', generator of (text, progress) tuples)
+
+        """
+        self._stc = stc_doc
+        self._range = (start, end)
+        return ('rtf', self._IterRtf())
+
     def GetId(self):
         """Implements the GeneratorI's GetId function by returning
         the identifier for this generator.
@@ -838,17 +962,13 @@ class Rtf(plugin.Plugin):
                              "current document") % u"RTF")
 
     def TransformText(self, text):
-        """Transforms the given text by converting it to RTF format
+        """Transforms the given text by converting it to RTF format, non
+        ascii characters are written as unicode escapes.
         @param text: text to transform
         @return: text with all special characters transformed
+
         """
-        chmap = { "\t" : "\\tab ", "{" : "\\{", "}" : "\\}",
-                  "\\" : "\\\\", "\n" : "\\par\n", "\r" : "\\par\n"}
-        text = text.replace('\r\n', '\n')
-        tmp = u''
-        for char in text:
-            tmp = tmp + chmap.get(char, char)
-        return tmp
+        return RE_RTF_SPECIAL.sub(_RtfEscape, text)
 
 class RtfColorTbl(object):
     """A storage class to help with generating the color table for
@@ -864,18 +984,15 @@ class RtfColorTbl(object):
         object.__init__(self)
         
         # Attributes
-        self._index = list() # manages the order of the tables keys
-        self._tbl = dict()   # map of style item color vals to rtf defs
+        self._index = list() # rtf defs in the order of the table
+        self._tbl = dict()   # map of style item color vals to table index
 
     def __str__(self):
         """Returns the string representation of the table
         @return: rtf color table object as an rtf formatted string
 
         """
-        rstr = u''
-        for item in self._index:
-            rstr = rstr + self._tbl[item]
-        return u"{\\colortbl%s}" % rstr
+        return u"{\\colortbl%s}" % u"".join(self._index)
 
     def AddColor(self, si_color):
         """Takes a style item and adds it to the table if
@@ -884,11 +1001,11 @@ class RtfColorTbl(object):
         @type si_color: hex color string
 
         """
-        if si_color not in self._index:
+        if si_color not in self._tbl:
             rgb = util.HexToRGB(si_color.split(u',')[0])
             color = "\\red%d\\green%d\\blue%d;" % tuple(rgb)
-            self._index.append(si_color)
-            self._tbl[si_color] = color
+            self._tbl[si_color] = len(self._index)
+            self._index.append(color)
         else:
             pass
 
@@ -900,7 +1017,159 @@ class RtfColorTbl(object):
         @return: the colors index in the table
 
         """
-        if si_color in self._index:
-            return self._index.index(si_color)
+        return self._tbl.get(si_color, -1)
+
+#-----------------------------------------------------------------------------#
+
+def _RtfEscape(match):
+    """Gets the rtf for a special character matched by RE_RTF_SPECIAL
+    @param match: re match object
+    @return: string
+
+    """
+    char = match.group()
+    escape = RTF_MAP.get(char)
+    if escape is None:
+        escape = RTF_CACHE.get(char)
+    if escape is None:
+        # Signed 16 bit escapes followed by a replacement for readers that
+        # do not understand them, characters outside of the basic plane
+        # are written as a surrogate pair.
+        code = ord(char)
+        if code > 0xffff:
+            code -= 0x10000
+            codes = [0xd800 + (code >> 10), 0xdc00 + (code & 0x3ff)]
         else:
-            return -1
+            codes = [code]
+        escapes = list()
+        for num in codes:
+            if num > 0x7fff:
+                num -= 0x10000
+            escapes.append(u"\\u%d?" % num)
+        escape = u"".join(escapes)
+        if len(RTF_CACHE) >= RTF_CACHE_LIMIT:
+            RTF_CACHE.clear()
+        RTF_CACHE[char] = escape
+    return escape
+
+def GetRangeLength(stc, start=0, end=-1):
+    """Gets the number of characters in a range of a document
+    @param stc: text control of the document
+    @keyword start: position the range starts at
+    @keyword end: position the range ends at (-1 for the end of the document)
+    @return: int
+
+    """
+    length = stc.GetTextLength()
+    if end < 0 or end > length:
+        end = length
+    return end - max(0, min(start, end))
+
+def ChunkText(parts, size=CHUNK_SIZE):
+    """Joins the parts of a document being generated into larger chunks
+    @param parts: iterable of (text, number of source characters) tuples
+    @keyword size: minimum number of characters in a chunk
+    @return: generator of (text, progress) tuples where progress is the
+             total number of source characters that have been processed.
+
+    """
+    chunk = list()
+    length = done = 0
+    for text, count in parts:
+        chunk.append(text)
+        length += len(text)
+        done += count
+        if length >= size:
+            yield u"".join(chunk), done
+            chunk = list()
+            length = 0
+    if len(chunk):
+        yield u"".join(chunk), done
+
+def WriteChunks(chunks, path, total, progress=None):
+    """Writes the chunks of a generated document to a file as utf-8
+    @param chunks: iterable of (text, progress) tuples
+    @param path: file to write to
+    @param total: number of characters in the source document
+    @keyword progress: callable that is passed the fraction of the document
+                       that has been written, returning False cancels.
+    @return: False if cancelled
+    @raise: IOError or OSError if the file can not be written, any other
+            error raised while generating the chunks is passed on as well.
+            The partial file is removed in either case.
+
+    """
+    handle = open(path, 'wb')
+    complete = False
+    try:
+        try:
+            for text, done in chunks:
+                if isinstance(text, unicode):
+                    text = text.encode('utf-8')
+                handle.write(text)
+                if progress is not None and \
+                   not progress(min(float(done) / max(total, 1), 1.0)):
+                    break
+            else:
+                complete = True
+        finally:
+            handle.close()
+    finally:
+        # Cancelled or failed, so don't leave a partial document behind
+        if not complete:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    return complete
+
+def SetClipboardDoc(ext, text, plain):
+    """Puts a generated document on the clipboard along with its plain
+    text so that applications that don't understand the document can
+    still paste the text.
+    @param ext: file extension of the document ("html" or "rtf")
+    @param text: text of the document
+    @param plain: plain text of the document
+    @return: whether the clipboard was set or not
+
+    """
+    fmt = CLIP_FORMATS.get(ext, dict()).get(wx.Platform)
+    if isinstance(text, unicode):
+        text = text.encode('utf-8')
+
+    data = wx.DataObjectComposite()
+    if fmt is not None:
+        if fmt == "HTML Format":
+            text = _MakeCfHtml(text)
+        doc = wx.CustomDataObject(wx.CustomDataFormat(fmt))
+        doc.SetData(text)
+        data.Add(doc, True)
+    txt = wx.TextDataObject()
+    txt.SetText(plain)
+    data.Add(txt, fmt is None)
+
+    if wx.TheClipboard.Open():
+        wx.TheClipboard.SetData(data)
+        wx.TheClipboard.Close()
+        return True
+    return False
+
+def _MakeCfHtml(html):
+    """Adds the header that windows requires for html on the clipboard.
+    The header gives the byte offsets of the html and the fragment that
+    was copied, which is the contents of the body.
+    @param html: utf-8 encoded html document
+    @return: utf-8 encoded clipboard data
+
+    """
+    head = ("Version:0.9\r\nStartHTML:%010d\r\nEndHTML:%010d\r\n"
+            "StartFragment:%010d\r\nEndFragment:%010d\r\n")
+    offset = len(head % (0, 0, 0, 0))
+    body = html.find("<body")
+    start = html.find(">", body) + 1
+    end = html.rfind("</body>")
+    if body < 0 or end < start:
+        start = 0
+        end = len(html)
+    return head % (offset, offset + len(html), offset + start,
+                   offset + end) + html
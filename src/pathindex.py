@@ -0,0 +1,592 @@
+###############################################################################
+# Name: pathindex.py                                                          #
+# Purpose: Index of the files under a set of directories for Quick Open       #
+# Author: Cody Precord <cprecord@editra.org>                                  #
+# Copyright: (c) 2007 Cody Precord <staff@editra.org>                         #
+# Licence: wxWindows Licence                                                  #
+###############################################################################
+
+"""
+#--------------------------------------------------------------------------#
+# FILE: pathindex.py                                                       #
+# AUTHOR: Cody Precord                                                     #
+# LANGUAGE: Python                                                         #
+# SUMMARY:                                                                 #
+#    Keeps an index of the paths of all the files under a set of root     #
+# directories and searches it with fuzzy matching for the Quick Open      #
+# dialog. The index is built on a background thread and saved in the      #
+# cache directory along with the modification time of each directory, so  #
+# that on the next run only the directories that have changed need to be  #
+# read again.                                                              #
+#                                                                          #
+#    The paths are kept in chunks of newline separated lower case text so  #
+# that a query can be matched against thousands of paths with a single    #
+# regular expression search. A search is done a few chunks at a time      #
+# within a time budget, so that the results for each key stroke can be    #
+# shown right away even in very large trees.                               #
+#                                                                          #
+# METHODS:                                                                 #
+#   L{PathIndex} Index of the files under a set of directories             #
+#   L{Search} Fuzzy search of a snapshot of the index                      #
+#                                                                          #
+#--------------------------------------------------------------------------#
+"""
+
+__author__ = "Cody Precord <cprecord@editra.org>"
+__svnid__ = "$Id$"
+__revision__ = "$Revision$"
+
+#--------------------------------------------------------------------------#
+# Dependancies
+import os
+import sys
+import re
+import time
+import heapq
+import bisect
+import marshal
+import threading
+from array import array
+import dirlist
+
+#--------------------------------------------------------------------------#
+# Globals
+INDEX_VERSION = 1
+CHUNK_LINES = 8192          # Paths per chunk of the snapshot
+MAX_FILES = 1000000         # Max number of files to index
+MAX_CANDIDATES = 5000       # Max number of best matches kept for a query
+SKIP_DIRS = ('CVS', '_darcs')   # Hidden directories are always skipped
+
+# Match tiers, lower is better
+TIER_PREFIX = 0     # File name starts with the query
+TIER_NAME = 1       # File name contains the query
+TIER_FUZZY = 2      # Characters of the query are in the file name in order
+TIER_PATH = 3       # Characters of the query are in the path in order
+
+#--------------------------------------------------------------------------#
+
+class PathIndex(object):
+    """Index of the files under a set of root directories"""
+    def __init__(self, cache_file):
+        """Create the index, the saved index is loaded in the background
+        by the first call to L{Update}.
+        @param cache_file: path of the file to save the index in
+
+        """
+        object.__init__(self)
+
+        # Attributes
+        self._cache = cache_file
+        self._lock = threading.Lock()
+        self._thread = None
+        self._roots = list()
+        self._dirs = dict()     # dir path -> (mtime, [dir names], [file names])
+        self._snapshot = Snapshot(list(), dict())
+        self._loaded = False
+        self._updated = 0       # Time of the last completed update
+
+    def GetRoots(self):
+        """Gets the root directories of the index
+        @return: list of paths
+
+        """
+        return list(self._roots)
+
+    def GetSnapshot(self):
+        """Gets the current contents of the index. A new snapshot object
+        is made each time the index is updated.
+        @return: L{Snapshot}
+
+        """
+        return self._snapshot
+
+    def IsUpdating(self):
+        """Is the index being updated
+        @return: bool
+
+        """
+        return self._thread is not None and self._thread.isAlive()
+
+    def Save(self):
+        """Saves the index to the cache file
+        @return: bool
+
+        """
+        data = dict(version=INDEX_VERSION, roots=self._roots, dirs=self._dirs)
+        self._lock.acquire()
+        try:
+            try:
+                cdir = os.path.dirname(self._cache)
+                if cdir and not os.path.exists(cdir):
+                    os.makedirs(cdir)
+                tmp = "%s.%d" % (self._cache, os.getpid())
+                handle = open(tmp, 'wb')
+                try:
+                    marshal.dump(data, handle)
+                finally:
+                    handle.close()
+                if os.path.exists(self._cache) and \
+                   sys.platform.startswith('win'):
+                    os.remove(self._cache)
+                os.rename(tmp, self._cache)
+            except (IOError, OSError, ValueError):
+                return False
+        finally:
+            self._lock.release()
+        return True
+
+    def SetRoots(self, roots):
+        """Sets the directories to index and starts updating the index
+        @param roots: list of directory paths
+
+        """
+        enc = sys.getfilesystemencoding() or 'utf-8'
+        roots = [os.path.abspath(root) for root in roots]
+        roots = [root.decode(enc, 'replace') for root in roots
+                 if not isinstance(root, unicode)] + \
+                [root for root in roots if isinstance(root, unicode)]
+        if roots != self._roots:
+            self._roots = roots
+            self._updated = 0
+            self.Update()
+
+    def Update(self, max_age=0):
+        """Starts updating the index on a background thread. Only the
+        directories that have changed since they were last read are listed.
+        @keyword max_age: don't update if the last update finished less
+                          than this many seconds ago
+        @return: bool (False if an update is already running or the index
+                 is newer than max_age)
+
+        """
+        if self.IsUpdating() or time.time() - self._updated < max_age:
+            return False
+        self._thread = threading.Thread(target=self._Update)
+        self._thread.setDaemon(True)
+        self._thread.start()
+        return True
+
+    def _Load(self):
+        """Loads the saved index
+        @return: list of the roots in the saved index
+
+        """
+        try:
+            handle = open(self._cache, 'rb')
+            try:
+                data = marshal.load(handle)
+            finally:
+                handle.close()
+        except (IOError, OSError, EOFError, ValueError, TypeError):
+            return list()
+
+        if not isinstance(data, dict) or \
+           data.get('version') != INDEX_VERSION:
+            return list()
+        self._dirs = data.get('dirs', dict())
+        return data.get('roots', list())
+
+    def _Update(self):
+        """Updates the index, this is run on a background thread. The
+        update is run again if the roots are changed while it runs.
+
+        """
+        try:
+            roots = list(self._roots)
+            if not self._loaded:
+                self._loaded = True
+                if self._Load() == roots and len(roots):
+                    # Show the saved index while the update runs
+                    self._snapshot = Snapshot(roots, self._dirs)
+
+            while True:
+                dirs = dict()
+                for root in roots:
+                    if not WalkDir(root, self._dirs, dirs, MAX_FILES):
+                        break
+                self._dirs = dirs
+                if roots == self._roots:
+                    break
+                roots = list(self._roots)
+            self._snapshot = Snapshot(roots, dirs)
+            self.Save()
+        finally:
+            self._updated = time.time()
+
+#--------------------------------------------------------------------------#
+
+def WalkDir(root, old, new, limit=MAX_FILES):
+    """Finds all the directories and files under a directory. Directories
+    that have not changed since they were last read are not read again.
+    @param root: directory to walk
+    @param old: dict of the last walk (path -> (mtime, dirs, files))
+    @param new: dict to add the results to
+    @keyword limit: max number of files in new
+    @return: bool (False if the limit was reached)
+
+    """
+    count = sum([len(entry[2]) for entry in new.itervalues()])
+    stack = [root]
+    while len(stack):
+        path = stack.pop()
+        if path in new:
+            continue
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            continue
+
+        entry = old.get(path)
+        if entry is None or entry[0] is None or entry[0] != mtime:
+            try:
+                dirs, files = dirlist.ListDir(path)
+            except OSError:
+                continue
+            if time.time() - mtime < dirlist.MTIME_SLACK:
+                mtime = None
+            dirs = [name for name in dirs
+                    if IsGoodName(name) and name not in SKIP_DIRS]
+            files = [name for name in files if IsGoodName(name)]
+            entry = (mtime, dirs, files)
+
+        new[path] = entry
+        count += len(entry[2])
+        if count >= limit:
+            return False
+        stack.extend([os.path.join(path, name)
+                      for name in reversed(entry[1])])
+    return True
+
+def IsGoodName(name):
+    """Can a file or directory be put in the index
+    @param name: file name
+    @return: bool
+
+    """
+    return isinstance(name, unicode) and not dirlist.IsHidden(name) and \
+           u"\n" not in name
+
+#--------------------------------------------------------------------------#
+
+class Snapshot(object):
+    """Contents of the L{PathIndex} at one point in time. A snapshot is
+    never changed after it is made so it can be searched while the index
+    is being updated.
+
+    """
+    def __init__(self, roots, dirs):
+        """Makes the snapshot
+        @param roots: list of root directories
+        @param dirs: dict of path -> (mtime, dirs, files) from L{WalkDir}
+
+        """
+        object.__init__(self)
+
+        # Attributes
+        self.paths = list()     # Full paths of the files
+        self.chunks = list()    # Searchable text of the paths
+
+        rels = list()
+        seen = set()
+        for root in roots:
+            stack = [root]
+            skip = len(root.rstrip(os.sep)) + 1
+            while len(stack):
+                path = stack.pop()
+                entry = dirs.get(path)
+                if entry is None or path in seen:
+                    continue
+                seen.add(path)
+                for name in entry[2]:
+                    fname = os.path.join(path, name)
+                    self.paths.append(fname)
+                    rels.append(fname[skip:].lower())
+                stack.extend([os.path.join(path, name)
+                              for name in reversed(entry[1])])
+
+        for start in xrange(0, len(rels), CHUNK_LINES):
+            self.chunks.append(Chunk(rels[start:start + CHUNK_LINES]))
+
+    def __len__(self):
+        return len(self.paths)
+
+    def GetName(self, idx):
+        """Gets the lower case file name of a path
+        @param idx: index of the path
+        @return: string
+
+        """
+        return self.chunks[idx // CHUNK_LINES].GetName(idx % CHUNK_LINES)
+
+    def GetRelPath(self, idx):
+        """Gets the lower case path of a file relative to its root
+        @param idx: index of the path
+        @return: string
+
+        """
+        return self.chunks[idx // CHUNK_LINES].GetRelPath(idx % CHUNK_LINES)
+
+class Chunk(object):
+    """Newline separated text of a chunk of the paths in a L{Snapshot}
+    along with the offsets of each line.
+
+    """
+    def __init__(self, rels):
+        """Makes the chunk
+        @param rels: list of lower case relative paths
+
+        """
+        object.__init__(self)
+        names = [rel[rel.rfind(os.sep) + 1:] for rel in rels]
+        self.names = u"\n".join(names) + u"\n"
+        self.rels = u"\n".join(rels) + u"\n"
+        self.name_offs = MakeOffsets(names)
+        self.rel_offs = MakeOffsets(rels)
+
+    def GetName(self, line):
+        """Gets the file name of a line of the chunk
+        @param line: line number
+        @return: string
+
+        """
+        return self.names[self.name_offs[line]:self.name_offs[line + 1] - 1]
+
+    def GetRelPath(self, line):
+        """Gets the relative path of a line of the chunk
+        @param line: line number
+        @return: string
+
+        """
+        return self.rels[self.rel_offs[line]:self.rel_offs[line + 1] - 1]
+
+def MakeOffsets(lines):
+    """Makes the list of offsets of the lines in newline joined text
+    @param lines: list of strings
+    @return: array of offsets with an extra entry for the end of the text
+
+    """
+    offs = array('l', [0]) * (len(lines) + 1)
+    pos = 0
+    for idx, line in enumerate(lines):
+        pos += len(line) + 1
+        offs[idx + 1] = pos
+    return offs
+
+#--------------------------------------------------------------------------#
+
+class Search(object):
+    """Fuzzy search of a L{Snapshot}. A path matches the query if all the
+    characters of the query are in it in the same order. The matches are
+    ranked by how the query matches the file name, how recently the file
+    was opened, how close together the matched characters are and then by
+    the length of the path.
+
+    """
+    def __init__(self, snapshot, query, recent=None, last=None):
+        """Create the search
+        @param snapshot: L{Snapshot} to search
+        @param query: string to search for
+        @keyword recent: dict of path -> rank of recently opened files
+        @keyword last: the previous search, when the query extends the
+                       query of a completed search only its matches need
+                       to be checked.
+
+        """
+        object.__init__(self)
+
+        # Attributes
+        self.snapshot = snapshot
+        self.query = u"".join(query.lower().split())
+        if os.sep != u'/':
+            self.query = self.query.replace(u'/', os.sep)
+        self._recent = recent or dict()
+        self._matches = dict()      # path index -> rank key
+        self._worst = list()        # Heap of the kept matches, worst first
+        self._found = 0             # Number of matches found
+        self._phase = 0             # 0 file names, 1 paths, 2 done
+        self._chunk = 0             # Next chunk to search
+        self._truncated = False     # Matches were dropped at MAX_CANDIDATES
+        self._regex = MakeRegex(self.query)
+
+        if not len(self.query):
+            self._phase = 2
+        elif last is not None and last.IsDone() and not last.IsTruncated() \
+             and last.snapshot is snapshot and \
+             self.query.startswith(last.query):
+            self._Narrow(last)
+
+    def _AddMatch(self, idx, tier, span, name):
+        """Adds a path to the matches. Only the best L{MAX_CANDIDATES}
+        matches are kept, so a match found late in the snapshot still
+        replaces a worse one that was found earlier.
+        @param idx: index of the path
+        @param tier: one of the TIER_* values
+        @param span: length of the matched text
+        @param name: file name
+
+        """
+        path = self.snapshot.paths[idx]
+        rank = self._recent.get(path)
+        if rank is None:
+            rank = sys.maxint
+        elif tier > TIER_PREFIX:
+            # Recently used files move up a tier
+            tier -= 1
+        key = (tier, rank, span, len(name), len(path))
+        self._found += 1
+        # The heap orders the matches by their negated keys so that the
+        # worst one kept is always at the top.
+        item = (tuple([-val for val in key]), idx)
+        if len(self._matches) < MAX_CANDIDATES:
+            heapq.heappush(self._worst, item)
+        else:
+            self._truncated = True
+            if item <= self._worst[0]:
+                return
+            del self._matches[heapq.heapreplace(self._worst, item)[1]]
+        self._matches[idx] = key
+
+    def _GetTier(self, name):
+        """Gets the match tier of a file name that matches the query
+        @param name: lower case file name
+        @return: TIER_* value
+
+        """
+        if name.startswith(self.query):
+            return TIER_PREFIX
+        elif self.query in name:
+            return TIER_NAME
+        return TIER_FUZZY
+
+    def _Narrow(self, last):
+        """Finds the matches of the query in the matches of the last search
+        @param last: L{Search}
+
+        """
+        search = self._regex.search
+        for idx in last._matches:
+            name = self.snapshot.GetName(idx)
+            match = search(name)
+            if match is not None:
+                self._AddMatch(idx, self._GetTier(name),
+                               match.end() - match.start(), name)
+            else:
+                match = search(self.snapshot.GetRelPath(idx))
+                if match is not None:
+                    self._AddMatch(idx, TIER_PATH,
+                                   match.end() - match.start(), name)
+        self._phase = 2
+
+    def GetResults(self, count):
+        """Gets the best matches found so far
+        @param count: max number of results
+        @return: list of path indexes, best first
+
+        """
+        if not len(self.query):
+            # Show the recent files when there is no query
+            ranks = self._recent
+            recent = sorted([path for path in ranks if os.path.exists(path)],
+                            key=ranks.get)
+            return recent[:count]
+
+        best = heapq.nsmallest(count, self._matches.iteritems(),
+                               key=lambda item: item[1])
+        return [item[0] for item in best]
+
+    def GetPath(self, result):
+        """Gets the path of a result from L{GetResults}
+        @param result: path index or path
+        @return: path
+
+        """
+        if isinstance(result, basestring):
+            return result
+        return self.snapshot.paths[result]
+
+    def GetMatchCount(self):
+        """Gets the number of matches found so far, including the ones that
+        were dropped for better ones.
+        @return: int
+
+        """
+        return self._found
+
+    def IsDone(self):
+        """Has the whole snapshot been searched
+        @return: bool
+
+        """
+        return self._phase >= 2
+
+    def IsTruncated(self):
+        """Were any matches dropped to keep only the best L{MAX_CANDIDATES}
+        @return: bool
+
+        """
+        return self._truncated
+
+    def Step(self, budget):
+        """Searches chunks of the snapshot until the time budget is used
+        up. The file names are searched first and then the full paths.
+        @param budget: seconds to search for
+        @return: bool (True when the search is done)
+
+        """
+        end = time.time() + budget
+        chunks = self.snapshot.chunks
+        finditer = self._regex.finditer
+        search = self._regex.search
+        while self._phase < 2:
+            if self._chunk >= len(chunks):
+                self._phase += 1
+                self._chunk = 0
+                continue
+
+            cidx = self._chunk
+            chunk = chunks[cidx]
+            base = cidx * CHUNK_LINES
+            if self._phase == 0:
+                text, offs = chunk.names, chunk.name_offs
+            else:
+                text, offs = chunk.rels, chunk.rel_offs
+
+            last = None
+            for match in finditer(text):
+                line = bisect.bisect_right(offs, match.start()) - 1
+                idx = base + line
+                if idx == last or idx in self._matches:
+                    continue
+                last = idx
+                name = chunk.GetName(line)
+                if self._phase == 0:
+                    tier = self._GetTier(name)
+                elif self._truncated and search(name):
+                    # Matched by its name already and dropped for better ones
+                    continue
+                else:
+                    tier = TIER_PATH
+                self._AddMatch(idx, tier, match.end() - match.start(), name)
+
+            self._chunk += 1
+            if time.time() >= end:
+                break
+        return self.IsDone()
+
+def MakeRegex(query):
+    """Makes the regular expression to find the paths that contain the
+    characters of the query in order. Each character is followed by a
+    class that excludes the next character, so the search never has to
+    backtrack.
+    @param query: string
+    @return: compiled regex
+
+    """
+    if not len(query):
+        return re.compile(u"$^")
+
+    parts = [re.escape(query[0])]
+    for char in query[1:]:
+        char = re.escape(char)
+        parts.append(u"[^\n%s]*%s" % (char, char))
+    return re.compile(u"".join(parts), re.UNICODE)
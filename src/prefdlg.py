@@ -591,7 +591,7 @@ class DocGenPanel(wx.Panel):
             for main in wx.GetApp().GetMainWindows():
                 for stc in main.nb.GetTextControls():
                     stc.SetStyleFont(font, e_id == self.ID_FONT_PICKER)
-                    stc.UpdateAllStyles()
+                main.nb.UpdateTextStyles()
         else:
             evt.Skip()
 
@@ -47,6 +47,7 @@ _DEFAULTS = {
            'AALIASING'  : False,            # Use Anti-Aliasing if availble
            'APPSPLASH'  : True,             # Show splash at startup
            'AUTO_COMP'  : True,             # Use Auto-comp if available
+           'AUTO_COMP_INDEX' : True,        # Index python modules for autocomp
            'AUTO_INDENT': True,             # Use Auto Indent
            'BRACKETHL'  : True,             # Use bracket highlighting
            'CHECKMOD'   : True,             # Auto check file for file mod
@@ -58,14 +59,22 @@ _DEFAULTS = {
            'FHIST'      : list(),           # List of history files
            'FHIST_LVL'  : 9,                # Filehistory length (9 is max)
            'FFILTER'    : 0,                # Last file filter used
+           'GEN_OPEN'   : True,             # Open generated documents
            'GUIDES'     : True,             # Use Indentation guides
            'ICONS'      : 'Tango',          # Icon Theme
            'ICON_SZ'    : (24, 24),         # Toolbar Icon Size
            'LANG'       : 'Default',        # UI language
+           'LARGEFILE_SIZE' : 5242880,      # Large file mode size (bytes)
+           'LARGEFILE_LINES' : 100000,      # Large file mode line count
+           'LARGEFILE_LLEN' : 10000,        # Large file mode longest line
+           'LEXCACHE'   : False,            # Cache lexer output between sessions
+           'LEXCACHE_SIZE' : 52428800,      # Max size of lexer cache (bytes)
            'MODE'       : 'CODE',           # Overall editor mode
            'MYPROFILE'  : 'default.ppb',    # Path to profile file
            'OPEN_NW'    : False,            # Open files in new windows
            'PRINT_MODE' : 'BLACK/WHITE',    # Printer rendering mode
+           'QOPEN_RECENT' : list(),         # Files recently opened by Quick Open
+           'QOPEN_ROOTS' : list(),          # Folders searched by Quick Open
            'REPORTER'   : True,             # Error Reporter is Active
            'SAVE_POS'   : True,             # Remember Carat positions
            'SAVE_SESSION' : False,          # Load previous session on startup
@@ -29,14 +29,16 @@ __revision__ = "$Revision$"
 import os
 import glob
 import wx
+import wx.stc
 import wx.lib.colourselect as  csel
 import ed_glob
 from profiler import Profile_Get, Profile_Set
 import ed_stc
-from ed_style import StyleItem
+from ed_style import ParseStyleSheet
 import ed_event
 import util
 import syntax.syntax as syntax
+import syntax.synglob as synglob
 
 # Function Aliases
 _ = wx.GetTranslation
@@ -51,9 +53,16 @@ ID_EOL = wx.NewId()
 ID_ULINE = wx.NewId()
 ID_FONT = wx.NewId()
 ID_FONT_SIZE = wx.NewId()
+ID_VALIDATE = wx.NewId()
+ID_PREVIEW = wx.NewId()
 
 SETTINGS_IDS = [ ID_FORE_COLOR, ID_BACK_COLOR, ID_BOLD, ID_ITALIC,
                  ID_EOL, ID_ULINE, ID_FONT, ID_FONT_SIZE ]
+
+VALIDATE_DELAY = 300    # Milliseconds to wait after an edit to validate
+PREVIEW_DELAY = 100     # Milliseconds to wait before updating the preview
+
+FONT_FACES = list()     # Cached list of fixed width font face names
 #--------------------------------------------------------------------------#
 
 class StyleEditor(wx.Dialog):
@@ -81,6 +90,10 @@ class StyleEditor(wx.Dialog):
         self.styles_orig = self.preview.GetStyleSet()
         self.styles_new = DuplicateStyleDict(self.styles_orig)
         self.preview.SetStyles('preview', self.styles_new, True)
+        self._vlbl = wx.StaticText(self, label=u"")
+        self._vtimer = wx.Timer(self, ID_VALIDATE)
+        self._ptimer = wx.Timer(self, ID_PREVIEW)
+        self._dirty = set()     # Tags changed since the last preview update
         self.OpenPreviewFile('cpp')
 
         # Main Sizer
@@ -124,7 +137,9 @@ class StyleEditor(wx.Dialog):
                            (wx.StaticText(self, label=_("Preview") + u": "), 
                             0, wx.ALIGN_LEFT)])
         self.sizer.AddMany([((10, 10), 0), (pre_sizer, 0, wx.ALIGN_LEFT),
-                            (self.preview, 0, wx.EXPAND | wx.BOTTOM)])
+                            (self.preview, 0, wx.EXPAND | wx.BOTTOM),
+                            ((5, 5), 0),
+                            (self._vlbl, 0, wx.ALIGN_LEFT | wx.LEFT, 10)])
 
         # Create Buttons
         b_sizer = wx.BoxSizer(wx.HORIZONTAL)
@@ -150,8 +165,16 @@ class StyleEditor(wx.Dialog):
         self.Bind(wx.EVT_CLOSE, self.OnClose)
         self.Bind(wx.EVT_LISTBOX, self.OnListBox)
         self.Bind(ed_event.EVT_NOTIFY, self.OnColor)
+        self.Bind(wx.EVT_TIMER, self.OnValidate, id=ID_VALIDATE)
+        self.Bind(wx.EVT_TIMER, self.OnPreviewTimer, id=ID_PREVIEW)
         self.preview.Bind(wx.EVT_LEFT_UP, self.OnTextRegion)
         self.preview.Bind(wx.EVT_KEY_UP, self.OnTextRegion)
+        self.preview.Bind(wx.stc.EVT_STC_MODIFIED, self.OnPreviewModified)
+
+        # The fonts are enumerated after startup, but if the dialog is
+        # opened before that has run only fill them in once it is up.
+        if not len(FONT_FACES):
+            wx.CallAfter(self.LoadFontFaces)
     #--- End Init ---#
 
     def __LexerChoice(self):
@@ -239,12 +262,8 @@ class StyleEditor(wx.Dialog):
         # Font Face Name
         fsizer = wx.BoxSizer(wx.HORIZONTAL)
         flbl = wx.StaticText(self.ctrl_pane, wx.ID_ANY, _("Font") + u": ")
-        fontenum = wx.FontEnumerator()
-        fontenum.EnumerateFacenames(fixedWidthOnly=True)
-        f_lst = fontenum.GetFacenames()
-        f_lst.sort()
         font_lst = ["%(primary)s", "%(secondary)s"]
-        font_lst.extend(f_lst)
+        font_lst.extend(FONT_FACES)
         fchoice = wx.Choice(self.ctrl_pane, ID_FONT, choices=font_lst)
         fsizer.AddMany([((5, 5), 0), (flbl, 0, wx.ALIGN_CENTER_VERTICAL),
                         (fchoice, 0, wx.ALIGN_CENTER_VERTICAL), ((5, 5))])
@@ -430,6 +449,21 @@ class StyleEditor(wx.Dialog):
             sty_sheet.append(u"\n}\n\n")
         return u"".join(sty_sheet)
 
+    def LoadFontFaces(self):
+        """Fills in the font choice control with the system fonts
+        @postcondition: font choice lists all fixed width fonts
+
+        """
+        if not self:
+            return
+
+        fchoice = self.FindWindowById(ID_FONT)
+        if fchoice.GetCount() < 3:
+            fchoice.AppendItems(GetFontFaces())
+            tag = self.FindWindowById(ID_STYLES).GetStringSelection()
+            if self.styles_new.has_key(tag):
+                self.UpdateSettingsPane(self.styles_new[tag])
+
     def OnCancel(self, evt):
         """Catches the cancel button clicks and checks if anything
         needs to be done before closing the window.
@@ -437,6 +471,8 @@ class StyleEditor(wx.Dialog):
 
         """
         self.LOG('[style_editor][cancel] Cancel Clicked Closing Window')
+        self._ptimer.Stop()
+        self._vtimer.Stop()
         evt.Skip()
 
     def OnCheck(self, evt):
@@ -505,6 +541,25 @@ class StyleEditor(wx.Dialog):
         e_id = evt.GetId()
         self.UpdateStyleSet(e_id)
 
+    def OnPreviewTimer(self, evt):
+        """Updates the preview once the settings have stopped changing
+        @param evt: wx.EVT_TIMER
+
+        """
+        self.UpdatePreview()
+
+    def OnPreviewModified(self, evt):
+        """Restarts the validation timer when text is changed in the
+        preview so that style sheets are checked as they are typed.
+        @param evt: wx.stc.EVT_STC_MODIFIED
+
+        """
+        mod = wx.stc.STC_MOD_INSERTTEXT | wx.stc.STC_MOD_DELETETEXT
+        if evt.GetModificationType() & mod and \
+           self.preview.GetLangId() == synglob.ID_LANG_ESS:
+            self._vtimer.Start(VALIDATE_DELAY, True)
+        evt.Skip()
+
     def OnTextRegion(self, evt):
         """Processes clicks in the preview control and sets the style
         selection in the style tags list to the style tag of the area
@@ -543,6 +598,8 @@ class StyleEditor(wx.Dialog):
 
         """
         self.LOG('[style_editor][info] Ok Clicked Closing Window')
+        self.UpdatePreview()
+        self._vtimer.Stop()
         result = self.DiffStyles()
         if result == wx.ID_NO:
             evt.Skip()
@@ -561,6 +618,14 @@ class StyleEditor(wx.Dialog):
         self.LOG('[style_editor][export] Saving style changes')
         self.ExportStyleSheet()
 
+    def OnValidate(self, evt):
+        """Validates the style sheet in the preview after the user
+        has paused typing.
+        @param evt: wx.EVT_TIMER
+
+        """
+        self.ValidatePreview()
+
     def OpenPreviewFile(self, file_lbl):
         """Opens a file using the names in the Syntax Files choice
         control as a search query.
@@ -586,8 +651,43 @@ class StyleEditor(wx.Dialog):
         self.preview.LoadFile(fname)
         self.preview.FindLexer()
         self.preview.EmptyUndoBuffer()
+        self.ValidatePreview()
         return True
 
+    def ValidatePreview(self):
+        """Checks the text in the preview for errors if it is an Editra
+        Style Sheet and shows the first problem found below the preview.
+        @postcondition: validation label is updated
+
+        """
+        self._vtimer.Stop()
+        msg = u""
+        if self.preview.GetLangId() == synglob.ID_LANG_ESS:
+            diag = ParseStyleSheet(self.preview.GetText())[1]
+            if len(diag):
+                line, col, level, txt = diag[0]
+                msg = _("Line %d, Column %d: %s") % (line, col, txt)
+                if len(diag) > 1:
+                    msg += u" " + (_("(%d more problems)") % (len(diag) - 1))
+        if msg != self._vlbl.GetLabel():
+            self._vlbl.SetLabel(msg)
+            self.Layout()
+
+    def UpdatePreview(self):
+        """Applies the style tags that have been changed since the last
+        update to the preview. Only the styles that use the changed tags
+        are updated.
+        @postcondition: preview shows the current settings
+
+        """
+        self._ptimer.Stop()
+        tags = [tag for tag in self._dirty if self.styles_new.has_key(tag)]
+        self._dirty.clear()
+        for tag in tags:
+            self.preview.SetStyleTag(tag, self.styles_new[tag])
+        if len(tags):
+            self.preview.UpdateStyleTags(tags)
+
     def UpdateSettingsPane(self, syntax_data):
         """Updates all the settings controls to hold the
         values of the selected tag.
@@ -661,15 +761,17 @@ class StyleEditor(wx.Dialog):
                   }
 
         if id_ in [ ID_FONT, ID_FONT_SIZE, ID_FORE_COLOR, ID_BACK_COLOR ]:
-            self.styles_new[tag].SetNamedAttr(val_map[id_], val)
+            item = self.styles_new[tag].SetNamedAttr(val_map[id_], val)
+            self.styles_new[tag] = item
         elif id_ in [ ID_BOLD, ID_ITALIC, ID_ULINE, ID_EOL ]:
-            self.styles_new[tag].SetExAttr(val_map[id_], val)
+            item = self.styles_new[tag].SetExAttr(val_map[id_], val)
+            self.styles_new[tag] = item
         else:
             return False
 
-        # Update the Preview Area
-        self.preview.SetStyleTag(tag, self.styles_new[tag])
-        self.preview.RefreshStyles()
+        # Update the Preview Area once the value stops changing
+        self._dirty.add(tag)
+        self._ptimer.Start(PREVIEW_DELAY, True)
 
 #-----------------------------------------------------------------------------#
 class ColourSetter(wx.Panel):
@@ -819,17 +921,31 @@ class ColourSetter(wx.Panel):
 
 #-----------------------------------------------------------------------------#
 # Utility funtcions
+def GetFontFaces():
+    """Gets the sorted list of fixed width font face names on the
+    system. The fonts are only enumerated the first time this is called
+    and the list is then reused for the rest of the session. Editra calls
+    this shortly after it starts so that the style editor does not have
+    to wait on the enumeration.
+    @return: list of font face names
+
+    """
+    if not len(FONT_FACES):
+        fontenum = wx.FontEnumerator()
+        fontenum.EnumerateFacenames(fixedWidthOnly=True)
+        faces = fontenum.GetFacenames()
+        faces.sort()
+        FONT_FACES.extend(faces)
+    return FONT_FACES
+
 def DuplicateStyleDict(style_dict):
     """Duplicates the style dictionary to make a true copy of
     it, as simply assigning the dictionary to two different variables
     only copies a reference leaving both variables pointing to the 
-    same object.
+    same object. The StyleItems can not be changed so they are shared
+    by the copy.
     @param style_dict: dictionary of tags->StyleItems
     @return: a copy of the given styleitem dictionary
 
     """
-    new_dict = dict()
-    for tag in style_dict:
-        new_dict[tag] = StyleItem()
-        new_dict[tag].SetAttrFromStr(unicode(style_dict[tag]))
-    return new_dict
+    return dict(style_dict)
@@ -448,6 +448,16 @@ def SyntaxIds():
 
     return ret_ids
 
+def GetStyleScope(lang_id):
+    """Gets the name used to scope style definitions in a style sheet
+    to the given language (i.e. python.keyword_style).
+    @param lang_id: language id to get scope name for
+    @return: lower case language name with spaces replaced by underscores
+
+    """
+    ftype = synglob.ID_MAP.get(lang_id, synglob.LANG_TXT)
+    return ftype.lower().replace(u' ', u'_')
+
 def GetExtFromId(ext_id):
     """Takes a language ID and fetches an appropriate file extension string
     @param extId: language id to get extension for